@@ -0,0 +1,664 @@
+"""
+Daily rollups of completed orders for the /completed dashboard.
+
+The completed_rollups table holds one row per (day, dimension, value), for
+example ('2026-03-01', 'milk', 'Oat'), with the number of completed orders,
+their revenue and extra shots. Triggers on the orders table (migration 5)
+add an order's rows when it moves into 'completed' and subtract them when it
+moves out or is deleted, so the dashboard reads a few hundred rollup rows
+instead of every completed order ever placed. Orders moved to the archive
+(see archive.py) stay counted.
+
+The 'all' dimension has a single empty value and carries the day's totals.
+
+Customers are not a dimension: nearly every order has its own (day,
+customer) row, so that rollup was as big as the orders it summed. Instead
+customer_totals (migration 15) keeps one all-time row per customer, kept up
+by the same triggers, and get_top_customers() reads the first few from its
+index on the order count.
+
+Stage times work the same way at an hourly grain. Status changes record
+started_at and completed_at (migration 12), and when an order is completed
+its queue time (placed to started), make time (started to completed) and
+total time are added to stage_rollups as one count in a duration bucket,
+keyed by the hour the order was placed. Percentiles are not additive, but
+bucket counts are, so any range of hours or days is summed and
+stage_percentile() interpolates p50/p90/p99 within the buckets.
+
+The sales time series behind the dashboard charts (migration 13) keeps order
+counts and revenue per drink in sales_rollups at three grains, the minute,
+hour and day the order was placed, maintained by the same kind of triggers.
+get_sales_timeseries() reads the finest grain that keeps a range within
+TIMESERIES_MAX_POINTS and, past that, sums several days per point.
+"""
+import math
+from datetime import datetime, timedelta
+
+
+# Dimension name -> SQL expression over an orders row. The COALESCE defaults
+# match the labels the dashboard has always used for missing values.
+ROLLUP_DIMENSIONS = [
+    ('all', "''"),
+    ('drink', '{row}.drink'),
+    ('milk', "COALESCE({row}.milk, 'None')"),
+    ('syrup', "COALESCE({row}.syrup, 'None')"),
+    ('foam', "COALESCE({row}.foam, 'Regular')"),
+    ('temperature', '{row}.temperature'),
+]
+
+# Customers listed on the dashboard
+TOP_CUSTOMERS_LIMIT = 5
+
+
+# Stage name -> (start, end) timestamp columns of an orders row
+ORDER_STAGES = [
+    ('queue', '{row}.created_at', '{row}.started_at'),
+    ('make', '{row}.started_at', '{row}.completed_at'),
+    ('total', '{row}.created_at', '{row}.completed_at'),
+]
+
+# Upper bounds of the stage duration buckets, in seconds; longer stages go in the last
+STAGE_BUCKET_SECONDS = (
+    30, 60, 90, 120, 180, 240, 300, 420, 600, 900, 1200, 1800, 2700, 3600, 7200, 14400, 86400
+)
+
+STAGE_PERCENTILES = (50, 90, 99)
+
+
+# Sales grain -> (SQL bucket expression over a timestamp, strptime format, seconds)
+SALES_GRAINS = {
+    'minute': ("strftime('%Y-%m-%d %H:%M', {ts})", '%Y-%m-%d %H:%M', 60),
+    'hour': ("strftime('%Y-%m-%d %H:00', {ts})", '%Y-%m-%d %H:%M', 3600),
+    'day': ('date({ts})', '%Y-%m-%d', 86400),
+}
+
+# Most points get_sales_timeseries() returns; a day of minutes still fits
+TIMESERIES_MAX_POINTS = 1500
+
+
+def _stage_bucket_sql(seconds):
+    cases = ' '.join(f'WHEN {seconds} <= {bound} THEN {bound}' for bound in STAGE_BUCKET_SECONDS[:-1])
+    return f'CASE {cases} ELSE {STAGE_BUCKET_SECONDS[-1]} END'
+
+
+def _stage_durations_sql(row, source=None):
+    """
+    Rows of (hour, stage, seconds), per order of source if given.
+
+    seconds is NULL when either timestamp is (MAX() is NULL if any argument
+    is): stages an order skipped, and every stage of orders completed before
+    migration 12 added the columns. Callers drop those rows, so they never
+    count towards a mean or percentile.
+    """
+    from_clause = f" FROM {source} {row} WHERE {row}.status = 'completed'" if source else ''
+    return ' UNION ALL '.join(
+        f"SELECT strftime('%Y-%m-%d %H:00', {row}.created_at) AS hour, '{name}' AS stage, "
+        f"MAX(0, (julianday({end.format(row=row)}) - julianday({start.format(row=row)})) * 86400) AS seconds"
+        f"{from_clause}"
+        for name, start, end in ORDER_STAGES
+    )
+
+
+def rollup_upsert_sql(row, sign):
+    """
+    Build the statement that adds (or subtracts) one order's rollup rows.
+
+    Args:
+        row (str): 'NEW' or 'OLD' inside a trigger body
+        sign (int): 1 to add the order, -1 to remove it
+
+    Returns:
+        str: INSERT ... ON CONFLICT statement
+    """
+    dimensions = ' UNION ALL '.join(
+        f"SELECT '{name}' AS dimension, {expression.format(row=row)} AS value"
+        for name, expression in ROLLUP_DIMENSIONS
+    )
+    return f"""
+        INSERT INTO completed_rollups
+            (day, dimension, value, order_count, revenue, extra_shots, created_julianday_sum)
+        SELECT date({row}.created_at), d.dimension, d.value,
+               {sign}, {sign} * {row}.price, {sign} * {row}.extra_shot,
+               {sign} * julianday({row}.created_at)
+        FROM ({dimensions}) d
+        WHERE true
+        ON CONFLICT (day, dimension, value) DO UPDATE SET
+            order_count = order_count + excluded.order_count,
+            revenue = revenue + excluded.revenue,
+            extra_shots = extra_shots + excluded.extra_shots,
+            created_julianday_sum = created_julianday_sum + excluded.created_julianday_sum
+    """
+
+
+ROLLUP_PRUNE_SQL = "DELETE FROM completed_rollups WHERE day = date(OLD.created_at) AND order_count <= 0"
+
+
+def customer_total_upsert_sql(row, sign):
+    """
+    Build the statement that adds (or subtracts) one order to its customer's total.
+
+    Args:
+        row (str): 'NEW' or 'OLD' inside a trigger body
+        sign (int): 1 to add the order, -1 to remove it
+
+    Returns:
+        str: INSERT ... ON CONFLICT statement
+    """
+    return f"""
+        INSERT INTO customer_totals (customer_name, order_count, revenue)
+        VALUES ({row}.customer_name, {sign}, {sign} * COALESCE({row}.price, 0))
+        ON CONFLICT (customer_name) DO UPDATE SET
+            order_count = order_count + excluded.order_count,
+            revenue = revenue + excluded.revenue
+    """
+
+
+CUSTOMER_TOTAL_PRUNE_SQL = "DELETE FROM customer_totals WHERE customer_name = OLD.customer_name AND order_count <= 0"
+
+
+def stage_rollup_upsert_sql(row, sign):
+    """
+    Build the statement that adds (or subtracts) one order's stage times.
+
+    Args:
+        row (str): 'NEW' or 'OLD' inside a trigger body
+        sign (int): 1 to add the order, -1 to remove it
+
+    Returns:
+        str: INSERT ... ON CONFLICT statement
+    """
+    return f"""
+        INSERT INTO stage_rollups (hour, stage, bucket, order_count, seconds_sum)
+        SELECT d.hour, d.stage, {_stage_bucket_sql('d.seconds')}, {sign}, {sign} * d.seconds
+        FROM ({_stage_durations_sql(row)}) d
+        WHERE d.seconds IS NOT NULL
+        ON CONFLICT (hour, stage, bucket) DO UPDATE SET
+            order_count = order_count + excluded.order_count,
+            seconds_sum = seconds_sum + excluded.seconds_sum
+    """
+
+
+STAGE_ROLLUP_PRUNE_SQL = (
+    "DELETE FROM stage_rollups WHERE hour = strftime('%Y-%m-%d %H:00', OLD.created_at) AND order_count <= 0"
+)
+
+
+def sales_rollup_upsert_sql(row, sign):
+    """
+    Build the statement that adds (or subtracts) one order at every sales grain.
+
+    Args:
+        row (str): 'NEW' or 'OLD' inside a trigger body
+        sign (int): 1 to add the order, -1 to remove it
+
+    Returns:
+        str: INSERT ... ON CONFLICT statement
+    """
+    grains = ' UNION ALL '.join(
+        f"SELECT '{grain}' AS grain, {expression.format(ts=f'{row}.created_at')} AS bucket"
+        for grain, (expression, _, _) in SALES_GRAINS.items()
+    )
+    return f"""
+        INSERT INTO sales_rollups (grain, bucket, drink, order_count, revenue)
+        SELECT g.grain, g.bucket, {row}.drink, {sign}, {sign} * COALESCE({row}.price, 0)
+        FROM ({grains}) g
+        WHERE true
+        ON CONFLICT (grain, bucket, drink) DO UPDATE SET
+            order_count = order_count + excluded.order_count,
+            revenue = revenue + excluded.revenue
+    """
+
+
+SALES_ROLLUP_PRUNE_SQL = f"""
+    DELETE FROM sales_rollups
+    WHERE grain IN ({', '.join(f"'{grain}'" for grain in SALES_GRAINS)})
+      AND bucket IN ({', '.join(expression.format(ts='OLD.created_at') for expression, _, _ in SALES_GRAINS.values())})
+      AND drink = OLD.drink AND order_count <= 0
+"""
+
+
+def _completed_order_triggers(name, add, remove, prune):
+    """
+    Build the four triggers that keep a rollup of completed orders in step.
+
+    An order is added when it is completed and removed when it is reopened
+    or deleted, unless it was archived.
+
+    Args:
+        name (str): Trigger name part, as in orders_<name>_created
+        add (str): Statement adding NEW
+        remove (str): Statement removing OLD
+        prune (str): Statement deleting the rows OLD emptied
+
+    Returns:
+        list: CREATE TRIGGER statements
+    """
+    return [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS orders_{name}_created AFTER INSERT ON orders
+        WHEN NEW.status = 'completed'
+        BEGIN
+            {add};
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS orders_{name}_completed AFTER UPDATE OF status ON orders
+        WHEN NEW.status = 'completed' AND OLD.status IS NOT 'completed'
+        BEGIN
+            {add};
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS orders_{name}_reopened AFTER UPDATE OF status ON orders
+        WHEN OLD.status = 'completed' AND NEW.status IS NOT 'completed'
+        BEGIN
+            {remove};
+            {prune};
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS orders_{name}_deleted AFTER DELETE ON orders
+        WHEN OLD.status = 'completed' AND NOT EXISTS (SELECT 1 FROM orders_archive WHERE id = OLD.id)
+        BEGIN
+            {remove};
+            {prune};
+        END
+        """,
+    ]
+
+
+def stage_rollup_trigger_sql():
+    """
+    Build the triggers that keep stage_rollups in step with orders.
+
+    Returns:
+        list: CREATE TRIGGER statements
+    """
+    return _completed_order_triggers(
+        'stage', stage_rollup_upsert_sql('NEW', 1), stage_rollup_upsert_sql('OLD', -1), STAGE_ROLLUP_PRUNE_SQL
+    )
+
+
+def customer_total_trigger_sql():
+    """
+    Build the triggers that keep customer_totals in step with orders.
+
+    Returns:
+        list: CREATE TRIGGER statements
+    """
+    return _completed_order_triggers(
+        'customer_total', customer_total_upsert_sql('NEW', 1), customer_total_upsert_sql('OLD', -1),
+        CUSTOMER_TOTAL_PRUNE_SQL
+    )
+
+
+def sales_rollup_trigger_sql():
+    """
+    Build the triggers that keep sales_rollups in step with orders.
+
+    Returns:
+        list: CREATE TRIGGER statements
+    """
+    return _completed_order_triggers(
+        'sales', sales_rollup_upsert_sql('NEW', 1), sales_rollup_upsert_sql('OLD', -1), SALES_ROLLUP_PRUNE_SQL
+    )
+
+
+def rollup_deleted_trigger_sql(keep_archived=False):
+    """
+    Build the trigger that removes a deleted completed order from the rollups.
+
+    Args:
+        keep_archived (bool): Leave orders that were copied to orders_archive
+            in the rollups (see archive.py)
+
+    Returns:
+        str: CREATE TRIGGER statement
+    """
+    condition = "OLD.status = 'completed'"
+    if keep_archived:
+        condition += ' AND NOT EXISTS (SELECT 1 FROM orders_archive WHERE id = OLD.id)'
+    return f"""
+        CREATE TRIGGER IF NOT EXISTS orders_rollup_deleted AFTER DELETE ON orders
+        WHEN {condition}
+        BEGIN
+            {rollup_upsert_sql('OLD', -1)};
+            {ROLLUP_PRUNE_SQL};
+        END
+        """
+
+
+def rollup_trigger_sql(keep_archived=False):
+    """
+    Build the triggers that keep completed_rollups in step with orders.
+
+    Args:
+        keep_archived (bool): As for rollup_deleted_trigger_sql()
+
+    Returns:
+        list: CREATE TRIGGER statements
+    """
+    add, remove = rollup_upsert_sql('NEW', 1), rollup_upsert_sql('OLD', -1)
+    prune = ROLLUP_PRUNE_SQL
+    return [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS orders_rollup_created AFTER INSERT ON orders
+        WHEN NEW.status = 'completed'
+        BEGIN
+            {add};
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS orders_rollup_completed AFTER UPDATE OF status ON orders
+        WHEN NEW.status = 'completed' AND OLD.status IS NOT 'completed'
+        BEGIN
+            {add};
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS orders_rollup_reopened AFTER UPDATE OF status ON orders
+        WHEN OLD.status = 'completed' AND NEW.status IS NOT 'completed'
+        BEGIN
+            {remove};
+            {prune};
+        END
+        """,
+        rollup_deleted_trigger_sql(keep_archived),
+    ]
+
+
+def rebuild_completed_rollups(db, source='orders'):
+    """
+    Recompute completed_rollups from the orders table.
+
+    The caller owns the transaction; run it inside BEGIN IMMEDIATE so no
+    order changes between the delete and the insert.
+
+    Args:
+        db: Database connection
+        source (str): Table or view to read orders from; 'all_orders' also
+            covers archived orders (migration 10 and later)
+    """
+    dimensions = ' UNION ALL '.join(
+        f"SELECT o.created_at, o.price, o.extra_shot, '{name}' AS dimension, "
+        f"{expression.format(row='o')} AS value FROM {source} o WHERE o.status = 'completed'"
+        for name, expression in ROLLUP_DIMENSIONS
+    )
+    db.execute('DELETE FROM completed_rollups')
+    db.execute(f"""
+        INSERT INTO completed_rollups
+            (day, dimension, value, order_count, revenue, extra_shots, created_julianday_sum)
+        SELECT date(created_at), dimension, value, COUNT(*), SUM(price), SUM(extra_shot),
+               SUM(julianday(created_at))
+        FROM ({dimensions})
+        GROUP BY date(created_at), dimension, value
+    """)
+
+
+def rebuild_customer_totals(db, source='orders'):
+    """
+    Recompute customer_totals from the completed orders.
+
+    The caller owns the transaction, as for rebuild_completed_rollups().
+
+    Args:
+        db: Database connection
+        source (str): Table or view to read orders from
+    """
+    db.execute('DELETE FROM customer_totals')
+    db.execute(f"""
+        INSERT INTO customer_totals (customer_name, order_count, revenue)
+        SELECT customer_name, COUNT(*), SUM(COALESCE(price, 0))
+        FROM {source}
+        WHERE status = 'completed'
+        GROUP BY customer_name
+    """)
+
+
+def rebuild_stage_rollups(db, source='orders'):
+    """
+    Recompute stage_rollups from the orders' stage timestamps.
+
+    The caller owns the transaction, as for rebuild_completed_rollups().
+
+    Args:
+        db: Database connection
+        source (str): Table or view to read orders from
+    """
+    db.execute('DELETE FROM stage_rollups')
+    db.execute(f"""
+        INSERT INTO stage_rollups (hour, stage, bucket, order_count, seconds_sum)
+        SELECT d.hour, d.stage, {_stage_bucket_sql('d.seconds')} AS bucket, COUNT(*), SUM(d.seconds)
+        FROM ({_stage_durations_sql('o', source)}) d
+        WHERE d.seconds IS NOT NULL
+        GROUP BY d.hour, d.stage, bucket
+    """)
+
+
+def rebuild_sales_rollups(db, source='orders'):
+    """
+    Recompute sales_rollups from the completed orders.
+
+    The caller owns the transaction, as for rebuild_completed_rollups().
+
+    Args:
+        db: Database connection
+        source (str): Table or view to read orders from
+    """
+    grains = ' UNION ALL '.join(
+        f"SELECT '{grain}' AS grain, {expression.format(ts='o.created_at')} AS bucket, o.drink, o.price "
+        f"FROM {source} o WHERE o.status = 'completed'"
+        for grain, (expression, _, _) in SALES_GRAINS.items()
+    )
+    db.execute('DELETE FROM sales_rollups')
+    db.execute(f"""
+        INSERT INTO sales_rollups (grain, bucket, drink, order_count, revenue)
+        SELECT grain, bucket, drink, COUNT(*), SUM(COALESCE(price, 0))
+        FROM ({grains})
+        GROUP BY grain, bucket, drink
+    """)
+
+
+def stage_percentile(buckets, percentile):
+    """
+    Estimate a percentile from bucket counts.
+
+    Interpolates linearly within the bucket the percentile falls in, so the
+    estimate is off by at most that bucket's width.
+
+    Args:
+        buckets (list): (upper bound in seconds, count) pairs, ascending; empty
+            buckets may be left out
+        percentile (float): 0-100
+
+    Returns:
+        float: Seconds (None if there are no counts)
+    """
+    total = sum(count for _, count in buckets)
+    if total <= 0:
+        return None
+    rank = total * percentile / 100
+    cumulative = 0
+    for upper, count in buckets:
+        if count > 0 and cumulative + count >= rank:
+            lower = max([bound for bound in STAGE_BUCKET_SECONDS if bound < upper], default=0)
+            return lower + (upper - lower) * (rank - cumulative) / count
+        cumulative += count
+    return float(buckets[-1][0])
+
+
+def get_stage_summary(db, start_day=None, end_day=None, group=None):
+    """
+    Stage time counts, means and percentiles over a range of days.
+
+    Args:
+        db: Database connection
+        start_day (str): First day included, 'YYYY-MM-DD' (None for no lower bound)
+        end_day (str): Last day included, 'YYYY-MM-DD' (None for no upper bound)
+        group (str): 'hour' or 'day' for one entry per period, None for the whole range
+
+    Returns:
+        dict: {period: {stage: {'count', 'mean_minutes', 'p50_minutes',
+        'p90_minutes', 'p99_minutes'}}}, periods in order; the only period
+        is '' when not grouped
+    """
+    period = {'hour': 'hour', 'day': 'substr(hour, 1, 10)'}.get(group, "''")
+    rows = db.execute(f"""
+        SELECT {period} AS period, stage, bucket, SUM(order_count) AS count, SUM(seconds_sum) AS seconds
+        FROM stage_rollups
+        WHERE hour >= COALESCE(?, '') AND hour < COALESCE(date(?, '+1 day'), '9999-12-31')
+        GROUP BY 1, stage, bucket
+        HAVING SUM(order_count) > 0
+        ORDER BY 1, stage, bucket
+    """, (start_day, end_day)).fetchall()
+
+    histograms = {}
+    for row in rows:
+        stage = histograms.setdefault(row['period'], {}).setdefault(row['stage'], {'buckets': [], 'seconds': 0.0})
+        stage['buckets'].append((row['bucket'], row['count']))
+        stage['seconds'] += row['seconds']
+
+    summary = {}
+    for period_key, stages in histograms.items():
+        summary[period_key] = {}
+        for name, _, _ in ORDER_STAGES:
+            if name not in stages:
+                continue
+            buckets = stages[name]['buckets']
+            count = sum(bucket_count for _, bucket_count in buckets)
+            figures = {'count': count, 'mean_minutes': round(stages[name]['seconds'] / count / 60, 2)}
+            for percentile in STAGE_PERCENTILES:
+                figures[f'p{percentile}_minutes'] = round(stage_percentile(buckets, percentile) / 60, 2)
+            summary[period_key][name] = figures
+    return summary
+
+
+def get_completed_summary(db, start_day=None, end_day=None):
+    """
+    Aggregate the rollups over a range of days.
+
+    Args:
+        db: Database connection
+        start_day (str): First day included, 'YYYY-MM-DD' (None for no lower bound)
+        end_day (str): Last day included, 'YYYY-MM-DD' (None for no upper bound)
+
+    Returns:
+        dict: {dimension: {value: {'count', 'revenue', 'extra_shots',
+        'created_julianday_sum'}}}, values ordered by count, highest first
+    """
+    rows = db.execute('''
+        SELECT dimension, value, SUM(order_count) AS count, SUM(revenue) AS revenue,
+               SUM(extra_shots) AS extra_shots, SUM(created_julianday_sum) AS created_julianday_sum
+        FROM completed_rollups
+        WHERE day >= COALESCE(?, '') AND day <= COALESCE(?, '9999-12-31')
+        GROUP BY dimension, value
+        HAVING SUM(order_count) > 0
+        ORDER BY dimension, count DESC, value
+    ''', (start_day, end_day)).fetchall()
+
+    summary = {name: {} for name, _ in ROLLUP_DIMENSIONS}
+    for row in rows:
+        summary[row['dimension']][row['value']] = {
+            'count': row['count'],
+            'revenue': row['revenue'] or 0.0,
+            'extra_shots': row['extra_shots'] or 0,
+            'created_julianday_sum': row['created_julianday_sum'] or 0.0,
+        }
+    return summary
+
+
+def get_top_customers(db, start_day=None, end_day=None, limit=TOP_CUSTOMERS_LIMIT):
+    """
+    The customers with the most completed orders.
+
+    Without a range this reads the first rows of customer_totals by its
+    order count index. A range has no rollup to read, so its completed
+    orders are counted, which costs as much as the range is long.
+
+    Args:
+        db: Database connection
+        start_day (str): First day included, 'YYYY-MM-DD' (None for no lower bound)
+        end_day (str): Last day included, 'YYYY-MM-DD' (None for no upper bound)
+        limit (int): Most customers to return
+
+    Returns:
+        list: (customer_name, order count) tuples, most orders first
+    """
+    if start_day is None and end_day is None:
+        rows = db.execute("""
+            SELECT customer_name, order_count FROM customer_totals
+            ORDER BY order_count DESC, customer_name
+            LIMIT ?
+        """, (limit,)).fetchall()
+    else:
+        rows = db.execute("""
+            SELECT customer_name, COUNT(*) AS order_count FROM all_orders
+            WHERE status = 'completed'
+              AND created_at >= COALESCE(?, '') AND created_at < COALESCE(date(?, '+1 day'), '9999-12-31')
+            GROUP BY customer_name
+            ORDER BY order_count DESC, customer_name
+            LIMIT ?
+        """, (start_day, end_day, limit)).fetchall()
+    return [(row['customer_name'], row['order_count']) for row in rows]
+
+
+def get_sales_timeseries(db, start_day, end_day, grain='hour', max_points=TIMESERIES_MAX_POINTS):
+    """
+    Completed orders, revenue and drink mix per time bucket over a range of days.
+
+    If the range has more than max_points buckets at the requested grain, the
+    next coarser grain is used, and past days each point sums several days.
+    Buckets without orders are included as zeros.
+
+    Args:
+        db: Database connection
+        start_day (str): First day included, 'YYYY-MM-DD'
+        end_day (str): Last day included, 'YYYY-MM-DD'
+        grain (str): 'minute', 'hour' or 'day'
+        max_points (int): Most points to return
+
+    Returns:
+        dict: 'grain' and 'step' (buckets per point) actually used, 'drinks'
+        (by orders, highest first) and 'points', each with 't' (bucket
+        start), 'orders', 'revenue' and 'drinks' ({drink: orders})
+    """
+    start = datetime.strptime(start_day, '%Y-%m-%d')
+    end = datetime.strptime(end_day, '%Y-%m-%d') + timedelta(days=1)
+    span_seconds = (end - start).total_seconds()
+
+    grains = list(SALES_GRAINS)
+    for grain in grains[grains.index(grain):]:
+        _, time_format, seconds = SALES_GRAINS[grain]
+        step = max(1, math.ceil(span_seconds / seconds / max_points))
+        if step == 1:
+            break
+    point_seconds = seconds * step
+
+    rows = db.execute("""
+        SELECT bucket, drink, order_count, revenue
+        FROM sales_rollups
+        WHERE grain = ? AND bucket >= ? AND bucket < ? AND order_count > 0
+    """, (grain, start_day, end.strftime('%Y-%m-%d'))).fetchall()
+
+    points = [
+        {'t': (start + timedelta(seconds=i * point_seconds)).strftime(time_format),
+         'orders': 0, 'revenue': 0.0, 'drinks': {}}
+        for i in range(math.ceil(span_seconds / point_seconds))
+    ]
+    drink_totals = {}
+    for row in rows:
+        offset = (datetime.strptime(row['bucket'], time_format) - start).total_seconds()
+        point = points[int(offset // point_seconds)]
+        point['orders'] += row['order_count']
+        point['revenue'] += row['revenue']
+        point['drinks'][row['drink']] = point['drinks'].get(row['drink'], 0) + row['order_count']
+        drink_totals[row['drink']] = drink_totals.get(row['drink'], 0) + row['order_count']
+    for point in points:
+        point['revenue'] = round(point['revenue'], 2)
+
+    return {
+        'grain': grain,
+        'step': step,
+        'drinks': sorted(drink_totals, key=lambda drink: (-drink_totals[drink], drink)),
+        'points': points,
+    }
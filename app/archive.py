@@ -0,0 +1,93 @@
+"""
+Archive of old completed orders.
+
+The live orders table only needs the queue and recent history, but completed
+orders used to stay in it forever. archive_completed_orders() moves completed
+orders older than a cutoff into orders_archive (migration 10) a small batch
+at a time, each batch in its own short write transaction, so order entry
+only ever waits for one batch.
+
+Archived orders keep their id and stay visible wherever history is read:
+the all_orders view is orders UNION ALL orders_archive, orders_archive_fts
+indexes their customer names, drinks and notes, and the rollup delete
+trigger skips orders that were copied to the archive. The live views, the
+order counts and the change log treat an archived order as deleted.
+"""
+import time
+
+
+# Order columns copied to the archive, in the all_orders view's order
+ARCHIVE_COLUMNS = (
+    'id', 'customer_name', 'drink', 'milk', 'syrup', 'foam', 'temperature', 'extra_shot',
+    'notes', 'status', 'price', 'created_at', 'printed_at'
+)
+
+# Stage timestamps migration 12 added to both tables and to the end of the view
+ORDER_STAGE_COLUMNS = ('started_at', 'completed_at')
+
+ARCHIVE_BATCH_SIZE = 500
+ARCHIVE_BATCH_PAUSE_SECONDS = 0.05      # Gap between batches for other writers
+
+
+def archive_batch(db, older_than_days, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Move one batch of the oldest eligible completed orders to the archive.
+
+    Args:
+        db: Read-write database connection with no open transaction
+        older_than_days (int): Archive orders created more than this many days ago
+        batch_size (int): Most orders moved by this call
+
+    Returns:
+        int: Number of orders moved
+    """
+    columns = ', '.join(ARCHIVE_COLUMNS + ORDER_STAGE_COLUMNS)
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        order_ids = [row[0] for row in db.execute('''
+            SELECT id FROM orders
+            WHERE status = 'completed' AND created_at < datetime('now', ?)
+            ORDER BY created_at
+            LIMIT ?
+        ''', (f'-{int(older_than_days)} days', batch_size))]
+        if order_ids:
+            placeholders = ','.join(['?' for _ in order_ids])
+            # Copy before deleting: the rollup trigger checks the archive to
+            # tell an archived order from a deleted one
+            db.execute(f'''
+                INSERT INTO orders_archive ({columns}, archived_at)
+                SELECT {columns}, datetime('now') FROM orders WHERE id IN ({placeholders})
+            ''', order_ids)
+            db.execute(f'DELETE FROM orders WHERE id IN ({placeholders})', order_ids)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(order_ids)
+
+
+def archive_completed_orders(db, older_than_days, batch_size=ARCHIVE_BATCH_SIZE,
+                             pause_seconds=ARCHIVE_BATCH_PAUSE_SECONDS, max_batches=None):
+    """
+    Move completed orders older than a cutoff to the archive, in batches.
+
+    Args:
+        db: Read-write database connection with no open transaction
+        older_than_days (int): Archive orders created more than this many days ago
+        batch_size (int): Orders moved per transaction
+        pause_seconds (float): Sleep between batches so waiting writers get the lock
+        max_batches (int): Stop after this many batches (None to archive everything eligible)
+
+    Returns:
+        int: Number of orders moved
+    """
+    archived = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        moved = archive_batch(db, older_than_days, batch_size)
+        archived += moved
+        batches += 1
+        if moved < batch_size:
+            break
+        time.sleep(pause_seconds)
+    return archived
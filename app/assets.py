@@ -0,0 +1,349 @@
+"""
+Build step for the static assets: bundle, minify, fingerprint, precompress.
+
+Pages used to load each script and the stylesheet from /static under its
+own name, with cache-busting query strings on some of them, so tablets
+revalidated (or refetched) every file on every navigation.
+
+build_assets() concatenates the scripts each page loads into one bundle per
+entry in BUNDLES, strips comments and indentation from the JS and CSS, and
+writes each result to static/dist under a name containing a hash of its
+contents, with .gz and (when the brotli package is installed) .br copies
+next to it. Images are copied under hashed names as they are. The mapping
+from logical name to built file goes to static/dist/manifest.json.
+
+Because a built file's name changes whenever its contents do, it can be
+cached for a year without revalidation; AssetManifest.resolve() maps the
+logical names used in templates, and main.py serves static/dist with
+immutable caching and the precompressed variant the browser accepts.
+Earlier builds are left in place so pages still open on a tablet during a
+deploy keep working.
+
+Build from the app directory with `flask build-assets` (or `python
+assets.py`, which does not load the app); the app also builds on startup
+when the output is missing or older than its sources.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+
+try:
+    import brotli
+except ImportError:  # .br variants are skipped; browsers get the .gz ones
+    brotli = None
+
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# Logical bundle name -> source files under static/, in load order
+BUNDLES = {
+    'js/base.js': ['js/realtime-manager.js', 'js/order-management.js', 'js/auto-print.js'],
+    'js/order-form.js': ['js/refresh.js', 'js/menu-editor.js', 'js/customer-autocomplete.js'],
+    'js/dashboard.js': ['js/chart.js'],
+    'styles.css': ['styles.css'],
+}
+
+# Fingerprinted but otherwise copied as they are
+COPIED_ASSETS = ['logo.png', 'watermark.png']
+
+COMPRESSED_SUFFIXES = ('.js', '.css')
+HASH_LENGTH = 12
+
+# Precompressed variants, in order of preference: (Accept-Encoding token, file suffix)
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+# ---------- Minification ----------
+# Characters after which a '/' starts a regular expression rather than a division
+_JS_REGEX_AFTER = set('(,=:[!&|?{};+-*%<>~^')
+_JS_REGEX_AFTER_WORDS = {
+    'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete', 'void', 'throw',
+    'instanceof', 'yield', 'await',
+}
+# A newline after or before these can never end a statement, so it can go
+_JS_JOIN_AFTER = set('{;,([')
+_JS_JOIN_BEFORE = set('})],;')
+
+
+def _is_word_char(c):
+    return c.isalnum() or c in '_$' or ord(c) > 127
+
+
+class _JsMinifier:
+    """
+    Drop comments and collapse whitespace in JavaScript.
+
+    Strings, template literals (with nested ${...} code) and regular
+    expressions are copied as they are. Newlines are kept wherever automatic
+    semicolon insertion could depend on them.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.pos = 0
+        self.out = []
+        self.pending = None    # Whitespace seen since the last token: None, ' ' or '\n'
+
+    def minify(self):
+        self.code()
+        return ''.join(self.out).strip() + '\n'
+
+    def emit(self, text):
+        if self.pending and self.out:
+            prev, c = self.out[-1][-1], text[0]
+            if self.pending == '\n' and prev not in _JS_JOIN_AFTER and c not in _JS_JOIN_BEFORE:
+                self.out.append('\n')
+            elif (_is_word_char(prev) and _is_word_char(c)) or (prev in '+-' and c in '+-'):
+                self.out.append(' ')
+        self.pending = None
+        self.out.append(text)
+
+    def code(self, until_brace=False):
+        source, depth = self.source, 0
+        while self.pos < len(source):
+            c = source[self.pos]
+            if c.isspace():
+                start = self.pos
+                while self.pos < len(source) and source[self.pos].isspace():
+                    self.pos += 1
+                self.whitespace('\n' in source[start:self.pos])
+            elif c in '"\'':
+                self.string(c)
+            elif c == '`':
+                self.template()
+            elif source.startswith('//', self.pos):
+                end = source.find('\n', self.pos)
+                self.pos = len(source) if end < 0 else end
+            elif source.startswith('/*', self.pos):
+                end = source.find('*/', self.pos + 2)
+                end = len(source) if end < 0 else end + 2
+                self.whitespace('\n' in source[self.pos:end])
+                self.pos = end
+            elif c == '/' and self.regex_allowed():
+                self.regex()
+            elif c == '}' and until_brace and depth == 0:
+                self.emit(c)
+                self.pos += 1
+                return
+            else:
+                depth += (c == '{') - (c == '}')
+                self.emit(c)
+                self.pos += 1
+
+    def whitespace(self, newline):
+        if newline:
+            self.pending = '\n'
+        elif self.pending is None:
+            self.pending = ' '
+
+    def regex_allowed(self):
+        text = ''.join(self.out[-20:]).rstrip()
+        if not text:
+            return True
+        if text[-1] in _JS_REGEX_AFTER:
+            return True
+        word = re.search(r'[\w$]+$', text)
+        return bool(word) and word.group() in _JS_REGEX_AFTER_WORDS
+
+    def copy_until(self, closing, start):
+        """Copy from start through the unescaped closing character."""
+        source, pos, in_class = self.source, start + 1, False
+        while pos < len(source):
+            c = source[pos]
+            if c == '\\':
+                pos += 2
+                continue
+            if closing == '/' and c in '[]':
+                in_class = c == '['
+            elif c == closing and not in_class:
+                break
+            pos += 1
+        self.emit(source[start:pos + 1])
+        self.pos = pos + 1
+
+    def string(self, quote):
+        self.copy_until(quote, self.pos)
+
+    def regex(self):
+        self.copy_until('/', self.pos)
+
+    def template(self):
+        source = self.source
+        start, pos = self.pos, self.pos + 1
+        while pos < len(source):
+            c = source[pos]
+            if c == '\\':
+                pos += 2
+            elif c == '`':
+                break
+            elif source.startswith('${', pos):
+                self.emit(source[start:pos + 2])
+                self.pos = pos + 2
+                self.code(until_brace=True)
+                start = pos = self.pos
+                continue
+            else:
+                pos += 1
+        self.emit(source[start:pos + 1])
+        self.pos = pos + 1
+
+
+def minify_js(source):
+    """
+    Strip comments and redundant whitespace from JavaScript.
+
+    Args:
+        source (str): Script source
+
+    Returns:
+        str: Equivalent script
+    """
+    return _JsMinifier(source).minify()
+
+
+_CSS_STRING_OR_COMMENT = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|/\*.*?\*/', re.S)
+_CSS_STRING = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')')
+
+
+def minify_css(source):
+    """
+    Strip comments and redundant whitespace from CSS.
+
+    Args:
+        source (str): Stylesheet source
+
+    Returns:
+        str: Equivalent stylesheet
+    """
+    source = _CSS_STRING_OR_COMMENT.sub(lambda match: match.group(1) or '', source)
+    parts = _CSS_STRING.split(source)
+    for i in range(0, len(parts), 2):    # Even parts are outside strings
+        text = re.sub(r'\s+', ' ', parts[i])
+        text = re.sub(r' ?([{};,>]) ?', r'\1', text)
+        parts[i] = re.sub(r': ', ':', text).replace(';}', '}')
+    return ''.join(parts).strip() + '\n'
+
+
+# ---------- Build ----------
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(temp_path, 0o644)    # mkstemp creates files only its owner can read
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def _fingerprinted_name(name, data):
+    stem, suffix = os.path.splitext(name)
+    return f'{DIST_DIR}/{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{suffix}'
+
+
+def source_files():
+    """Every file under static/ that the build reads."""
+    return [source for sources in BUNDLES.values() for source in sources] + COPIED_ASSETS
+
+
+def build_assets(static_folder):
+    """
+    Build every bundle and copied asset into static/dist and write the manifest.
+
+    Args:
+        static_folder (str): The app's static directory
+
+    Returns:
+        dict: Logical name -> built path relative to static_folder
+    """
+    outputs = {}
+    for name, sources in BUNDLES.items():
+        texts = []
+        for source in sources:
+            with open(os.path.join(static_folder, source), encoding='utf-8') as f:
+                texts.append(f.read())
+        if name.endswith('.js'):
+            # Separate files so one without a trailing semicolon cannot run into the next
+            text = ';\n'.join(minify_js(text) for text in texts)
+        else:
+            text = ''.join(minify_css(text) for text in texts)
+        outputs[name] = text.encode('utf-8')
+    for name in COPIED_ASSETS:
+        with open(os.path.join(static_folder, name), 'rb') as f:
+            outputs[name] = f.read()
+
+    manifest = {}
+    for name, data in outputs.items():
+        built = _fingerprinted_name(name, data)
+        path = os.path.join(static_folder, built)
+        if not os.path.exists(path):
+            _write_atomic(path, data)
+            if name.endswith(COMPRESSED_SUFFIXES):
+                _write_atomic(path + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+                if brotli is not None:
+                    _write_atomic(path + '.br', brotli.compress(data, quality=11))
+        manifest[name] = built
+
+    _write_atomic(
+        os.path.join(static_folder, DIST_DIR, MANIFEST_NAME),
+        json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8')
+    )
+    return manifest
+
+
+class AssetManifest:
+    """Resolve logical static file names to their fingerprinted builds."""
+
+    def __init__(self, static_folder):
+        """
+        Args:
+            static_folder (str): The app's static directory
+        """
+        self.static_folder = static_folder
+        self.manifest_path = os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)
+        self.files = {}
+        self._loaded_mtime = None
+
+    def is_stale(self):
+        """True if the build is missing or older than any source (or this build step)."""
+        try:
+            built = os.path.getmtime(self.manifest_path)
+        except OSError:
+            return True
+        sources = [os.path.join(self.static_folder, source) for source in source_files()] + [__file__]
+        return any(os.path.getmtime(source) > built for source in sources if os.path.exists(source))
+
+    def ensure_built(self):
+        """Rebuild if stale, then (re)load the manifest if it changed."""
+        if self.is_stale():
+            build_assets(self.static_folder)
+        mtime = os.path.getmtime(self.manifest_path)
+        if mtime != self._loaded_mtime:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                self.files = json.load(f)
+            self._loaded_mtime = mtime
+
+    def resolve(self, filename):
+        """
+        Args:
+            filename (str): Logical name, e.g. 'js/base.js'
+
+        Returns:
+            str: Built path under static/, or filename if it is not built
+        """
+        return self.files.get(filename, filename)
+
+
+if __name__ == '__main__':
+    folder = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+    for logical, built in sorted(build_assets(folder).items()):
+        print(f"{logical} -> {built}")
+    if brotli is None:
+        print("brotli is not installed; wrote .gz variants only")
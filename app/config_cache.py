@@ -0,0 +1,96 @@
+"""
+In-process cache of the menu and settings tables.
+
+The menu and settings change a few times a season but are read on every
+page render and every order. Triggers (migration 7) bump the single row in
+config_version whenever menu_config or settings is written, by any worker.
+ConfigCache keeps the last snapshot it loaded together with that version and
+only reloads when the version in the database has moved, so the steady state
+costs one primary key lookup instead of the menu and settings queries.
+"""
+import threading
+
+
+MENU_ITEM_TYPES = ('drink', 'milk', 'syrup', 'foam')
+
+
+class ConfigSnapshot:
+    """Menu items and settings as of one config_version."""
+
+    def __init__(self, version, rows):
+        """
+        Args:
+            version (int): config_version the rows were read at
+            rows (list): Rows from ConfigCache.LOAD_QUERY
+        """
+        self.version = version
+        self.menu = {item_type: [] for item_type in MENU_ITEM_TYPES}
+        self.drink_prices = {}
+        self.settings = {}
+
+        for row in rows:
+            if row['source'] == 'setting':
+                self.settings[row['item_type']] = row['item_name']
+                continue
+
+            item = {
+                'id': row['id'],
+                'item_type': row['item_type'],
+                'item_name': row['item_name'],
+                'price': row['price'],
+                'created_at': row['created_at'],
+            }
+            self.menu.setdefault(item['item_type'], []).append(item)
+            # Rows arrive in id order, so the oldest item wins a duplicate name,
+            # matching the fetchone() lookup this replaces
+            if item['item_type'] == 'drink':
+                self.drink_prices.setdefault(item['item_name'], item['price'])
+
+        for items in self.menu.values():
+            items.sort(key=lambda item: item['item_name'])
+
+
+class ConfigCache:
+    """Process-wide ConfigSnapshot, reloaded when config_version moves."""
+
+    # One statement, so the version and the rows come from the same snapshot
+    LOAD_QUERY = '''
+        SELECT 'menu' AS source, id, item_type, item_name, price, created_at,
+               (SELECT version FROM config_version WHERE id = 1) AS version
+        FROM menu_config
+        UNION ALL
+        SELECT 'setting', id, setting_key, setting_value, NULL, created_at,
+               (SELECT version FROM config_version WHERE id = 1)
+        FROM settings
+        ORDER BY 1, 2
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self.reloads = 0
+
+    def get(self, db):
+        """
+        Get the current menu and settings.
+
+        Args:
+            db: Database connection
+
+        Returns:
+            ConfigSnapshot: Treat as read-only; it is shared between threads
+        """
+        version = db.execute('SELECT version FROM config_version WHERE id = 1').fetchone()[0]
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+
+        rows = db.execute(self.LOAD_QUERY).fetchall()
+        # An empty menu and settings still has a version
+        loaded_version = rows[0]['version'] if rows else version
+        snapshot = ConfigSnapshot(loaded_version, rows)
+        with self._lock:
+            if self._snapshot is None or self._snapshot.version <= loaded_version:
+                self._snapshot = snapshot
+            self.reloads += 1
+        return snapshot
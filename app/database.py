@@ -0,0 +1,94 @@
+"""
+Persistent, tuned SQLite connections.
+
+Opening a connection per request throws away SQLite's page cache and the
+prepared statement cache every time. Instead each worker thread keeps one
+read-write and one read-only connection open for its whole life, configured
+once by connect(). The database runs in WAL mode, so the read-only
+connections that serve GET requests never wait behind a writer.
+"""
+import os
+import sqlite3
+import threading
+
+
+BUSY_TIMEOUT_MS = 5000          # Wait this long for a competing writer before SQLITE_BUSY
+CACHE_SIZE_KIB = 16384          # Page cache per connection (negative cache_size is KiB)
+MMAP_SIZE_BYTES = 64 * 1024 * 1024
+CACHED_STATEMENTS = 256         # Prepared statements kept per connection
+
+
+def connect(database, readonly=False):
+    """
+    Open a connection with the pragmas every connection should have.
+
+    Args:
+        database (str): Path to the SQLite database
+        readonly (bool): Open the database read-only
+
+    Returns:
+        sqlite3.Connection: Connection with rows returned as sqlite3.Row
+    """
+    if readonly:
+        db = sqlite3.connect(
+            f'file:{os.path.abspath(database)}?mode=ro', uri=True,
+            cached_statements=CACHED_STATEMENTS
+        )
+    else:
+        db = sqlite3.connect(database, cached_statements=CACHED_STATEMENTS)
+    db.row_factory = sqlite3.Row
+
+    db.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+    if not readonly:
+        # journal_mode is stored in the database file, so this is a no-op
+        # after the first connection switches it
+        db.execute('PRAGMA journal_mode = WAL')
+    db.execute('PRAGMA synchronous = NORMAL')
+    db.execute(f'PRAGMA cache_size = -{CACHE_SIZE_KIB}')
+    db.execute(f'PRAGMA mmap_size = {MMAP_SIZE_BYTES}')
+    db.execute('PRAGMA temp_store = MEMORY')
+    return db
+
+
+class ConnectionPool:
+    """One read-write and one read-only connection per worker thread."""
+
+    def __init__(self, database):
+        """
+        Args:
+            database (str): Path to the SQLite database
+        """
+        self.database = database
+        self._local = threading.local()
+
+    def get(self, readonly=False):
+        """
+        Get this thread's connection, opening it on first use.
+
+        Args:
+            readonly (bool): Return the read-only connection
+
+        Returns:
+            sqlite3.Connection: Pooled connection; do not close it
+        """
+        # A forked worker must not reuse its parent's connections
+        if getattr(self._local, 'pid', None) != os.getpid():
+            self._local.pid = os.getpid()
+            self._local.connections = {}
+
+        db = self._local.connections.get(readonly)
+        if db is None:
+            db = self._local.connections[readonly] = connect(self.database, readonly)
+        return db
+
+    @staticmethod
+    def release(db):
+        """
+        Return a connection to the pool at the end of a request.
+
+        Rolls back anything the request left uncommitted, so the next request
+        on this thread starts clean and no write lock is held in between.
+        """
+        if db.in_transaction:
+            db.rollback()
+        db.set_trace_callback(None)
@@ -1,18 +1,40 @@
-from flask import Flask, g, render_template, request, redirect, url_for, Response, make_response, send_file, session, flash, jsonify
+from flask import Flask, g, has_request_context, render_template, request, redirect, url_for, Response, make_response, send_file, send_from_directory, session, flash, jsonify, stream_with_context
 import time
+from datetime import datetime, timedelta, timezone
+import click
 import hashlib
+import hmac
+import json
 from flask_wtf.csrf import CSRFProtect, generate_csrf
 import sqlite3
 import csv
+import zlib
 from io import StringIO
 import os
 import io
+import mimetypes
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit
 from functools import wraps
 from werkzeug.security import generate_password_hash, check_password_hash
-from reportlab.lib.units import inch
-from reportlab.pdfgen import canvas
 from dotenv import load_dotenv
 from security_utils import InputValidator, require_valid_id, SecureDatabase
+from order_events import OrderEventBroadcaster
+from database import ConnectionPool, connect
+from labels import LabelRenderer
+from config_cache import ConfigCache
+from metrics import InstrumentedConnection, Metrics
+from pagination import decode_page_token, encode_page_token, keyset_condition, parse_page_size, split_page
+from analytics import (
+    SALES_GRAINS, get_completed_summary, get_sales_timeseries, get_stage_summary, get_top_customers,
+    rebuild_completed_rollups, rebuild_customer_totals, rebuild_sales_rollups, rebuild_stage_rollups
+)
+from assets import DIST_DIR, ENCODINGS, AssetManifest, build_assets
+from archive import ARCHIVE_BATCH_SIZE, ARCHIVE_COLUMNS, archive_completed_orders
+from migrations import apply_migrations, explain_query_plan, find_table_scans, find_temp_sorts
+from write_queue import WriteQueue
+from query_diagnostics import QUERY_BUDGET_EXCEEDED_HEADER, QUERY_COUNT_HEADER, SlowQueryLog, check_query_budget
 
 app = Flask(__name__)
 
@@ -26,6 +48,74 @@ if os.path.exists('/app'):  # Running in Docker container
 else:  # Running locally
     DATABASE = os.getenv('DATABASE_PATH', 'db.sqlite3')
 
+# Server-Sent Events settings for /api/orders/stream
+SSE_HEARTBEAT_SECONDS = 15     # Keepalive comment interval so proxies keep the stream open
+SSE_STREAM_MAX_SECONDS = 300   # Streams end periodically and the browser reconnects
+SSE_RETRY_MS = 3000            # Reconnect delay sent to EventSource clients
+
+# Workers share request and query metrics through this directory (see metrics.py);
+# /metrics requires METRICS_TOKEN as a bearer token, or a logged-in session if unset
+METRICS_DIR = os.getenv('METRICS_DIR')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+# QUERY_DIAGNOSTICS=1 logs statements slower than SLOW_QUERY_MS with their query
+# plans and checks each request against QUERY_BUDGETS (see query_diagnostics.py)
+QUERY_DIAGNOSTICS = os.getenv('QUERY_DIAGNOSTICS', '').lower() in ('1', 'true', 'yes')
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '100'))
+app.config['QUERY_DIAGNOSTICS'] = QUERY_DIAGNOSTICS
+
+# Most statements each endpoint may run, cache loads included; a request that
+# runs more is logged in diagnostics mode and fails flask check-query-budgets
+# and tests/test_query_budgets.py (writes count when WRITE_QUEUE=0 runs them on
+# the request's connection). A change that adds a statement to a route updates
+# its entry in the same commit; the ETag lookup of the live routes counts too.
+QUERY_BUDGETS = {
+    'index': 2,
+    'in_progress_orders': 1,
+    'orders': 3,                # orders, config_version and the config load (wait time thresholds)
+    'completed_orders': 5,
+    'order': 4,
+    'api_orders_batch': 5,
+    'api_orders_bulk': 4,
+    'update_status': 2,
+    'create_label': 3,          # BEGIN, orders, printed_at (when WRITE_QUEUE=0)
+    'api_order_count': 1,
+    'api_orders_live': 4,       # data_version (ETag), order_events, orders, order_counts
+    'api_orders_pending': 2,    # data_version (ETag), orders
+    'api_customers': 1,
+    'api_customers_suggest': 1,
+    'api_customer_history': 2,
+    'api_stage_times': 2,
+    'api_sales_timeseries': 2,  # data_version (ETag), sales_rollups
+}
+
+# Order, status, menu and settings writes go through one writer thread per
+# worker that commits the writes queued behind each other together, optionally
+# waiting WRITE_GROUP_COMMIT_MS for more (see write_queue.py); WRITE_QUEUE=0
+# commits each on the request's connection
+WRITE_QUEUE_ENABLED = os.getenv('WRITE_QUEUE', '1').lower() not in ('0', 'false', 'no')
+WRITE_GROUP_COMMIT_MS = float(os.getenv('WRITE_GROUP_COMMIT_MS', '0'))
+
+# Completed orders older than this move to orders_archive (flask archive-orders)
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '30'))
+
+order_event_broadcaster = OrderEventBroadcaster(DATABASE)
+db_pool = ConnectionPool(DATABASE)
+config_cache = ConfigCache()
+metrics = Metrics(METRICS_DIR)
+slow_query_log = SlowQueryLog(SLOW_QUERY_MS)
+write_queue = WriteQueue(
+    lambda: InstrumentedConnection(connect(DATABASE), metrics, slow_query_log if QUERY_DIAGNOSTICS else None),
+    window_seconds=WRITE_GROUP_COMMIT_MS / 1000
+)
+label_renderer = LabelRenderer(os.path.join(app.root_path, 'static', 'watermark.png'))
+
+# Fingerprinted bundles under static/dist (see assets.py) never change once
+# built, so browsers may keep them for a year without revalidating
+ASSET_MAX_AGE_SECONDS = 365 * 24 * 3600
+asset_manifest = AssetManifest(app.static_folder)
+asset_manifest.ensure_built()
+
 # ---------- Hardcoded Users (for demonstration) ----------
 username = os.getenv('APP_USERNAME', 'admin')  # default to 'admin' if not set
 password = os.getenv('APP_PASSWORD', 'password123')  # default password
@@ -38,18 +128,54 @@ users = {
 csrf = CSRFProtect(app)
 
 # ---------- Database Helpers ----------
-def get_db():
-    db = getattr(g, '_database', None)
+def get_db(readonly=None):
+    """
+    Get this request's pooled connection.
+
+    GET requests only read, so by default they use the read-only connection
+    and never queue behind a writer (see database.py). Pass readonly=False
+    for the few GET routes that also record something.
+    """
+    if readonly is None:
+        readonly = has_request_context() and request.method in ('GET', 'HEAD')
+    databases = g.setdefault('_databases', {})
+    db = databases.get(readonly)
     if db is None:
-        db = g._database = sqlite3.connect(DATABASE)
-        db.row_factory = sqlite3.Row
+        db = databases[readonly] = InstrumentedConnection(
+            db_pool.get(readonly=readonly), metrics,
+            slow_query_log if app.config['QUERY_DIAGNOSTICS'] else None
+        )
+        if app.config.get('QUERY_TRACE_CALLBACK'):
+            db.set_trace_callback(app.config['QUERY_TRACE_CALLBACK'])
     return db
 
+def run_write(fn):
+    """
+    Run a write and commit it, through the write queue unless it is disabled.
+
+    Args:
+        fn: Function taking a read-write connection, already inside a
+            BEGIN IMMEDIATE transaction; must not commit
+
+    Returns:
+        Whatever fn returned, once committed
+    """
+    if WRITE_QUEUE_ENABLED:
+        return write_queue.submit(fn)
+    db = get_db(readonly=False)
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        result = fn(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return result
+
 @app.teardown_appcontext
 def close_connection(exception):
-    db = getattr(g, '_database', None)
-    if db is not None:
-        db.close()
+    for db in g.pop('_databases', {}).values():
+        db_pool.release(db)
 
 def create_tables():
     try:
@@ -62,56 +188,17 @@ def create_tables():
         if not os.path.exists(DATABASE):
             open(DATABASE, 'a').close()
         
-        db = sqlite3.connect(DATABASE)
-        db.execute("""
-            CREATE TABLE IF NOT EXISTS orders (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                customer_name TEXT NOT NULL,
-                drink TEXT NOT NULL,
-                milk TEXT NOT NULL,
-                syrup TEXT,
-                foam TEXT,
-                temperature TEXT NOT NULL,
-                extra_shot INTEGER NOT NULL,
-                notes TEXT,
-                status TEXT NOT NULL,
-                price REAL NOT NULL,
-                created_at TEXT NOT NULL
-            )
-        """)
-        
-        # Add syrup and foam columns if they don't exist (for existing databases)
-        try:
-            db.execute("ALTER TABLE orders ADD COLUMN syrup TEXT")
-        except sqlite3.OperationalError:
-            pass  # Column already exists
+        # Bring the schema up to date; see migrations.py
+        applied = apply_migrations(DATABASE)
+        if applied:
+            print(f"Applied schema migrations: {applied}")
         
-        try:
-            db.execute("ALTER TABLE orders ADD COLUMN foam TEXT")
-        except sqlite3.OperationalError:
-            pass  # Column already exists
+        # Also switches the database to WAL before any worker serves requests
+        db = connect(DATABASE)
         
-        # Create menu configuration table
-        db.execute("""
-            CREATE TABLE IF NOT EXISTS menu_config (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                item_type TEXT NOT NULL,
-                item_name TEXT NOT NULL,
-                price REAL,
-                created_at TEXT NOT NULL
-            )
-        """)
-        
-        # Create settings table for wait time thresholds
-        db.execute("""
-            CREATE TABLE IF NOT EXISTS settings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                setting_key TEXT NOT NULL UNIQUE,
-                setting_value TEXT NOT NULL,
-                created_at TEXT NOT NULL,
-                updated_at TEXT NOT NULL
-            )
-        """)
+        # The change log only needs to cover clients that were recently connected;
+        # older cursors get a full snapshot from /api/orders/live
+        db.execute("DELETE FROM order_events WHERE created_at < datetime('now', '-7 days')")
         
         # Insert default menu items if table is empty
         existing_items = db.execute("SELECT COUNT(*) FROM menu_config").fetchone()[0]
@@ -179,31 +266,134 @@ def init_db():
 init_db()
 
 # ---------- Settings Helpers ----------
+def get_config():
+    """Get the cached menu and settings, checked against config_version once per request"""
+    config = getattr(g, '_config', None)
+    if config is None:
+        config = g._config = config_cache.get(get_db())
+    return config
+
 def get_wait_time_thresholds():
-    """Get current wait time thresholds from database"""
-    db = get_db()
-    yellow_threshold = db.execute(
-        "SELECT setting_value FROM settings WHERE setting_key = 'wait_time_yellow_threshold'"
-    ).fetchone()
-    red_threshold = db.execute(
-        "SELECT setting_value FROM settings WHERE setting_key = 'wait_time_red_threshold'"
-    ).fetchone()
+    """Get current wait time thresholds from the settings cache"""
+    settings = get_config().settings
+    yellow_threshold = settings.get('wait_time_yellow_threshold')
+    red_threshold = settings.get('wait_time_red_threshold')
     
     return {
-        'yellow': int(yellow_threshold[0]) if yellow_threshold else 5,
-        'red': int(red_threshold[0]) if red_threshold else 10
+        'yellow': int(yellow_threshold) if yellow_threshold else 5,
+        'red': int(red_threshold) if red_threshold else 10
     }
 
 def update_wait_time_threshold(threshold_type, value):
     """Update a wait time threshold setting"""
-    db = get_db()
     setting_key = f'wait_time_{threshold_type}_threshold'
-    
-    db.execute(
+    run_write(lambda db: db.execute(
         "UPDATE settings SET setting_value = ?, updated_at = datetime('now') WHERE setting_key = ?",
         (str(value), setting_key)
-    )
-    db.commit()
+    ))
+
+# ---------- Order Count Helpers ----------
+def get_order_counts(db):
+    """Get order counts by status from the order_counts row the triggers maintain"""
+    row = db.execute('SELECT pending, in_progress, completed FROM order_counts WHERE id = 1').fetchone()
+    counts = {
+        'pending': row['pending'] if row else 0,
+        'in_progress': row['in_progress'] if row else 0,
+        'completed': row['completed'] if row else 0
+    }
+    counts['total'] = counts['pending'] + counts['in_progress'] + counts['completed']
+    return counts
+
+def get_data_version(db):
+    """Get the version triggers bump on every order, menu and settings write"""
+    row = db.execute('SELECT version FROM data_version WHERE id = 1').fetchone()
+    return row[0] if row else 0
+
+def live_etag(db, *request_key, wait_times=False):
+    """
+    ETag for a live endpoint response, from the data version.
+
+    Args:
+        db: Database connection
+        *request_key: Everything besides the data that shapes the response
+        wait_times (bool): The response carries wait_time_minutes, which grow
+            without any write; the current minute is added so they do not
+            stay frozen at their value when the data last changed
+
+    Returns:
+        tuple: (etag, True if the client's If-None-Match already has it)
+    """
+    parts = (request.endpoint, *request_key, get_data_version(db))
+    if wait_times:
+        parts += (int(time.time() // 60),)
+    key = ':'.join(str(part) for part in parts)
+    etag = hashlib.md5(key.encode()).hexdigest()
+    return etag, request.headers.get('If-None-Match') == etag
+
+def count_orders_by_status(db):
+    """Count orders by status straight from the orders table (used to verify order_counts)"""
+    row = db.execute('''
+        SELECT COALESCE(SUM(status = 'pending'), 0) AS pending,
+               COALESCE(SUM(status = 'in_progress'), 0) AS in_progress,
+               COALESCE(SUM(status = 'completed'), 0) AS completed
+        FROM orders
+    ''').fetchone()
+    counts = {'pending': row['pending'], 'in_progress': row['in_progress'], 'completed': row['completed']}
+    counts['total'] = counts['pending'] + counts['in_progress'] + counts['completed']
+    return counts
+
+# ---------- Pagination Helpers ----------
+# Order lists are paged by keyset (see pagination.py)
+ORDERS_PAGE_SIZE = 50
+ORDERS_MAX_PAGE_SIZE = 200
+ACTIVE_QUEUE_LIMIT = 200    # Default page of /api/orders/pending; the queue is rarely longer
+
+STATUS_RANK_SQL = "CASE status WHEN 'pending' THEN 1 WHEN 'in_progress' THEN 2 WHEN 'completed' THEN 3 END"
+STATUS_RANK = {'pending': 1, 'in_progress': 2, 'completed': 3}
+
+def select_page_by_status(db, select_sql, params, statuses, sort_keys, after, limit):
+    """
+    Fetch a page of orders sorted by status rank, then by sort_keys.
+
+    Ordering by STATUS_RANK_SQL makes SQLite sort every matching row, so each
+    status is read by its own UNION ALL arm, which idx_orders_status_created_at
+    serves in order and which stops after limit + 1 rows; the arms are then
+    merged here.
+
+    Args:
+        db: Database connection
+        select_sql (str): 'SELECT ... FROM orders WHERE ...' to AND each arm's conditions onto
+        params (list): Parameters for select_sql
+        statuses (iterable): Statuses to include
+        sort_keys (list): (column, direction) pairs after the rank, all in one
+            direction; the last must be unique
+        after (list): Page token values [rank, *sort key values], or None
+        limit (int): Page size
+
+    Returns:
+        list: Up to limit + 1 rows, for split_page with [rank, *sort key values]
+    """
+    arms, arm_params = [], []
+    for status in sorted(set(statuses), key=STATUS_RANK.get):
+        rank = STATUS_RANK[status]
+        condition, condition_params = 'status = ?', [status]
+        if after and rank < after[0]:
+            continue
+        if after and rank == after[0]:
+            keyset, keyset_params = keyset_condition(sort_keys, after[1:])
+            condition += f' AND {keyset}'
+            condition_params += keyset_params
+        order_by = ', '.join(f'{column} {direction.upper()}' for column, direction in sort_keys)
+        arms.append(f'SELECT * FROM ({select_sql} AND {condition} ORDER BY {order_by} LIMIT ?)')
+        arm_params += list(params) + condition_params + [limit + 1]
+    if not arms:
+        return []
+
+    rows = db.execute(' UNION ALL '.join(arms), arm_params).fetchall()
+    columns = [column.split('.')[-1] for column, _ in sort_keys]
+    rows.sort(key=lambda row: [row[column] for column in columns], reverse=sort_keys[0][1] == 'desc')
+    rows.sort(key=lambda row: STATUS_RANK[row['status']])
+    return rows[:limit + 1]
 
 # ---------- Login Helpers ----------
 def login_required(f):
@@ -214,12 +404,65 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+@app.before_request
+def start_request_timer():
+    g._request_started = time.perf_counter()
+    g._statements_started = count_statements()
+
+def count_statements():
+    """Statements run so far on the connections get_db() handed out in this context"""
+    return sum(db.statement_count for db in g.get('_databases', {}).values())
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('_request_started', None)
+    if started is not None:
+        metrics.observe_request(
+            request.endpoint or 'unmatched', request.method, response.status_code,
+            time.perf_counter() - started
+        )
+        metrics.maybe_flush()
+    if app.config['QUERY_DIAGNOSTICS']:
+        # Streamed responses run their queries later and are not counted here
+        statement_count = count_statements() - g.pop('_statements_started', 0)
+        check_query_budget(response, statement_count, QUERY_BUDGETS)
+    return response
+
 @app.after_request
 def add_csrf_header(response):
     if 'text/html' in response.headers.get('Content-Type', ''):
         response.set_cookie('csrf_token', generate_csrf())
     return response
 
+# ---------- Static Assets ----------
+@app.template_global()
+def asset_url(endpoint, **values):
+    """url_for() that points static files at their fingerprinted builds"""
+    if endpoint == 'static' and 'filename' in values:
+        if app.debug:
+            asset_manifest.ensure_built()  # Pick up edits to the sources
+        values['filename'] = asset_manifest.resolve(values['filename'])
+    return url_for(endpoint, **values)
+
+@app.route(f'/static/{DIST_DIR}/<path:filename>')
+def fingerprinted_static(filename):
+    """Built assets, precompressed if the browser accepts it, cached as immutable"""
+    directory = os.path.join(app.static_folder, DIST_DIR)
+    variant, encoding = filename, None
+    for candidate, suffix in ENCODINGS:
+        if request.accept_encodings[candidate] and os.path.isfile(os.path.join(directory, filename + suffix)):
+            variant, encoding = filename + suffix, candidate
+            break
+    
+    response = send_from_directory(
+        directory, variant, mimetype=mimetypes.guess_type(filename)[0], max_age=ASSET_MAX_AGE_SECONDS
+    )
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.immutable = True
+    return response
+
 # ---------- Auth Routes ----------
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -245,84 +488,130 @@ def logout():
 @app.route('/')
 @login_required
 def index():
-    db = get_db()
-    orders = db.execute('SELECT * FROM orders ORDER BY created_at DESC').fetchall()
-    drinks = db.execute('SELECT * FROM menu_config WHERE item_type = "drink" ORDER BY item_name').fetchall()
-    milks = db.execute('SELECT * FROM menu_config WHERE item_type = "milk" ORDER BY item_name').fetchall()
-    syrups = db.execute('SELECT * FROM menu_config WHERE item_type = "syrup" ORDER BY item_name').fetchall()
-    foams = db.execute('SELECT * FROM menu_config WHERE item_type = "foam" ORDER BY item_name').fetchall()
-    return render_template('index.html', orders=orders, drinks=drinks, milks=milks, syrups=syrups, foams=foams)
+    # The active queue on this page is loaded from /api/orders/pending
+    menu = get_config().menu
+    return render_template('index.html', drinks=menu['drink'], milks=menu['milk'], syrups=menu['syrup'], foams=menu['foam'])
 
 @app.route('/in_progress')
 @login_required
 def in_progress_orders():
-    db = get_db()
-    orders = db.execute('SELECT * FROM orders ORDER BY created_at DESC').fetchall()
-    in_progress = [o for o in orders if o['status'] != 'completed']
-    return render_template('in_progress.html', orders=in_progress)
+    limit = parse_page_size(request.args.get('limit'), ORDERS_PAGE_SIZE, ORDERS_MAX_PAGE_SIZE)
+    sort_keys = [('created_at', 'desc'), ('id', 'desc')]
+    try:
+        after = decode_page_token(request.args.get('page'), len(sort_keys))
+    except ValueError as e:
+        flash(str(e))
+        return redirect(url_for('in_progress_orders'))
+    
+    # Without ANALYZE statistics SQLite would look each status up in
+    # idx_orders_status_created_at and sort the merged rows instead
+    query = "SELECT * FROM orders INDEXED BY idx_orders_active_queue WHERE status IN ('pending', 'in_progress')"
+    params = []
+    if after:
+        condition, condition_params = keyset_condition(sort_keys, after)
+        query += f' AND {condition}'
+        params.extend(condition_params)
+    query += ' ORDER BY created_at DESC, id DESC LIMIT ?'
+    
+    rows = get_db().execute(query, params + [limit + 1]).fetchall()
+    in_progress, next_page = split_page(rows, limit, lambda o: [o['created_at'], o['id']])
+    return render_template('in_progress.html', orders=in_progress, next_page=next_page, is_first_page=after is None)
 
-@app.route('/order', methods=['POST'])
-@login_required
-def order():
-    # Validate and sanitize all inputs
-    customer_name = request.form['customer_name']
-    drink = request.form['drink']
-    milk = request.form.get('milk')
-    syrup = request.form.get('syrup')
-    foam = request.form.get('foam')
-    temperature = request.form.get('temperature')
-    notes = request.form.get('notes', '')
-    extra_shot = request.form.get('extra_shot') == 'true'
+# ---------- Order Placement Helpers ----------
+# Status changes record when each order was started and completed (migration 12).
+# ?1 is the new status and the remaining parameters are order ids.
+ORDER_STATUS_UPDATE_SQL = '''
+    UPDATE orders SET
+        status = ?1,
+        started_at = CASE ?1 WHEN 'pending' THEN NULL
+                             WHEN 'in_progress' THEN COALESCE(started_at, datetime('now'))
+                             ELSE started_at END,
+        completed_at = CASE WHEN ?1 = 'completed' THEN COALESCE(completed_at, datetime('now')) END
+    WHERE status IS NOT ?1 AND id IN ({placeholders})
+'''
+
+# Most line items one /api/orders/batch request may place
+ORDER_BATCH_LIMIT = 100
+ORDER_REQUIRED_FIELDS = ('drink', 'milk', 'temperature')   # NOT NULL in orders besides the name
+# Most orders one /api/orders/bulk request may change
+ORDER_BULK_LIMIT = 200
 
-    # Validate customer name
+INSERT_ORDER_SQL = '''
+    INSERT INTO orders 
+    (customer_name, drink, milk, syrup, foam, temperature, extra_shot, notes, status, price, created_at) 
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'pending', ?, datetime("now"))
+'''
+
+def validate_order_fields(customer_name, drink, milk, syrup, foam, temperature, notes, menu_item_errors=None):
+    """
+    Validate one drink order's text fields.
+
+    Args:
+        menu_item_errors (dict): Optional cache of menu item name -> error
+            (None if valid), so a batch validates each name once
+
+    Returns:
+        tuple: (sanitized customer name, sanitized notes, error message or None)
+    """
     is_valid, sanitized_name, error = InputValidator.validate_customer_name(customer_name)
     if not is_valid:
-        flash(f"Invalid customer name: {error}")
-        return redirect(url_for('index'))
+        return None, None, f"Invalid customer name: {error}"
     
     # Validate menu items (drink, milk, syrup, foam)
     for item_name, item_type in [(drink, 'drink'), (milk, 'milk'), (syrup, 'syrup'), (foam, 'foam')]:
         if item_name:  # Only validate if not None/empty
-            is_valid, _, error = InputValidator.validate_menu_item(item_name)
-            if not is_valid:
-                flash(f"Invalid {item_type}: {error}")
-                return redirect(url_for('index'))
+            if menu_item_errors is not None and item_name in menu_item_errors:
+                error = menu_item_errors[item_name]
+            else:
+                error = InputValidator.validate_menu_item(item_name)[2]
+                if menu_item_errors is not None:
+                    menu_item_errors[item_name] = error
+            if error:
+                return None, None, f"Invalid {item_type}: {error}"
     
-    # Validate temperature
     if temperature and temperature not in ['Hot', 'Iced']:
-        flash("Invalid temperature selection")
-        return redirect(url_for('index'))
+        return None, None, "Invalid temperature selection"
     
-    # Validate notes
     is_valid, sanitized_notes, error = InputValidator.validate_notes(notes)
     if not is_valid:
-        flash(f"Invalid notes: {error}")
-        return redirect(url_for('index'))
+        return None, None, f"Invalid notes: {error}"
+    return sanitized_name, sanitized_notes, None
 
-    db = get_db()
-    
-    # Get price from database
-    drink_price = db.execute(
-        'SELECT price FROM menu_config WHERE item_type = "drink" AND item_name = ?', 
-        (drink,)
-    ).fetchone()
-    
-    price = drink_price['price'] if drink_price and drink_price['price'] else 0.0
+def order_price(drink_prices, drink, extra_shot):
+    """Price of one drink from the menu cache's drink prices"""
+    price = drink_prices.get(drink) or 0.0
     if extra_shot:
         price += 1.0
+    return price
 
-    cursor = db.execute(
-        '''
-        INSERT INTO orders 
-        (customer_name, drink, milk, syrup, foam, temperature, extra_shot, notes, status, price, created_at) 
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, datetime("now"))
-        ''',
-        (sanitized_name, drink, milk, syrup, foam, temperature, int(extra_shot), sanitized_notes, 'pending', price)
+@app.route('/order', methods=['POST'])
+@login_required
+def order():
+    # Validate and sanitize all inputs
+    customer_name = request.form['customer_name']
+    drink = request.form['drink']
+    milk = request.form.get('milk')
+    syrup = request.form.get('syrup')
+    foam = request.form.get('foam')
+    temperature = request.form.get('temperature')
+    notes = request.form.get('notes', '')
+    extra_shot = request.form.get('extra_shot') == 'true'
+
+    sanitized_name, sanitized_notes, error = validate_order_fields(
+        customer_name, drink, milk, syrup, foam, temperature, notes
     )
-    db.commit()
-    
-    # Get the newly created order ID
-    order_id = cursor.lastrowid
+    if error:
+        flash(error)
+        return redirect(url_for('index'))
+
+    # Get price from the menu cache
+    price = order_price(get_config().drink_prices, drink, extra_shot)
+
+    order_id = run_write(lambda db: db.execute(
+        INSERT_ORDER_SQL,
+        (sanitized_name, drink, milk, syrup, foam, temperature, int(extra_shot), sanitized_notes, price)
+    ).lastrowid)
+    order_event_broadcaster.notify()
     
     # Check if this is an AJAX request
     if request.headers.get('Accept') == 'application/json' or request.form.get('ajax') == 'true':
@@ -337,6 +626,86 @@ def order():
     
     return redirect(url_for('index'))
 
+@app.route('/api/orders/batch', methods=['POST'])
+@login_required
+def api_orders_batch():
+    """Place a group order: many drinks, for one or more customers, in one transaction.
+
+    The JSON body is ``{"customer_name": ..., "orders": [{...}, ...]}``. Each
+    item takes the same fields as ``/order`` (``customer_name``, ``drink``,
+    ``milk``, ``syrup``, ``foam``, ``temperature``, ``notes``, ``extra_shot``);
+    items without a customer name use the top-level one, and ``drink``,
+    ``milk`` and ``temperature`` are required. Every item is
+    validated before anything is written, so a batch is placed whole or not
+    at all.
+    """
+    data = request.get_json(silent=True)
+    items = data.get('orders') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'Expected a JSON object with a non-empty "orders" list'}), 400
+    if len(items) > ORDER_BATCH_LIMIT:
+        return jsonify({'error': f'At most {ORDER_BATCH_LIMIT} orders per batch'}), 400
+    default_customer = data.get('customer_name')
+    
+    drink_prices = get_config().drink_prices  # One menu read for the whole batch
+    menu_item_errors = {}
+    rows = []
+    placed = []
+    errors = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({'index': index, 'error': 'Each order must be an object'})
+            continue
+        fields = {
+            name: item.get(name) if isinstance(item.get(name), str) else None
+            for name in ('drink', 'milk', 'syrup', 'foam', 'temperature', 'notes')
+        }
+        customer_name = item.get('customer_name') or default_customer
+        extra_shot = item.get('extra_shot') in (True, 'true')
+        missing = [name for name in ORDER_REQUIRED_FIELDS if not fields[name]]
+        if missing:
+            errors.append({'index': index, 'error': f"Missing {', '.join(missing)}"})
+            continue
+        sanitized_name, sanitized_notes, error = validate_order_fields(
+            customer_name if isinstance(customer_name, str) else None, fields['drink'], fields['milk'],
+            fields['syrup'], fields['foam'], fields['temperature'], fields['notes'] or '', menu_item_errors
+        )
+        if error:
+            errors.append({'index': index, 'error': error})
+            continue
+        price = order_price(drink_prices, fields['drink'], extra_shot)
+        rows.append((
+            sanitized_name, fields['drink'], fields['milk'], fields['syrup'], fields['foam'],
+            fields['temperature'], int(extra_shot), sanitized_notes, price
+        ))
+        placed.append({
+            'customer_name': sanitized_name,
+            'drink': fields['drink'],
+            'price': price,
+            'extra_shot': extra_shot
+        })
+    if errors:
+        return jsonify({'error': 'Invalid orders, none were placed', 'errors': errors}), 400
+    
+    def insert_orders(db):
+        db.executemany(INSERT_ORDER_SQL, rows)
+        # The write lock is held and orders is AUTOINCREMENT, so the batch
+        # took the ids up to the sequence value with no gaps
+        return db.execute("SELECT seq FROM sqlite_sequence WHERE name = 'orders'").fetchone()[0]
+    
+    last_id = run_write(insert_orders)
+    order_event_broadcaster.notify()
+    
+    order_ids = list(range(last_id - len(rows) + 1, last_id + 1))
+    for order_id, placed_order in zip(order_ids, placed):
+        placed_order['order_id'] = order_id
+    return jsonify({
+        'success': True,
+        'order_ids': order_ids,
+        'orders': placed,
+        'total_price': sum(placed_order['price'] for placed_order in placed)
+    })
+
 @app.route('/orders')
 @login_required
 def orders():
@@ -367,45 +736,57 @@ def orders():
             return redirect(url_for('orders'))
         validated_statuses.append(validated_status)
     
-    base_query = '''
-        SELECT *, 
+    limit = parse_page_size(request.args.get('limit'), ORDERS_PAGE_SIZE, ORDERS_MAX_PAGE_SIZE)
+    if search:
+        # Within each status the best matches come first (bm25 rank, lower is better)
+        sort_keys = [(STATUS_RANK_SQL, 'asc'), ('orders_fts.rank', 'asc'), ('orders.id', 'desc')]
+    else:
+        # Within each status, newest first (the rank comes from select_page_by_status)
+        sort_keys = [('created_at', 'desc'), ('id', 'desc')]
+    try:
+        after = decode_page_token(request.args.get('page'), len(sort_keys) + (not search))
+    except ValueError as e:
+        flash(str(e))
+        return redirect(url_for('orders'))
+    
+    order_columns = '''
+        SELECT orders.*, 
                CASE 
                    WHEN status = 'pending' THEN (julianday('now') - julianday(created_at)) * 24 * 60
                    WHEN status = 'in_progress' THEN (julianday('now') - julianday(created_at)) * 24 * 60
                    ELSE 0
                END as wait_time_minutes
-        FROM orders 
-        WHERE 1=1
-    '''
-    
-    additional_params = []
-    
-    # Add status filter if specified
-    if 'all' not in validated_statuses:
-        placeholders = ','.join(['?' for _ in validated_statuses])
-        base_query += f' AND status IN ({placeholders})'
-        additional_params.extend(validated_statuses)
-    
-    base_query += '''
-        ORDER BY 
-            CASE status
-                WHEN "pending" THEN 1
-                WHEN "in_progress" THEN 2
-                WHEN "completed" THEN 3
-            END,
-            created_at DESC
     '''
     
-    # Use secure search if search term provided
+    # Use the full-text index if a search term was provided
     if search:
-        # Replace placeholder with actual LIKE conditions
-        search_query = base_query.replace('WHERE 1=1', 'WHERE ({{LIKE_CONDITIONS}})')
+        additional_params = []
+        
+        # Add status filter if specified
+        status_condition = ''
         if 'all' not in validated_statuses:
             placeholders = ','.join(['?' for _ in validated_statuses])
-            search_query = search_query.replace(f'AND status IN ({placeholders})', f'AND status IN ({placeholders})')
+            status_condition = f' AND status IN ({placeholders})'
+            additional_params.extend(validated_statuses)
+        
+        # Start after the last row of the previous page
+        if after:
+            condition, condition_params = keyset_condition(sort_keys, after)
+            status_condition += f' AND {condition}'
+            additional_params.extend(condition_params)
+        
+        order_by = ', '.join(f'{expression} {direction.upper()}' for expression, direction in sort_keys)
+        additional_params.append(limit + 1)
+        
+        search_query = order_columns + f''', orders_fts.rank AS search_rank
+        FROM orders_fts JOIN orders ON orders.id = orders_fts.rowid
+        WHERE {{{{FTS_MATCH}}}}{status_condition}
+        ORDER BY {order_by}
+        LIMIT ?
+        '''
         
         try:
-            orders = SecureDatabase.safe_like_query(
+            orders = SecureDatabase.safe_fts_query(
                 db, 
                 search_query, 
                 ['customer_name', 'drink', 'notes'], 
@@ -415,18 +796,24 @@ def orders():
         except ValueError as e:
             flash(str(e))
             return redirect(url_for('orders'))
+        orders, next_page = split_page(orders, limit, lambda o: [STATUS_RANK[o['status']], o['search_rank'], o['id']])
     else:
-        orders = db.execute(base_query, additional_params).fetchall()
+        statuses = STATUS_RANK if 'all' in validated_statuses else validated_statuses
+        orders = select_page_by_status(
+            db, order_columns + 'FROM orders WHERE 1=1', [], statuses, sort_keys, after, limit
+        )
+        orders, next_page = split_page(orders, limit, lambda o: [STATUS_RANK[o['status']], o['created_at'], o['id']])
     
-    return render_template('orders.html', orders=orders, search=search, status_filters=validated_statuses)
+    return render_template('orders.html', orders=orders, search=search, status_filters=validated_statuses,
+                           next_page=next_page, is_first_page=after is None,
+                           wait_time_thresholds=get_wait_time_thresholds())
 
 @app.route('/delete_order/<int:order_id>', methods=['POST'])
 @login_required
 @require_valid_id
 def delete_order(order_id):
-    db = get_db()
-    db.execute('DELETE FROM orders WHERE id = ?', [order_id])
-    db.commit()
+    run_write(lambda db: db.execute('DELETE FROM orders WHERE id = ?', [order_id]))
+    order_event_broadcaster.notify()
     return redirect(request.referrer or url_for('index'))
 
 @app.route('/update_status/<int:order_id>', methods=['POST'])
@@ -441,85 +828,132 @@ def update_status(order_id):
         flash(f"Invalid status: {error}")
         return redirect(request.referrer or url_for('index'))
         
-    db = get_db()
-    db.execute('UPDATE orders SET status = ? WHERE id = ?', [validated_status, order_id])
-    db.commit()
+    run_write(lambda db: db.execute(ORDER_STATUS_UPDATE_SQL.format(placeholders='?'), [validated_status, order_id]))
+    order_event_broadcaster.notify()
     return redirect(request.referrer or url_for('index'))
 
+@app.route('/api/orders/bulk', methods=['POST'])
+@login_required
+def api_orders_bulk():
+    """Move many orders to one status, or delete them, in one transaction.
+
+    The JSON body is ``{"order_ids": [...], "action": ...}`` where the action
+    is a status (``pending``, ``in_progress``, ``completed``) or ``delete``.
+    Every id is validated before anything is written. Orders already in the
+    target status are left alone; ids that match no order are listed in
+    ``not_found``.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object with "order_ids" and "action"'}), 400
+    
+    action = data.get('action')
+    if action != 'delete':
+        is_valid, action, error = InputValidator.validate_status(action)
+        if not is_valid:
+            return jsonify({'error': f"Invalid action: {error} or delete"}), 400
+    
+    raw_ids = data.get('order_ids')
+    if not isinstance(raw_ids, list) or not raw_ids:
+        return jsonify({'error': '"order_ids" must be a non-empty list'}), 400
+    # Checked before validating, so an oversized body is rejected without walking it
+    if len(raw_ids) > ORDER_BULK_LIMIT:
+        return jsonify({'error': f'At most {ORDER_BULK_LIMIT} orders per request'}), 400
+    order_ids = []
+    for value in raw_ids:
+        is_valid, order_id, error = InputValidator.validate_integer_id(value if not isinstance(value, bool) else None)
+        if not is_valid:
+            return jsonify({'error': f"Invalid order ID {value!r}: {error}"}), 400
+        order_ids.append(order_id)
+    order_ids = list(dict.fromkeys(order_ids))    # Drop repeats, keeping the first of each
+    
+    placeholders = ','.join(['?' for _ in order_ids])
+    
+    def apply_action(db):
+        found = {row[0] for row in db.execute(
+            f'SELECT id FROM orders WHERE id IN ({placeholders})', order_ids
+        ).fetchall()}
+        if action == 'delete':
+            changed = db.execute(f'DELETE FROM orders WHERE id IN ({placeholders})', order_ids).rowcount
+        else:
+            changed = db.execute(
+                ORDER_STATUS_UPDATE_SQL.format(placeholders=placeholders), [action] + order_ids
+            ).rowcount
+        return found, changed, get_order_counts(db)
+    
+    found, changed, counts = run_write(apply_action)
+    if changed:
+        order_event_broadcaster.notify()
+    return jsonify({
+        'success': True,
+        'action': action,
+        'requested': len(order_ids),
+        'changed': changed,
+        'not_found': [order_id for order_id in order_ids if order_id not in found],
+        'counts': counts
+    })
+
+# Most recent completed orders listed on the dashboard; the analytics cover the whole range
+COMPLETED_LIST_LIMIT = 100
+
+def parse_day_arg(name):
+    """Read an optional YYYY-MM-DD query argument; raises ValueError if it is malformed"""
+    value = request.args.get(name, '').strip()
+    if not value:
+        return None
+    return datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d')
+
 @app.route('/completed')
 @login_required
 def completed_orders():
+    try:
+        start_day = parse_day_arg('start')
+        end_day = parse_day_arg('end')
+    except ValueError:
+        flash("Invalid date range: use YYYY-MM-DD")
+        return redirect(url_for('completed_orders'))
+    
     db = get_db()
+    
+    # Dashboard figures come from the daily rollups (see analytics.py)
+    summary = get_completed_summary(db, start_day, end_day)
+    totals = summary['all'].get('', {'count': 0, 'revenue': 0.0, 'extra_shots': 0, 'created_julianday_sum': 0.0})
+    
+    total_drinks = totals['count']
+    total_money = totals['revenue']
+    total_extra_shots = totals['extra_shots']
+    
+    # Wait time is placed to completed, from the stage time rollups; None (shown
+    # as n/a) when no order in the range has stage times, e.g. orders completed
+    # before migration 12 recorded them
+    stage_summary = get_stage_summary(db, start_day, end_day).get('', {})
+    avg_wait_time = stage_summary.get('total', {}).get('mean_minutes')
+    
+    drink_counts = {value: stats['count'] for value, stats in summary['drink'].items()}
+    milk_counts = {value: stats['count'] for value, stats in summary['milk'].items()}
+    syrup_counts = {value: stats['count'] for value, stats in summary['syrup'].items()}
+    foam_counts = {value: stats['count'] for value, stats in summary['foam'].items()}
+    temperature_counts = {value: stats['count'] for value, stats in summary['temperature'].items()}
+    
+    # Only the most recent orders in the range are listed
     completed = db.execute('''
-        SELECT *, 
-               (julianday(datetime('now')) - julianday(created_at)) * 24 * 60 as total_time_minutes
-        FROM orders 
-        WHERE status = "completed" 
+        SELECT * FROM all_orders
+        WHERE status = 'completed'
+          AND created_at >= COALESCE(?, '') AND created_at < COALESCE(date(?, '+1 day'), '9999-12-31')
         ORDER BY created_at DESC
-    ''').fetchall()
-
-    total_drinks = len(completed)
-    total_money = sum(o['price'] for o in completed)
-    
-    # Calculate average wait time (assuming orders take average 3 minutes to complete after being started)
-    # This is an estimation since we don't track exact completion times
-    wait_times = []
-    for order in completed:
-        # Estimate wait time as total time minus processing time (rough estimate)
-        estimated_wait = max(0, order['total_time_minutes'] - 3)  # Assume 3 min processing time
-        wait_times.append(estimated_wait)
-    
-    avg_wait_time = sum(wait_times) / len(wait_times) if wait_times else 0
-    
-    # Calculate drink counts dynamically
-    drink_counts = {}
-    milk_counts = {}
-    syrup_counts = {}
-    foam_counts = {}
-    temperature_counts = {}
-    customer_counts = {}
-    
-    total_extra_shots = 0
-    
-    for order in completed:
-        # Drink counts
-        drink_name = order['drink']
-        drink_counts[drink_name] = drink_counts.get(drink_name, 0) + 1
-        
-        # Milk counts
-        milk_type = order['milk'] or 'None'
-        milk_counts[milk_type] = milk_counts.get(milk_type, 0) + 1
-        
-        # Syrup counts
-        syrup_type = order['syrup'] or 'None'
-        syrup_counts[syrup_type] = syrup_counts.get(syrup_type, 0) + 1
-        
-        # Foam counts
-        foam_type = order['foam'] or 'Regular'
-        foam_counts[foam_type] = foam_counts.get(foam_type, 0) + 1
-        
-        # Temperature counts
-        temp = order['temperature']
-        temperature_counts[temp] = temperature_counts.get(temp, 0) + 1
-        
-        # Customer counts
-        customer = order['customer_name']
-        customer_counts[customer] = customer_counts.get(customer, 0) + 1
-        
-        # Extra shots
-        if order['extra_shot']:
-            total_extra_shots += 1
+        LIMIT ?
+    ''', (start_day, end_day, COMPLETED_LIST_LIMIT)).fetchall()
     
     # Calculate averages and insights
     avg_order_value = total_money / total_drinks if total_drinks > 0 else 0
     
-    # Most popular items
-    most_popular_drink = max(drink_counts.items(), key=lambda x: x[1]) if drink_counts else ('None', 0)
-    most_popular_milk = max(milk_counts.items(), key=lambda x: x[1]) if milk_counts else ('None', 0)
-    most_popular_syrup = max(syrup_counts.items(), key=lambda x: x[1]) if syrup_counts else ('None', 0)
+    # Most popular items (each dict is ordered by count, highest first)
+    most_popular_drink = next(iter(drink_counts.items()), ('None', 0))
+    most_popular_milk = next(iter(milk_counts.items()), ('None', 0))
+    most_popular_syrup = next(iter(syrup_counts.items()), ('None', 0))
     
     # Top customers
-    top_customers = sorted(customer_counts.items(), key=lambda x: x[1], reverse=True)[:5]
+    top_customers = get_top_customers(db, start_day, end_day)
     
     # For backward compatibility, still provide total_lattes and total_coffees
     total_lattes = drink_counts.get('Latte', 0)
@@ -531,6 +965,9 @@ def completed_orders():
     return render_template(
         'completed.html',
         completed=completed,
+        completed_list_limit=COMPLETED_LIST_LIMIT,
+        start_day=start_day,
+        end_day=end_day,
         total_drinks=total_drinks,
         total_lattes=total_lattes,
         total_coffees=total_coffees,
@@ -540,10 +977,10 @@ def completed_orders():
         syrup_counts=syrup_counts,
         foam_counts=foam_counts,
         temperature_counts=temperature_counts,
-        customer_counts=customer_counts,
         total_extra_shots=total_extra_shots,
         avg_order_value=avg_order_value,
         avg_wait_time=avg_wait_time,
+        stage_summary=stage_summary,
         most_popular_drink=most_popular_drink,
         most_popular_milk=most_popular_milk,
         most_popular_syrup=most_popular_syrup,
@@ -551,82 +988,108 @@ def completed_orders():
         wait_time_thresholds=wait_time_thresholds
     )
 
+# Rows written to the CSV buffer before each chunk is sent
+CSV_EXPORT_CHUNK_ROWS = 500
+
 @app.route('/export_completed_csv')
 @login_required
 def export_completed_csv():
-    db = get_db()
-    completed = db.execute('SELECT * FROM orders WHERE status = "completed" ORDER BY created_at DESC').fetchall()
-
-    si = StringIO()
-    writer = csv.writer(si)
-    writer.writerow(['ID', 'Customer Name', 'Drink', 'Milk', 'Syrup', 'Foam', 'Temperature', 'Extra Shot', 'Notes', 'Price', 'Created At'])
-
-    for o in completed:
-        writer.writerow([
-            o['id'], o['customer_name'], o['drink'], o['milk'],
-            o['syrup'] or '', o['foam'] or '', o['temperature'], 
-            'Yes' if o['extra_shot'] else 'No',
-            o['notes'], f"{o['price']:.2f}", o['created_at']
-        ])
-
-    output = si.getvalue()
-    si.close()
-
+    """Stream orders as CSV, optionally filtered by date range and status and gzipped"""
+    try:
+        start_day = parse_day_arg('start')
+        end_day = parse_day_arg('end')
+    except ValueError:
+        flash("Invalid date range: use YYYY-MM-DD")
+        return redirect(url_for('completed_orders'))
+    
+    status_filter = request.args.get('status', 'completed')
+    if status_filter != 'all':
+        is_valid, status_filter, error = InputValidator.validate_status(status_filter)
+        if not is_valid:
+            flash(f"Invalid status filter: {error}")
+            return redirect(url_for('completed_orders'))
+    use_gzip = request.args.get('gzip') in ('1', 'true', 'on')
+    
+    query = '''
+        SELECT * FROM all_orders
+        WHERE created_at >= COALESCE(?, '') AND created_at < COALESCE(date(?, '+1 day'), '9999-12-31')
+    '''
+    params = [start_day, end_day]
+    if status_filter != 'all':
+        query += ' AND status = ?'
+        params.append(status_filter)
+    query += ' ORDER BY created_at DESC'
+    
+    def generate():
+        # Rows come straight off the cursor, so memory stays flat however many are exported
+        rows = get_db().execute(query, params)
+        compressor = zlib.compressobj(wbits=31) if use_gzip else None  # wbits=31 writes a gzip header
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(['ID', 'Customer Name', 'Drink', 'Milk', 'Syrup', 'Foam', 'Temperature', 'Extra Shot', 'Notes', 'Price', 'Created At', 'Status'])
+        
+        while True:
+            batch = rows.fetchmany(CSV_EXPORT_CHUNK_ROWS)
+            for o in batch:
+                writer.writerow([
+                    o['id'], o['customer_name'], o['drink'], o['milk'],
+                    o['syrup'] or '', o['foam'] or '', o['temperature'], 
+                    'Yes' if o['extra_shot'] else 'No',
+                    o['notes'], f"{o['price']:.2f}", o['created_at'], o['status']
+                ])
+            
+            chunk = buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+            if compressor:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+            if not batch:
+                break
+        
+        if compressor:
+            yield compressor.flush()
+    
+    filename = f"{status_filter}_orders"
+    if start_day or end_day:
+        filename += f"_{start_day or 'start'}_to_{end_day or 'now'}"
+    filename += '.csv.gz' if use_gzip else '.csv'
+    
+    # stream_with_context keeps the request's database connection checked out until the last row
     return Response(
-        output,
-        mimetype='text/csv',
-        headers={"Content-Disposition": "attachment; filename=completed_orders.csv"}
+        stream_with_context(generate()),
+        mimetype='application/gzip' if use_gzip else 'text/csv',
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
 
-@app.route('/create_label/<int:order_id>')
+# Most labels one batch request will render
+LABEL_BATCH_LIMIT = 100
+
+def mark_labels_printed(db, order_ids):
+    """Record the first print time of the given orders (run inside run_write)"""
+    if order_ids:
+        placeholders = ','.join(['?' for _ in order_ids])
+        db.execute(
+            f"UPDATE orders SET printed_at = datetime('now') WHERE id IN ({placeholders}) AND printed_at IS NULL",
+            list(order_ids)
+        )
+
+# Printing records printed_at, so the label routes are POSTs with the CSRF token
+@app.route('/create_label/<int:order_id>', methods=['POST'])
 @login_required
 def create_label(order_id):
-    db = get_db()
-    order = db.execute('SELECT * FROM orders WHERE id = ?', (order_id,)).fetchone()
-
+    def claim(db):
+        order = db.execute('SELECT * FROM orders WHERE id = ?', (order_id,)).fetchone()
+        if order:
+            mark_labels_printed(db, [order_id])
+        return order
+    
+    order = run_write(claim)
     if not order:
         return "Order not found", 404
 
-    buffer = io.BytesIO()
-    label_width = 3 * inch
-    label_height = 3 * inch
-    c = canvas.Canvas(buffer, pagesize=(label_width, label_height))
-
-    logo_path = os.path.join(app.root_path, 'static', 'watermark.png')
-    if os.path.exists(logo_path):
-        logo_size = 1.5 * inch
-        logo_x = (label_width - logo_size) / 2
-        logo_y = (label_height - logo_size) / 2
-        c.drawImage(logo_path, logo_x, logo_y, width=logo_size, height=logo_size, preserveAspectRatio=True, mask='auto')
-
-    font_name = "Helvetica-Bold"
-    font_size = 16
-    c.setFont(font_name, font_size)
-
-    lines = [
-        f"{order['customer_name']}'s {order['drink']}",
-        f"Milk: {order['milk']}",
-        f"Syrup: {order['syrup'] or 'None'}",
-        f"Foam: {order['foam'] or 'Regular'}",
-        f"Temp: {order['temperature']}"
-    ]
-    if order['extra_shot']:
-        lines.append("+ Extra Shot")
-    if order['notes']:
-        lines.append(f"Note: {order['notes']}")
-
-    line_height = font_size + 2
-    total_text_height = line_height * len(lines)
-    y_start = (label_height + total_text_height) / 2 - line_height
-
-    y = y_start
-    for line in lines:
-        c.drawCentredString(label_width / 2, y, line)
-        y -= line_height
-
-    c.showPage()
-    c.save()
-    buffer.seek(0)
+    buffer = io.BytesIO(label_renderer.render(order))
 
     response = make_response(send_file(
         buffer,
@@ -637,6 +1100,59 @@ def create_label(order_id):
     response.headers['X-Auto-Print'] = 'true'
     return response
 
+@app.route('/create_labels', methods=['POST'])
+@login_required
+def create_labels():
+    """One multi-page label PDF for ids=1,2,3 or, with new=1, every pending order not yet printed"""
+    if request.form.get('new') in ('1', 'true'):
+        order_ids = None
+    else:
+        order_ids = []
+        for value in request.form.get('ids', '').split(','):
+            if not value.strip():
+                continue
+            is_valid, order_id, error = InputValidator.validate_integer_id(value.strip())
+            if not is_valid:
+                return f"Invalid order ID: {error}", 400
+            if order_id not in order_ids:
+                order_ids.append(order_id)
+        if len(order_ids) > LABEL_BATCH_LIMIT:
+            return f"At most {LABEL_BATCH_LIMIT} labels per request", 400
+    
+    # Select and mark in one write so two screens printing new labels at the
+    # same time do not both print the same order
+    def claim(db):
+        if order_ids is None:
+            orders = db.execute('''
+                SELECT * FROM orders
+                WHERE status = 'pending' AND printed_at IS NULL
+                ORDER BY id
+                LIMIT ?
+            ''', (LABEL_BATCH_LIMIT,)).fetchall()
+        elif order_ids:
+            placeholders = ','.join(['?' for _ in order_ids])
+            rows = db.execute(f'SELECT * FROM orders WHERE id IN ({placeholders})', order_ids).fetchall()
+            rows_by_id = {row['id']: row for row in rows}
+            orders = [rows_by_id[order_id] for order_id in order_ids if order_id in rows_by_id]
+        else:
+            orders = []
+        mark_labels_printed(db, [order['id'] for order in orders])
+        return orders
+    
+    orders = run_write(claim)
+    if not orders:
+        return "No labels to print", 404
+    
+    response = make_response(send_file(
+        io.BytesIO(label_renderer.render_many(orders)),
+        as_attachment=False,
+        mimetype='application/pdf',
+        download_name=f'labels_{len(orders)}.pdf'
+    ))
+    response.headers['X-Auto-Print'] = 'true'
+    response.headers['X-Label-Count'] = str(len(orders))
+    return response
+
 # ---------- Menu Management Routes ----------
 @app.route('/update_menu_item/<int:item_id>', methods=['POST'])
 @login_required
@@ -659,15 +1175,12 @@ def update_menu_item(item_id):
             return redirect(request.referrer or url_for('index'))
         price = validated_price
     
-    db = get_db()
     if price is not None:
-        db.execute('UPDATE menu_config SET item_name = ?, price = ? WHERE id = ?', 
-                  (sanitized_name, price, item_id))
+        run_write(lambda db: db.execute('UPDATE menu_config SET item_name = ?, price = ? WHERE id = ?', 
+                                        (sanitized_name, price, item_id)))
     else:
-        db.execute('UPDATE menu_config SET item_name = ? WHERE id = ?', 
-                  (sanitized_name, item_id))
-    
-    db.commit()
+        run_write(lambda db: db.execute('UPDATE menu_config SET item_name = ? WHERE id = ?', 
+                                        (sanitized_name, item_id)))
     return redirect(request.referrer or url_for('index'))
 
 @app.route('/add_menu_item', methods=['POST'])
@@ -697,22 +1210,17 @@ def add_menu_item():
             flash(f"Invalid price: {error}")
             return redirect(request.referrer or url_for('index'))
     
-    db = get_db()
-    db.execute(
+    run_write(lambda db: db.execute(
         'INSERT INTO menu_config (item_type, item_name, price, created_at) VALUES (?, ?, ?, datetime("now"))',
         (validated_type, sanitized_name, validated_price)
-    )
-    
-    db.commit()
+    ))
     return redirect(request.referrer or url_for('index'))
 
 @app.route('/delete_menu_item/<int:item_id>', methods=['POST'])
 @login_required
 @require_valid_id
 def delete_menu_item(item_id):
-    db = get_db()
-    db.execute('DELETE FROM menu_config WHERE id = ?', (item_id,))
-    db.commit()
+    run_write(lambda db: db.execute('DELETE FROM menu_config WHERE id = ?', (item_id,)))
     return redirect(request.referrer or url_for('index'))
 
 # ---------- Settings Routes ----------
@@ -752,118 +1260,167 @@ def api_update_wait_time_thresholds():
         return jsonify({'error': str(e)}), 500
 
 # ---------- API Routes ----------
+def order_to_dict(order):
+    """Convert an orders row (with wait_time_minutes) to a JSON-serializable dict"""
+    order_dict = dict(order)  # Convert Row to dict
+    # Ensure all values are JSON serializable
+    order_dict['wait_time_minutes'] = round(float(order_dict['wait_time_minutes']), 1) if order_dict['wait_time_minutes'] else 0
+    order_dict['extra_shot'] = bool(order_dict['extra_shot'])
+    order_dict['price'] = float(order_dict['price']) if order_dict['price'] else 0.0
+    return order_dict
+
 @app.route('/api/order-count')
 @login_required
 def api_order_count():
-    db = get_db()
-    pending = db.execute('SELECT COUNT(*) FROM orders WHERE status = "pending"').fetchone()[0]
-    in_progress = db.execute('SELECT COUNT(*) FROM orders WHERE status = "in_progress"').fetchone()[0]
-    completed = db.execute('SELECT COUNT(*) FROM orders WHERE status = "completed"').fetchone()[0]
-    
-    return {
-        'pending': pending,
-        'in_progress': in_progress,
-        'completed': completed,
-        'total': pending + in_progress + completed
-    }
+    return get_order_counts(get_db())
 
 @app.route('/api/orders/live')
 @login_required
 def api_orders_live():
-    """Optimized endpoint that only returns changed orders since last check"""
-    since_timestamp = request.args.get('since', '0')
+    """Orders for the live views, as a full snapshot or as changes since a cursor.
+
+    The ``since`` parameter is the ``cursor`` from a previous response (an
+    order_events sequence number). When it is still covered by the change log
+    only orders created or changed after it are returned, plus the IDs of
+    orders that were deleted or no longer match the filter in ``removed``.
+    Anything else (missing, a timestamp from an old client, or pruned from the
+    log) gets a full snapshot.
+
+    The ETag comes from the data version and the current minute (for the
+    wait times), so an unchanged poll gets its 304 before any order is read.
+    """
+    since = request.args.get('since')
     status_filter = request.args.get('status', 'active')  # active, all, pending, in_progress, completed
-    
-    db = get_db()
-    
-    # Convert timestamp to datetime string for SQLite
+    limit = parse_page_size(request.args.get('limit'), ORDERS_PAGE_SIZE, ORDERS_MAX_PAGE_SIZE)
+    # Status rank first (from select_page_by_status), then newest first
+    sort_keys = [('created_at', 'desc'), ('id', 'desc')]
     try:
-        since_time = float(since_timestamp)
-        since_datetime = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(since_time))
-    except (ValueError, TypeError):
-        since_datetime = '1970-01-01 00:00:00'
+        after = decode_page_token(request.args.get('page'), len(sort_keys) + 1)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # Build query based on status filter - Use parameterized queries for security
     if status_filter == 'active':
-        status_condition = "status IN ('pending', 'in_progress')"
-        status_params = []
+        matching_statuses = ('pending', 'in_progress')
     elif status_filter == 'all':
-        status_condition = "1=1"
-        status_params = []
+        matching_statuses = ('pending', 'in_progress', 'completed')
     else:
-        # Validate status filter to prevent SQL injection
-        valid_statuses = ['pending', 'in_progress', 'completed']
-        if status_filter not in valid_statuses:
+        # Anything unrecognised falls back to pending
+        if status_filter not in STATUS_RANK:
             status_filter = 'pending'
-        status_condition = "status = ?"
-        status_params = [status_filter]
+        matching_statuses = (status_filter,)
+    
+    db = get_db()
+    # A client holding the current version has seen every change, so its
+    # delta would be empty whatever cursor it sends
+    data_hash, not_modified = live_etag(db, status_filter, limit, request.args.get('page', ''), wait_times=True)
+    if not_modified:
+        return '', 304
+    
+    try:
+        since_seq = int(since)
+    except (ValueError, TypeError):
+        since_seq = None
+    
+    # The cursor and the orders changed since the client's cursor come from
+    # one statement, so both see the same log. The orders are read after it,
+    # so a change racing this request is sent again on the next poll rather
+    # than skipped. No ids are read when the client's cursor was pruned.
+    event_rows = db.execute('''
+        SELECT log.oldest, log.latest, changed.order_id
+        FROM (SELECT (SELECT MIN(seq) FROM order_events) AS oldest,
+                     (SELECT MAX(seq) FROM order_events) AS latest) AS log
+        LEFT JOIN (SELECT DISTINCT order_id FROM order_events WHERE seq > ?1) AS changed
+            ON ?1 >= log.oldest - 1
+    ''', (since_seq,)).fetchall()
+    oldest_seq, cursor = event_rows[0][0] or 0, event_rows[0][1] or 0
+    is_delta = since_seq is not None and oldest_seq - 1 <= since_seq <= cursor
     
-    # Get orders modified since last check (including new orders and status changes)
-    query = f'''
+    order_columns = '''
         SELECT *, 
                CASE 
                    WHEN status = 'pending' THEN (julianday('now') - julianday(created_at)) * 24 * 60
                    WHEN status = 'in_progress' THEN (julianday('now') - julianday(created_at)) * 24 * 60
                    ELSE 0
-               END as wait_time_minutes,
-               datetime(created_at) as created_at_formatted
+               END as wait_time_minutes
         FROM orders 
-        WHERE {status_condition}
-        ORDER BY 
-            CASE status
-                WHEN "pending" THEN 1
-                WHEN "in_progress" THEN 2
-                WHEN "completed" THEN 3
-            END,
-            created_at DESC
     '''
+    removed = []
+    next_page = None
     
-    orders = db.execute(query, status_params).fetchall()
-    
-    # Get current counts
-    counts = {
-        'pending': db.execute('SELECT COUNT(*) FROM orders WHERE status = "pending"').fetchone()[0],
-        'in_progress': db.execute('SELECT COUNT(*) FROM orders WHERE status = "in_progress"').fetchone()[0],
-        'completed': db.execute('SELECT COUNT(*) FROM orders WHERE status = "completed"').fetchone()[0]
-    }
-    counts['total'] = counts['pending'] + counts['in_progress'] + counts['completed']
-    
-    # Convert orders to dict and calculate hash for change detection
-    orders_data = []
-    for order in orders:
-        order_dict = dict(order)  # Convert Row to dict
-        # Ensure all values are JSON serializable
-        order_dict['wait_time_minutes'] = round(float(order_dict['wait_time_minutes']), 1) if order_dict['wait_time_minutes'] else 0
-        order_dict['extra_shot'] = bool(order_dict['extra_shot'])
-        order_dict['price'] = float(order_dict['price']) if order_dict['price'] else 0.0
-        # Remove the created_at_formatted field as it's redundant
-        if 'created_at_formatted' in order_dict:
-            del order_dict['created_at_formatted']
-        orders_data.append(order_dict)
-    
-    # Create hash of current data for client-side change detection
-    data_string = str(orders_data) + str(counts)
-    data_hash = hashlib.md5(data_string.encode()).hexdigest()
-    
-    current_timestamp = time.time()
+    if is_delta:
+        changed_ids = [row[2] for row in event_rows if row[2] is not None]
+        orders = []
+        if changed_ids:
+            placeholders = ','.join(['?' for _ in changed_ids])
+            changed = db.execute(
+                order_columns + f'WHERE id IN ({placeholders})', changed_ids
+            ).fetchall()
+            orders = [order for order in changed if order['status'] in matching_statuses]
+            # Deleted orders and orders that moved out of this filter become tombstones
+            matching_ids = {order['id'] for order in orders}
+            removed = [order_id for order_id in changed_ids if order_id not in matching_ids]
+    else:
+        # Snapshots come a page at a time; deltas stay unbounded because they
+        # only carry what changed since the client's cursor
+        orders = select_page_by_status(
+            db, order_columns + 'WHERE 1=1', [], matching_statuses, sort_keys, after, limit
+        )
+        orders, next_page = split_page(orders, limit, lambda o: [STATUS_RANK[o['status']], o['created_at'], o['id']])
     
     response_data = {
-        'orders': orders_data,
-        'counts': counts,
-        'timestamp': current_timestamp,
-        'hash': data_hash,
-        'has_changes': True  # Client will determine this based on hash comparison
+        'orders': [order_to_dict(order) for order in orders],
+        'next_page': next_page,
+        'removed': removed,
+        'delta': is_delta,
+        'cursor': cursor,
+        'timestamp': time.time(),
+        # Counts only move when an order changes, so an empty delta skips them
+        'has_changes': not is_delta or cursor != since_seq
     }
     
+    if response_data['has_changes']:
+        response_data['counts'] = get_order_counts(db)
+    response_data['hash'] = data_hash
+    
     # Add ETag for HTTP caching
     response = make_response(jsonify(response_data))
     response.headers['ETag'] = data_hash
     response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/orders/stream')
+@login_required
+def api_orders_stream():
+    """Server-Sent Events stream of order create, status-change and delete events"""
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        after_seq = int(last_event_id)
+    except (ValueError, TypeError):
+        after_seq = None
     
-    # Check if client sent If-None-Match header
-    if request.headers.get('If-None-Match') == data_hash:
-        return '', 304  # Not Modified
+    def generate():
+        seq = after_seq if after_seq is not None else order_event_broadcaster.latest_seq()
+        deadline = time.time() + SSE_STREAM_MAX_SECONDS
+        
+        yield f'retry: {SSE_RETRY_MS}\n\n'
+        while time.time() < deadline:
+            events, resync = order_event_broadcaster.wait_for_events(seq, SSE_HEARTBEAT_SECONDS)
+            if resync:
+                # The client missed events we no longer hold, so it must reload
+                seq = order_event_broadcaster.latest_seq()
+                yield f'id: {seq}\nevent: resync\ndata: {{}}\n\n'
+            elif not events:
+                yield ': keepalive\n\n'
+            
+            for event in events:
+                seq = event['seq']
+                yield f"id: {seq}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
     
+    # The generator never touches the request's database connection; one
+    # watcher thread per worker reads order_events for every open stream.
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Stop nginx buffering the stream
     return response
 
 @app.route('/api/debug/orders')
@@ -889,10 +1446,21 @@ def api_debug_orders():
 @login_required
 def api_orders_pending():
     """Get only pending and in-progress orders for the main display"""
+    limit = parse_page_size(request.args.get('limit'), ACTIVE_QUEUE_LIMIT, ORDERS_MAX_PAGE_SIZE)
+    # Status rank first (from select_page_by_status), then oldest first
+    sort_keys = [('created_at', 'asc'), ('id', 'asc')]
+    try:
+        after = decode_page_token(request.args.get('page'), len(sort_keys) + 1)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     db = get_db()
+    data_hash, not_modified = live_etag(db, limit, request.args.get('page', ''), wait_times=True)
+    if not_modified:
+        return '', 304
     
     try:
-        orders = db.execute('''
+        orders = select_page_by_status(db, '''
             SELECT *, 
                    CASE 
                        WHEN status = 'pending' THEN (julianday('now') - julianday(created_at)) * 24 * 60
@@ -900,39 +1468,19 @@ def api_orders_pending():
                        ELSE 0
                    END as wait_time_minutes
             FROM orders 
-            WHERE status IN ('pending', 'in_progress')
-            ORDER BY 
-                CASE status
-                    WHEN "pending" THEN 1
-                    WHEN "in_progress" THEN 2
-                END,
-                id ASC
-        ''').fetchall()
-        
-        orders_data = []
-        stable_data_for_hash = []  # Data without constantly changing fields
-        
-        for order in orders:
-            order_dict = dict(order)  # Convert Row to dict
-            # Ensure all values are JSON serializable
-            order_dict['wait_time_minutes'] = round(float(order_dict['wait_time_minutes']), 1) if order_dict['wait_time_minutes'] else 0
-            order_dict['extra_shot'] = bool(order_dict['extra_shot'])
-            order_dict['price'] = float(order_dict['price']) if order_dict['price'] else 0.0
-            orders_data.append(order_dict)
-            
-            # Create stable data for hash (exclude constantly changing fields)
-            stable_dict = {k: v for k, v in order_dict.items() 
-                          if k not in ['wait_time_minutes', 'created_at_formatted']}
-            stable_data_for_hash.append(stable_dict)
-        
-        # Create hash only from stable data (so minor wait time changes don't trigger updates)
-        data_hash = hashlib.md5(str(stable_data_for_hash).encode()).hexdigest()
+            WHERE 1=1
+        ''', [], ('pending', 'in_progress'), sort_keys, after, limit)
+        orders, next_page = split_page(orders, limit, lambda o: [STATUS_RANK[o['status']], o['created_at'], o['id']])
         
-        return jsonify({
-            'orders': orders_data,
+        response = make_response(jsonify({
+            'orders': [order_to_dict(order) for order in orders],
+            'next_page': next_page,
             'timestamp': time.time(),
             'hash': data_hash
-        })
+        }))
+        response.headers['ETag'] = data_hash
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
     except Exception as e:
         print(f"Error in api_orders_pending: {e}")
         return jsonify({
@@ -947,13 +1495,48 @@ def api_orders_pending():
 def api_customers():
     db = get_db()
     customers = db.execute(
-        'SELECT DISTINCT customer_name FROM orders ORDER BY customer_name'
+        'SELECT name FROM customers ORDER BY name'
     ).fetchall()
     
     return {
-        'customers': [row['customer_name'] for row in customers]
+        'customers': [row['name'] for row in customers]
     }
 
+# Typeahead settings for /api/customers/suggest
+CUSTOMER_SUGGEST_LIMIT = 5
+CUSTOMER_SUGGEST_MAX_LIMIT = 20
+CUSTOMER_SUGGEST_CACHE_SECONDS = 30
+
+@app.route('/api/customers/suggest')
+@login_required
+def api_customers_suggest():
+    """Customers whose name starts with ?q= (case-insensitive), most frequent first"""
+    is_valid, query, error = InputValidator.validate_search_query(request.args.get('q', ''))
+    if not is_valid:
+        return {'error': f'Invalid query: {error}'}, 400
+    
+    limit = parse_page_size(request.args.get('limit'), CUSTOMER_SUGGEST_LIMIT, CUSTOMER_SUGGEST_MAX_LIMIT)
+    
+    prefix = query.strip().lower()
+    customers = []
+    if prefix:
+        # A range on the unique normalized_name index is a prefix match
+        customers = get_db().execute('''
+            SELECT name, order_count, last_order_at FROM customers
+            WHERE normalized_name >= ? AND normalized_name < ?
+            ORDER BY order_count DESC, last_order_at DESC
+            LIMIT ?
+        ''', (prefix, prefix + '\uffff', limit)).fetchall()
+    
+    response = jsonify({
+        'query': query,
+        'customers': [row['name'] for row in customers]
+    })
+    response.headers['Cache-Control'] = f'private, max-age={CUSTOMER_SUGGEST_CACHE_SECONDS}'
+    return response
+
+CUSTOMER_HISTORY_LIMIT = 10
+
 @app.route('/api/customer-history/<customer_name>')
 @login_required
 def api_customer_history(customer_name):
@@ -964,17 +1547,27 @@ def api_customer_history(customer_name):
     
     db = get_db()
     
-    # Use secure LIKE query with proper escaping
+    # Full-text search on the customer_name column, with proper escaping,
+    # over live and archived orders
     try:
-        orders = SecureDatabase.safe_like_query(
-            db,
-            'SELECT * FROM orders WHERE {{LIKE_CONDITIONS}} ORDER BY created_at DESC LIMIT 10',
-            ['customer_name'],
-            sanitized_name,
-            []
-        )
+        orders = []
+        for table in ('orders', 'orders_archive'):
+            orders.extend(SecureDatabase.safe_fts_query(
+                db,
+                f'''
+                SELECT {', '.join(f'{table}.{column}' for column in ARCHIVE_COLUMNS)}
+                FROM {table}_fts JOIN {table} ON {table}.id = {table}_fts.rowid
+                WHERE {{{{FTS_MATCH}}}}
+                ORDER BY {table}.created_at DESC LIMIT ?
+                ''',
+                ['customer_name'],
+                sanitized_name,
+                [CUSTOMER_HISTORY_LIMIT],
+                fts_table=f'{table}_fts'
+            ))
     except ValueError as e:
         return {'error': str(e)}, 400
+    orders = sorted(orders, key=lambda order: order['created_at'], reverse=True)[:CUSTOMER_HISTORY_LIMIT]
     
     return {
         'orders': [dict(order) for order in orders],
@@ -982,6 +1575,267 @@ def api_customer_history(customer_name):
         'favorite_drink': None  # Could be calculated from order history
     }
 
+@app.route('/api/analytics/stage-times')
+@login_required
+def api_stage_times():
+    """Queue, make and total time percentiles for ?start=&end=, optionally per ?group=hour|day"""
+    try:
+        start_day = parse_day_arg('start')
+        end_day = parse_day_arg('end')
+    except ValueError:
+        return {'error': 'Invalid date range: use YYYY-MM-DD'}, 400
+    group = request.args.get('group') or None
+    if group not in (None, 'hour', 'day'):
+        return {'error': "group must be 'hour' or 'day'"}, 400
+
+    db = get_db()
+    overall = get_stage_summary(db, start_day, end_day).get('', {})
+    periods = get_stage_summary(db, start_day, end_day, group) if group else {}
+    return {
+        'start': start_day,
+        'end': end_day,
+        'group': group,
+        'overall': overall,
+        'periods': [{'period': period, 'stages': stages} for period, stages in periods.items()]
+    }
+
+# /api/analytics/timeseries covers the last week unless given a range
+TIMESERIES_DEFAULT_DAYS = 7
+# Responses kept per worker, keyed by ETag, least recently used evicted first;
+# a new data version changes every key. The lock covers the worker's threads.
+TIMESERIES_CACHE_SIZE = 32
+timeseries_cache = OrderedDict()
+timeseries_cache_lock = threading.Lock()
+
+@app.route('/api/analytics/timeseries')
+@login_required
+def api_sales_timeseries():
+    """Completed orders, revenue and drink mix per ?bucket=minute|hour|day over ?start=&end="""
+    try:
+        start_day = parse_day_arg('start')
+        end_day = parse_day_arg('end')
+    except ValueError:
+        return {'error': 'Invalid date range: use YYYY-MM-DD'}, 400
+    grain = request.args.get('bucket', 'hour')
+    if grain not in SALES_GRAINS:
+        return {'error': f"bucket must be one of: {', '.join(SALES_GRAINS)}"}, 400
+    
+    # created_at is stored in UTC (datetime('now'))
+    end_day = end_day or datetime.now(timezone.utc).strftime('%Y-%m-%d')
+    start_day = start_day or (
+        datetime.strptime(end_day, '%Y-%m-%d') - timedelta(days=TIMESERIES_DEFAULT_DAYS - 1)
+    ).strftime('%Y-%m-%d')
+    if start_day > end_day:
+        return {'error': 'start must not be after end'}, 400
+    
+    db = get_db()
+    etag, not_modified = live_etag(db, start_day, end_day, grain)
+    if not_modified:
+        return '', 304
+    
+    with timeseries_cache_lock:
+        body = timeseries_cache.get(etag)
+        if body is not None:
+            timeseries_cache.move_to_end(etag)
+    if body is None:
+        series = get_sales_timeseries(db, start_day, end_day, grain)
+        body = json.dumps({'start': start_day, 'end': end_day, 'bucket': grain, **series})
+        with timeseries_cache_lock:
+            timeseries_cache[etag] = body
+            while len(timeseries_cache) > TIMESERIES_CACHE_SIZE:
+                timeseries_cache.popitem(last=False)
+    
+    response = Response(body, mimetype='application/json')
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Request and query metrics from every worker, in the Prometheus text format"""
+    if METRICS_TOKEN:
+        authorized = hmac.compare_digest(
+            request.headers.get('Authorization', ''), f'Bearer {METRICS_TOKEN}'
+        )
+    else:
+        authorized = 'user' in session
+    if not authorized:
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# ---------- CLI Commands ----------
+# Routes whose queries must be served by indexes (see migrations.py)
+QUERY_PLAN_ROUTES = [
+    '/',
+    '/in_progress',
+    '/orders',
+    '/orders?status=completed',
+    '/orders?status=all&search=latte',
+    '/completed',
+    '/export_completed_csv',
+    '/api/order-count',
+    '/api/orders/live',
+    '/api/orders/live?status=completed',
+    '/api/orders/pending',
+    '/api/customers',
+    '/api/customers/suggest?q=al',
+    '/api/customer-history/alice',
+    '/api/analytics/stage-times?group=day',
+    '/api/analytics/timeseries?start=2026-01-01&end=2026-03-31',
+    # Later pages add a keyset condition to the same queries
+    '/in_progress?page=' + encode_page_token(['9999-12-31 00:00:00', 0]),
+    '/orders?page=' + encode_page_token([1, '9999-12-31 00:00:00', 0]),
+    '/api/orders/pending?page=' + encode_page_token([1, '0000-01-01 00:00:00', 0]),
+]
+
+# Small tables that are read whole on purpose: the menu and settings cache
+# reload, and the one-row config tables FTS5 reads before a search
+QUERY_PLAN_FULL_READ_TABLES = ('menu_config', 'settings', 'orders_fts_config', 'orders_archive_fts_config')
+
+# Order lists, whose rows must come out of an index already in order; other
+# routes sort small config tables or aggregates
+QUERY_PLAN_LIST_ROUTES = ('/in_progress', '/orders', '/completed', '/api/orders/live', '/api/orders/pending')
+
+@app.cli.command('check-query-plans')
+def check_query_plans():
+    """Run the hot routes and fail if any query scans a whole table or sorts a whole list"""
+    statements = []
+    app.config['QUERY_TRACE_CALLBACK'] = statements.append
+    app.secret_key = app.secret_key or os.urandom(16)
+    
+    client = app.test_client()
+    with client.session_transaction() as client_session:
+        client_session['user'] = username
+    
+    failures = 0
+    db = sqlite3.connect(DATABASE)
+    try:
+        for route in QUERY_PLAN_ROUTES:
+            statements.clear()
+            client.get(route)
+            for sql in statements:
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                plan = explain_query_plan(db, sql)
+                scans = find_table_scans(plan, QUERY_PLAN_FULL_READ_TABLES)
+                sorts = find_temp_sorts(plan) if urlsplit(route).path in QUERY_PLAN_LIST_ROUTES else []
+                print(f"{'SCAN' if scans else 'SORT' if sorts else 'ok  '} {route}: {' | '.join(plan)}")
+                failures += len(scans) + len(sorts)
+    finally:
+        db.close()
+        app.config['QUERY_TRACE_CALLBACK'] = None
+    
+    if failures:
+        raise SystemExit(f"{failures} full table scan(s) or list sort(s) found")
+    print("All hot queries use indexes")
+
+# Routes run by check-query-budgets, each against its endpoint's QUERY_BUDGETS
+# entry; (method, route) pairs for anything but GET
+QUERY_BUDGET_ROUTES = [route for route in QUERY_PLAN_ROUTES if route != '/export_completed_csv'] + [
+    '/api/orders/live?since=0',
+    ('POST', '/create_label/1'),
+]
+
+@app.cli.command('check-query-budgets')
+def check_query_budgets():
+    """Run the hot routes and fail if any runs more statements than its budget"""
+    app.config['QUERY_DIAGNOSTICS'] = True
+    csrf_enabled = app.config.get('WTF_CSRF_ENABLED', True)
+    app.config['WTF_CSRF_ENABLED'] = False    # So POST routes run their queries
+    app.secret_key = app.secret_key or os.urandom(16)
+    
+    client = app.test_client()
+    with client.session_transaction() as client_session:
+        client_session['user'] = username
+    
+    failures = 0
+    try:
+        for entry in QUERY_BUDGET_ROUTES:
+            method, route = entry if isinstance(entry, tuple) else ('GET', entry)
+            response = client.open(route, method=method)
+            count = response.headers.get(QUERY_COUNT_HEADER)
+            exceeded = response.headers.get(QUERY_BUDGET_EXCEEDED_HEADER)
+            print(f"{'OVER' if exceeded else 'ok  '} {route}: {count} statement(s)"
+                  + (f", budget {exceeded}" if exceeded else ''))
+            failures += bool(exceeded)
+    finally:
+        app.config['QUERY_DIAGNOSTICS'] = QUERY_DIAGNOSTICS
+        app.config['WTF_CSRF_ENABLED'] = csrf_enabled
+    
+    if failures:
+        raise SystemExit(f"{failures} route(s) over their query budget")
+    print("All hot routes are within their query budgets")
+
+@app.cli.command('check-order-counts')
+@click.option('--repair', is_flag=True, help='Rebuild order_counts from the orders table if it has drifted')
+def check_order_counts(repair):
+    """Compare the maintained order counts with a full count of the orders table"""
+    db = connect(DATABASE)
+    try:
+        db.execute('BEGIN IMMEDIATE')  # Hold off writers so both counts see the same orders
+        maintained = get_order_counts(db)
+        actual = count_orders_by_status(db)
+        print(f"order_counts: {maintained}")
+        print(f"orders:       {actual}")
+        
+        if maintained == actual:
+            db.rollback()
+            print("Order counts are consistent")
+            return
+        if not repair:
+            db.rollback()
+            raise SystemExit("Order counts have drifted; run with --repair to rebuild them")
+        
+        db.execute(
+            'INSERT OR REPLACE INTO order_counts (id, pending, in_progress, completed) VALUES (1, ?, ?, ?)',
+            (actual['pending'], actual['in_progress'], actual['completed'])
+        )
+        db.commit()
+        print("Rebuilt order_counts from the orders table")
+    finally:
+        db.close()
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Bundle, minify, fingerprint and precompress the static assets into static/dist"""
+    for name, built in sorted(build_assets(app.static_folder).items()):
+        print(f"{name} -> {built}")
+
+@app.cli.command('rebuild-analytics')
+def rebuild_analytics():
+    """Recompute the completed-order, customer, stage time and sales rollups from the live and archived orders"""
+    db = connect(DATABASE)
+    try:
+        db.execute('BEGIN IMMEDIATE')
+        rebuild_completed_rollups(db, source='all_orders')
+        rebuild_customer_totals(db, source='all_orders')
+        rebuild_stage_rollups(db, source='all_orders')
+        rebuild_sales_rollups(db, source='all_orders')
+        db.commit()
+        counts = ', '.join(
+            f"{table} ({db.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]} rows)"
+            for table in ('completed_rollups', 'customer_totals', 'stage_rollups', 'sales_rollups')
+        )
+        print(f"Rebuilt {counts}")
+    finally:
+        db.close()
+
+@app.cli.command('archive-orders')
+@click.option('--older-than-days', type=click.IntRange(min=0), default=ARCHIVE_AFTER_DAYS, show_default=True,
+              help='Archive completed orders created more than this many days ago')
+@click.option('--batch-size', type=click.IntRange(min=1), default=ARCHIVE_BATCH_SIZE, show_default=True,
+              help='Orders moved per transaction')
+def archive_orders(older_than_days, batch_size):
+    """Move old completed orders out of the live orders table, a batch at a time"""
+    db = connect(DATABASE)
+    try:
+        archived = archive_completed_orders(db, older_than_days, batch_size)
+        remaining = db.execute('SELECT COUNT(*) FROM orders').fetchone()[0]
+        print(f"Archived {archived} completed orders older than {older_than_days} days; "
+              f"{remaining} orders remain live")
+    finally:
+        db.close()
+
 # ---------- Entry Point ----------
 if __name__ == "__main__":
     create_tables()
@@ -0,0 +1,333 @@
+"""
+Request and query metrics in the Prometheus text format.
+
+Metrics records, per Flask endpoint, request counts by method and status and
+a latency histogram, and per SQL statement a latency histogram and the
+number of rows fetched. Statements are labelled by their text with
+whitespace collapsed and placeholder lists such as (?, ?, ?) folded, so one
+query shape is one series whatever its parameters.
+
+Each gunicorn worker keeps its own figures in memory. When a directory is
+configured, every worker writes a snapshot of them there about once a
+second, and render() adds up the snapshots of all workers, including ones
+that have since exited, so counters never go backwards while the directory
+lives. Point it at a directory that is emptied when the app is deployed.
+"""
+import json
+import os
+import re
+import threading
+import time
+
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+FLUSH_INTERVAL_SECONDS = 1.0
+MAX_STATEMENTS = 500            # Later new statement shapes are counted as 'other'
+STATEMENT_LABEL_LENGTH = 200
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+PLACEHOLDER_LIST_PATTERN = re.compile(r'\?(?:\s*,\s*\?)+')
+
+
+def statement_label(sql):
+    """
+    Label an SQL statement by its shape.
+
+    Args:
+        sql (str): Statement text
+
+    Returns:
+        str: Normalized text, at most STATEMENT_LABEL_LENGTH characters
+    """
+    label = WHITESPACE_PATTERN.sub(' ', sql).strip()
+    label = PLACEHOLDER_LIST_PATTERN.sub('?, ...', label)
+    return label[:STATEMENT_LABEL_LENGTH]
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values):
+    return ','.join(f'{name}="{_escape_label(value)}"' for name, value in zip(names, values))
+
+
+class Metrics:
+    """Counters and histograms for one process, optionally shared through a directory."""
+
+    def __init__(self, directory=None):
+        """
+        Args:
+            directory (str): Where workers exchange snapshots (None to report
+                this process only)
+        """
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._requests = {}             # (endpoint, method, status) -> count
+        self._request_latency = {}      # endpoint -> [bucket counts..., sum, count]
+        self._query_latency = {}        # statement -> [bucket counts..., sum, count]
+        self._query_rows = {}           # statement -> rows fetched
+        self._labels = {}               # sql -> statement label
+        self._last_flush = 0.0
+
+    def observe_request(self, endpoint, method, status, seconds):
+        """Record one finished request."""
+        with self._lock:
+            key = (endpoint, method, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            self._observe(self._request_latency, endpoint, REQUEST_BUCKETS, seconds)
+
+    def observe_query(self, sql, seconds, rows):
+        """Record one executed statement and the rows fetched from it."""
+        with self._lock:
+            label = self._label(sql)
+            self._observe(self._query_latency, label, QUERY_BUCKETS, seconds)
+            self._query_rows[label] = self._query_rows.get(label, 0) + rows
+
+    def add_rows(self, sql, rows):
+        """Count rows fetched from a statement after it was recorded."""
+        with self._lock:
+            label = self._label(sql)
+            self._query_rows[label] = self._query_rows.get(label, 0) + rows
+
+    def _label(self, sql):
+        label = self._labels.get(sql)
+        if label is None:
+            label = statement_label(sql)
+            if label not in self._query_latency and len(self._query_latency) >= MAX_STATEMENTS:
+                label = 'other'
+            if len(self._labels) < MAX_STATEMENTS * 4:
+                self._labels[sql] = label
+        return label
+
+    @staticmethod
+    def _observe(histograms, key, buckets, seconds):
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = [0] * (len(buckets) + 2)
+        for i, bound in enumerate(buckets):
+            if seconds <= bound:
+                histogram[i] += 1
+                break
+        histogram[-2] += seconds
+        histogram[-1] += 1
+
+    def snapshot(self):
+        """
+        Get this process's figures as JSON-serializable data.
+
+        Returns:
+            dict: Lists of [labels, value] pairs per metric
+        """
+        with self._lock:
+            return {
+                'requests': [[list(key), count] for key, count in self._requests.items()],
+                'request_latency': [[key, list(values)] for key, values in self._request_latency.items()],
+                'query_latency': [[key, list(values)] for key, values in self._query_latency.items()],
+                'query_rows': [[key, rows] for key, rows in self._query_rows.items()],
+            }
+
+    def maybe_flush(self):
+        """Write this process's snapshot if FLUSH_INTERVAL_SECONDS have passed."""
+        if self.directory and time.monotonic() - self._last_flush >= FLUSH_INTERVAL_SECONDS:
+            self.flush()
+
+    def flush(self):
+        """Write this process's snapshot to the directory."""
+        if not self.directory:
+            return
+        self._last_flush = time.monotonic()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f'worker-{os.getpid()}.json')
+        temporary = f'{path}.{threading.get_ident()}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(temporary, path)
+
+    def collect(self):
+        """
+        Add up the snapshots of every worker.
+
+        Returns:
+            dict: Same shape as snapshot(), keyed by labels instead of listed
+        """
+        snapshots = [self.snapshot()]
+        if self.directory and os.path.isdir(self.directory):
+            own_file = f'worker-{os.getpid()}.json'
+            for name in os.listdir(self.directory):
+                if not name.endswith('.json') or name == own_file:
+                    continue
+                try:
+                    with open(os.path.join(self.directory, name)) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue    # Being replaced right now; the next scrape sees it
+
+        totals = {'requests': {}, 'request_latency': {}, 'query_latency': {}, 'query_rows': {}}
+        for snapshot in snapshots:
+            for metric, entries in snapshot.items():
+                merged = totals[metric]
+                for key, value in entries:
+                    key = tuple(key) if isinstance(key, list) else key
+                    if isinstance(value, list):
+                        current = merged.setdefault(key, [0] * len(value))
+                        merged[key] = [a + b for a, b in zip(current, value)]
+                    else:
+                        merged[key] = merged.get(key, 0) + value
+        return totals
+
+    def render(self):
+        """
+        Render every worker's metrics in the Prometheus text format.
+
+        Returns:
+            str: Exposition text
+        """
+        totals = self.collect()
+        lines = [
+            '# HELP hebrews_http_requests_total Requests handled, by endpoint, method and status.',
+            '# TYPE hebrews_http_requests_total counter',
+        ]
+        for key, count in sorted(totals['requests'].items()):
+            lines.append(f'hebrews_http_requests_total{{{_format_labels(("endpoint", "method", "status"), key)}}} {count}')
+
+        lines += self._render_histogram(
+            'hebrews_http_request_duration_seconds', 'Time to build each response, by endpoint.',
+            'endpoint', REQUEST_BUCKETS, totals['request_latency']
+        )
+        lines += self._render_histogram(
+            'hebrews_db_query_duration_seconds', 'Time to execute each statement and fetch its rows.',
+            'statement', QUERY_BUCKETS, totals['query_latency']
+        )
+
+        lines += [
+            '# HELP hebrews_db_query_rows_total Rows fetched, by statement.',
+            '# TYPE hebrews_db_query_rows_total counter',
+        ]
+        for key, rows in sorted(totals['query_rows'].items()):
+            lines.append(f'hebrews_db_query_rows_total{{{_format_labels(("statement",), (key,))}}} {rows}')
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _render_histogram(name, help_text, label, buckets, histograms):
+        lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for key, values in sorted(histograms.items()):
+            labels = _format_labels((label,), (key,))
+            cumulative = 0
+            for bound, count in zip(buckets, values):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {values[-1]}')
+            lines.append(f'{name}_sum{{{labels}}} {values[-2]}')
+            lines.append(f'{name}_count{{{labels}}} {values[-1]}')
+        return lines
+
+
+class InstrumentedConnection:
+    """sqlite3 connection wrapper that times every statement run through it."""
+
+    def __init__(self, db, metrics, slow_query_log=None):
+        """
+        Args:
+            db (sqlite3.Connection): Connection to wrap
+            metrics (Metrics): Where statement figures are recorded
+            slow_query_log: Optional object whose record(db, sql, parameters,
+                seconds, rows) is called for every finished statement
+        """
+        self._db = db
+        self._metrics = metrics
+        self._slow_query_log = slow_query_log
+        self.statement_count = 0
+
+    def execute(self, sql, parameters=()):
+        self.statement_count += 1
+        started = time.perf_counter()
+        cursor = self._db.execute(sql, parameters)
+        instrumented = InstrumentedCursor(cursor, self, sql, parameters, time.perf_counter() - started)
+        if cursor.description is None:
+            # No rows to fetch (writes, BEGIN/COMMIT): record it now, on this thread
+            instrumented._record()
+        return instrumented
+
+    def executemany(self, sql, seq_of_parameters):
+        self.statement_count += 1
+        started = time.perf_counter()
+        cursor = self._db.executemany(sql, seq_of_parameters)
+        self._finished(sql, (), time.perf_counter() - started, 0)
+        return cursor
+
+    def _finished(self, sql, parameters, seconds, rows):
+        self._metrics.observe_query(sql, seconds, rows)
+        if self._slow_query_log is not None:
+            self._slow_query_log.record(self._db, sql, parameters, seconds, rows)
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+
+class InstrumentedCursor:
+    """
+    Cursor wrapper that adds fetch time and rows to the statement's figures.
+
+    The statement is recorded once, when its rows run out, when fetchall() or
+    fetchone() is called (most callers read one row or all of them), or when
+    the cursor is garbage collected; rows fetched after that still count.
+    """
+
+    def __init__(self, cursor, connection, sql, parameters, seconds):
+        self._cursor = cursor
+        self._connection = connection
+        self._sql = sql
+        self._parameters = parameters
+        self._seconds = seconds
+        self._rows = 0
+        self._recorded = False
+
+    def _fetched(self, started, rows, done):
+        if self._recorded:
+            if rows:
+                self._connection._metrics.add_rows(self._sql, rows)
+            return
+        self._seconds += time.perf_counter() - started
+        self._rows += rows
+        if done:
+            self._record()
+
+    def _record(self):
+        self._recorded = True
+        self._connection._finished(self._sql, self._parameters, self._seconds, self._rows)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._fetched(started, row is not None, True)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany()
+        self._fetched(started, len(rows), not rows)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._fetched(started, len(rows), True)
+        return rows
+
+    def __iter__(self):
+        while True:
+            started = time.perf_counter()
+            row = self._cursor.fetchone()
+            self._fetched(started, row is not None, row is None)
+            if row is None:
+                return
+            yield row
+
+    def __del__(self):
+        if not self._recorded:
+            self._record()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
@@ -0,0 +1,543 @@
+"""
+Versioned schema migrations for the SQLite database.
+
+Each migration has a version number, a description and a list of steps. A
+step is either an SQL statement or a callable that receives the connection.
+Applied versions are recorded in the schema_migrations table, and every
+migration runs in its own IMMEDIATE transaction so that gunicorn workers
+starting at the same time cannot apply the same migration twice.
+
+To change the schema, append a new migration to MIGRATIONS. Never edit a
+migration that has already shipped.
+"""
+import sqlite3
+
+from analytics import (
+    customer_total_trigger_sql, rebuild_completed_rollups, rebuild_customer_totals, rebuild_sales_rollups,
+    rollup_deleted_trigger_sql, rollup_trigger_sql, sales_rollup_trigger_sql, stage_rollup_trigger_sql
+)
+from archive import ARCHIVE_COLUMNS, ORDER_STAGE_COLUMNS
+
+
+def _add_missing_order_columns(db):
+    """Add columns that databases created before they existed are missing."""
+    columns = {row[1] for row in db.execute('PRAGMA table_info(orders)')}
+    for column in ('syrup', 'foam'):
+        if column not in columns:
+            db.execute(f'ALTER TABLE orders ADD COLUMN {column} TEXT')
+
+
+def _add_column_if_missing(db, table, column, definition):
+    columns = {row[1] for row in db.execute(f'PRAGMA table_info({table})')}
+    if column not in columns:
+        db.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+
+def _add_stage_columns(db):
+    for table in ('orders', 'orders_archive'):
+        for column in ORDER_STAGE_COLUMNS:
+            _add_column_if_missing(db, table, column, 'TEXT')
+
+
+MIGRATIONS = [
+    (1, 'Initial orders, menu_config and settings tables', [
+        """
+        CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            customer_name TEXT NOT NULL,
+            drink TEXT NOT NULL,
+            milk TEXT NOT NULL,
+            syrup TEXT,
+            foam TEXT,
+            temperature TEXT NOT NULL,
+            extra_shot INTEGER NOT NULL,
+            notes TEXT,
+            status TEXT NOT NULL,
+            price REAL NOT NULL,
+            created_at TEXT NOT NULL
+        )
+        """,
+        _add_missing_order_columns,
+        """
+        CREATE TABLE IF NOT EXISTS menu_config (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            item_type TEXT NOT NULL,
+            item_name TEXT NOT NULL,
+            price REAL,
+            created_at TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS settings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            setting_key TEXT NOT NULL UNIQUE,
+            setting_value TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+        """,
+    ]),
+    (2, 'Order change log for the event stream and delta sync', [
+        """
+        CREATE TABLE IF NOT EXISTS order_events (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER NOT NULL,
+            event_type TEXT NOT NULL,
+            status TEXT,
+            created_at TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS orders_event_created AFTER INSERT ON orders
+        BEGIN
+            INSERT INTO order_events (order_id, event_type, status, created_at)
+            VALUES (NEW.id, 'created', NEW.status, datetime('now'));
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS orders_event_status_changed AFTER UPDATE OF status ON orders
+        WHEN NEW.status IS NOT OLD.status
+        BEGIN
+            INSERT INTO order_events (order_id, event_type, status, created_at)
+            VALUES (NEW.id, 'status_changed', NEW.status, datetime('now'));
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS orders_event_deleted AFTER DELETE ON orders
+        BEGIN
+            INSERT INTO order_events (order_id, event_type, status, created_at)
+            VALUES (OLD.id, 'deleted', OLD.status, datetime('now'));
+        END
+        """,
+    ]),
+    (3, 'Indexes for the hot order and menu queries', [
+        # Status filters, per-status counts and completed-by-date listings
+        'CREATE INDEX IF NOT EXISTS idx_orders_status_created_at ON orders (status, created_at)',
+        # The active queue is a handful of rows next to the whole order history
+        """
+        CREATE INDEX IF NOT EXISTS idx_orders_active_queue ON orders (status, created_at)
+        WHERE status IN ('pending', 'in_progress')
+        """,
+        # Unfiltered newest-first listings
+        'CREATE INDEX IF NOT EXISTS idx_orders_created_at ON orders (created_at)',
+        # DISTINCT customer_name for the autocomplete list
+        'CREATE INDEX IF NOT EXISTS idx_orders_customer_name ON orders (customer_name)',
+        # Menu lookups by type, sorted by name, and the drink price lookup
+        'CREATE INDEX IF NOT EXISTS idx_menu_config_type_name ON menu_config (item_type, item_name)',
+        # Startup pruning of the change log
+        'CREATE INDEX IF NOT EXISTS idx_order_events_created_at ON order_events (created_at)',
+    ]),
+    (4, 'Order counts by status maintained by triggers', [
+        # A single row, so every count request is one primary key lookup
+        """
+        CREATE TABLE IF NOT EXISTS order_counts (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            pending INTEGER NOT NULL,
+            in_progress INTEGER NOT NULL,
+            completed INTEGER NOT NULL
+        )
+        """,
+        """
+        INSERT OR REPLACE INTO order_counts (id, pending, in_progress, completed)
+        SELECT 1,
+               COALESCE(SUM(status = 'pending'), 0),
+               COALESCE(SUM(status = 'in_progress'), 0),
+               COALESCE(SUM(status = 'completed'), 0)
+        FROM orders
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS orders_count_created AFTER INSERT ON orders
+        BEGIN
+            UPDATE order_counts SET
+                pending = pending + (NEW.status = 'pending'),
+                in_progress = in_progress + (NEW.status = 'in_progress'),
+                completed = completed + (NEW.status = 'completed')
+            WHERE id = 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS orders_count_status_changed AFTER UPDATE OF status ON orders
+        WHEN NEW.status IS NOT OLD.status
+        BEGIN
+            UPDATE order_counts SET
+                pending = pending + (NEW.status = 'pending') - (OLD.status = 'pending'),
+                in_progress = in_progress + (NEW.status = 'in_progress') - (OLD.status = 'in_progress'),
+                completed = completed + (NEW.status = 'completed') - (OLD.status = 'completed')
+            WHERE id = 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS orders_count_deleted AFTER DELETE ON orders
+        BEGIN
+            UPDATE order_counts SET
+                pending = pending - (OLD.status = 'pending'),
+                in_progress = in_progress - (OLD.status = 'in_progress'),
+                completed = completed - (OLD.status = 'completed')
+            WHERE id = 1;
+        END
+        """,
+    ]),
+    (5, 'Daily rollups of completed orders for the analytics dashboard', [
+        """
+        CREATE TABLE IF NOT EXISTS completed_rollups (
+            day TEXT NOT NULL,
+            dimension TEXT NOT NULL,
+            value TEXT NOT NULL,
+            order_count INTEGER NOT NULL,
+            revenue REAL NOT NULL,
+            extra_shots INTEGER NOT NULL,
+            created_julianday_sum REAL NOT NULL,
+            PRIMARY KEY (day, dimension, value)
+        ) WITHOUT ROWID
+        """,
+        *rollup_trigger_sql(),
+        rebuild_completed_rollups,
+    ]),
+    (6, 'Track when each order label was first printed', [
+        lambda db: _add_column_if_missing(db, 'orders', 'printed_at', 'TEXT'),
+        # "Print new labels" looks up pending orders that have never been printed
+        """
+        CREATE INDEX IF NOT EXISTS idx_orders_unprinted ON orders (id)
+        WHERE status = 'pending' AND printed_at IS NULL
+        """,
+    ]),
+    (7, 'Version counter for caching menu_config and settings', [
+        """
+        CREATE TABLE IF NOT EXISTS config_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+        """,
+        'INSERT OR IGNORE INTO config_version (id, version) VALUES (1, 1)',
+        *[
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_config_version_{event.lower()} AFTER {event} ON {table}
+            BEGIN
+                UPDATE config_version SET version = version + 1 WHERE id = 1;
+            END
+            """
+            for table in ('menu_config', 'settings')
+            for event in ('INSERT', 'UPDATE', 'DELETE')
+        ],
+    ]),
+    (8, 'Full-text index over order customer names, drinks and notes', [
+        # External-content table: the text lives in orders, the index in orders_fts
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS orders_fts USING fts5(
+            customer_name, drink, notes,
+            content='orders', content_rowid='id', prefix='2 3'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS orders_fts_created AFTER INSERT ON orders
+        BEGIN
+            INSERT INTO orders_fts (rowid, customer_name, drink, notes)
+            VALUES (NEW.id, NEW.customer_name, NEW.drink, NEW.notes);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS orders_fts_deleted AFTER DELETE ON orders
+        BEGIN
+            INSERT INTO orders_fts (orders_fts, rowid, customer_name, drink, notes)
+            VALUES ('delete', OLD.id, OLD.customer_name, OLD.drink, OLD.notes);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS orders_fts_updated AFTER UPDATE OF customer_name, drink, notes ON orders
+        BEGIN
+            INSERT INTO orders_fts (orders_fts, rowid, customer_name, drink, notes)
+            VALUES ('delete', OLD.id, OLD.customer_name, OLD.drink, OLD.notes);
+            INSERT INTO orders_fts (rowid, customer_name, drink, notes)
+            VALUES (NEW.id, NEW.customer_name, NEW.drink, NEW.notes);
+        END
+        """,
+        "INSERT INTO orders_fts (orders_fts) VALUES ('rebuild')",
+    ]),
+    (9, 'Deduplicated customers table for typeahead suggestions', [
+        # normalized_name is the lowercased, trimmed name; its unique index
+        # serves both deduplication and case-insensitive prefix lookups
+        """
+        CREATE TABLE IF NOT EXISTS customers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            normalized_name TEXT NOT NULL UNIQUE,
+            order_count INTEGER NOT NULL,
+            last_order_at TEXT NOT NULL
+        )
+        """,
+        """
+        INSERT INTO customers (name, normalized_name, order_count, last_order_at)
+        SELECT (SELECT o2.customer_name FROM orders o2
+                WHERE lower(trim(o2.customer_name)) = lower(trim(o.customer_name))
+                ORDER BY o2.created_at DESC LIMIT 1),
+               lower(trim(o.customer_name)), COUNT(*), MAX(o.created_at)
+        FROM orders o
+        GROUP BY lower(trim(o.customer_name))
+        """,
+        # Counts cover every order ever placed, so deleting or archiving
+        # orders does not drop a regular from the suggestions
+        """
+        CREATE TRIGGER IF NOT EXISTS orders_customer_created AFTER INSERT ON orders
+        BEGIN
+            INSERT INTO customers (name, normalized_name, order_count, last_order_at)
+            VALUES (trim(NEW.customer_name), lower(trim(NEW.customer_name)), 1, NEW.created_at)
+            ON CONFLICT (normalized_name) DO UPDATE SET
+                name = excluded.name,
+                order_count = order_count + 1,
+                last_order_at = MAX(last_order_at, excluded.last_order_at);
+        END
+        """,
+        'CREATE INDEX IF NOT EXISTS idx_customers_name ON customers (name)',
+    ]),
+    (10, 'Archive table for old completed orders', [
+        # Same columns as orders; ids are kept, and AUTOINCREMENT on orders
+        # means they are never reused
+        """
+        CREATE TABLE IF NOT EXISTS orders_archive (
+            id INTEGER PRIMARY KEY,
+            customer_name TEXT NOT NULL,
+            drink TEXT NOT NULL,
+            milk TEXT NOT NULL,
+            syrup TEXT,
+            foam TEXT,
+            temperature TEXT NOT NULL,
+            extra_shot INTEGER NOT NULL,
+            notes TEXT,
+            status TEXT NOT NULL,
+            price REAL NOT NULL,
+            created_at TEXT NOT NULL,
+            printed_at TEXT,
+            archived_at TEXT NOT NULL
+        )
+        """,
+        'CREATE INDEX IF NOT EXISTS idx_orders_archive_created_at ON orders_archive (created_at)',
+        # History reads go through the view; ORDER BY created_at merges the
+        # two tables' index scans instead of sorting
+        f"""
+        CREATE VIEW IF NOT EXISTS all_orders AS
+        SELECT {', '.join(ARCHIVE_COLUMNS)} FROM orders
+        UNION ALL
+        SELECT {', '.join(ARCHIVE_COLUMNS)} FROM orders_archive
+        """,
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS orders_archive_fts USING fts5(
+            customer_name, drink, notes,
+            content='orders_archive', content_rowid='id', prefix='2 3'
+        )
+        """,
+        # Archived orders are never updated or deleted, so only inserts are indexed
+        """
+        CREATE TRIGGER IF NOT EXISTS orders_archive_fts_created AFTER INSERT ON orders_archive
+        BEGIN
+            INSERT INTO orders_archive_fts (rowid, customer_name, drink, notes)
+            VALUES (NEW.id, NEW.customer_name, NEW.drink, NEW.notes);
+        END
+        """,
+        # Archiving deletes from orders; keep those orders in the rollups
+        'DROP TRIGGER IF EXISTS orders_rollup_deleted',
+        rollup_deleted_trigger_sql(keep_archived=True),
+    ]),
+    (11, 'Data version for conditional requests on the live order endpoints', [
+        # Any write to the orders or the menu moves it, so an unchanged version
+        # means an unchanged response; it never goes backwards
+        """
+        CREATE TABLE IF NOT EXISTS data_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+        """,
+        'INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 1)',
+        *[
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_data_version_{event.lower()} AFTER {event} ON {table}
+            BEGIN
+                UPDATE data_version SET version = version + 1 WHERE id = 1;
+            END
+            """
+            for table in ('orders', 'menu_config', 'settings')
+            for event in ('INSERT', 'UPDATE', 'DELETE')
+        ],
+    ]),
+    (12, 'Order stage timestamps and hourly stage-time histograms', [
+        # Set by status changes in main.py; NULL for stages an order skipped
+        _add_stage_columns,
+        'DROP VIEW IF EXISTS all_orders',
+        f"""
+        CREATE VIEW all_orders AS
+        SELECT {', '.join(ARCHIVE_COLUMNS + ORDER_STAGE_COLUMNS)} FROM orders
+        UNION ALL
+        SELECT {', '.join(ARCHIVE_COLUMNS + ORDER_STAGE_COLUMNS)} FROM orders_archive
+        """,
+        # One row per (hour placed, stage, duration bucket); see analytics.py
+        """
+        CREATE TABLE IF NOT EXISTS stage_rollups (
+            hour TEXT NOT NULL,
+            stage TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            order_count INTEGER NOT NULL,
+            seconds_sum REAL NOT NULL,
+            PRIMARY KEY (hour, stage, bucket)
+        ) WITHOUT ROWID
+        """,
+        *stage_rollup_trigger_sql(),
+    ]),
+    (13, 'Per-minute, hour and day sales rollups for the dashboard time series', [
+        # One row per (grain, bucket placed, drink); see analytics.py
+        """
+        CREATE TABLE IF NOT EXISTS sales_rollups (
+            grain TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            drink TEXT NOT NULL,
+            order_count INTEGER NOT NULL,
+            revenue REAL NOT NULL,
+            PRIMARY KEY (grain, bucket, drink)
+        ) WITHOUT ROWID
+        """,
+        *sales_rollup_trigger_sql(),
+        lambda db: rebuild_sales_rollups(db, source='all_orders'),
+    ]),
+    (14, 'Key the active queue index on the order /in_progress lists it in', [
+        # The (status, created_at) version only duplicated idx_orders_status_created_at;
+        # keyed on created_at it returns both active statuses already newest first
+        'DROP INDEX IF EXISTS idx_orders_active_queue',
+        """
+        CREATE INDEX IF NOT EXISTS idx_orders_active_queue ON orders (created_at)
+        WHERE status IN ('pending', 'in_progress')
+        """,
+    ]),
+    (15, 'All-time customer totals in place of the per-day customer rollups', [
+        # Recreate the completed_rollups triggers without the customer dimension
+        *[f'DROP TRIGGER IF EXISTS orders_rollup_{event}' for event in ('created', 'completed', 'reopened', 'deleted')],
+        *rollup_trigger_sql(keep_archived=True),
+        "DELETE FROM completed_rollups WHERE dimension = 'customer'",
+        """
+        CREATE TABLE IF NOT EXISTS customer_totals (
+            customer_name TEXT PRIMARY KEY,
+            order_count INTEGER NOT NULL,
+            revenue REAL NOT NULL
+        ) WITHOUT ROWID
+        """,
+        # Top customers are the first rows of this index
+        'CREATE INDEX IF NOT EXISTS idx_customer_totals_order_count ON customer_totals (order_count DESC, customer_name)',
+        *customer_total_trigger_sql(),
+        lambda db: rebuild_customer_totals(db, source='all_orders'),
+    ]),
+]
+
+
+def get_schema_version(db):
+    """
+    Get the highest migration version applied to a database.
+
+    Args:
+        db: Database connection
+
+    Returns:
+        int: Schema version (0 for a new database)
+    """
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        )
+    """)
+    return db.execute('SELECT COALESCE(MAX(version), 0) FROM schema_migrations').fetchone()[0]
+
+
+def apply_migrations(database):
+    """
+    Bring a database up to the latest schema version.
+
+    Args:
+        database (str): Path to the SQLite database
+
+    Returns:
+        list: Versions applied by this call
+    """
+    db = sqlite3.connect(database, isolation_level=None)
+    applied = []
+    try:
+        for version, description, steps in MIGRATIONS:
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                # Re-check inside the write lock; another worker may have won the race
+                if get_schema_version(db) >= version:
+                    db.execute('COMMIT')
+                    continue
+
+                for step in steps:
+                    if callable(step):
+                        step(db)
+                    else:
+                        db.execute(step)
+
+                db.execute(
+                    "INSERT INTO schema_migrations (version, description, applied_at) VALUES (?, ?, datetime('now'))",
+                    (version, description)
+                )
+                db.execute('COMMIT')
+                applied.append(version)
+            except Exception:
+                db.execute('ROLLBACK')
+                raise
+    finally:
+        db.close()
+
+    return applied
+
+
+def explain_query_plan(db, sql):
+    """
+    Get the EXPLAIN QUERY PLAN details for a statement.
+
+    Args:
+        db: Database connection
+        sql (str): Statement with any parameters already bound
+
+    Returns:
+        list: Plan detail strings, e.g. 'SEARCH orders USING INDEX ...'
+    """
+    return [row[3] for row in db.execute(f'EXPLAIN QUERY PLAN {sql}').fetchall()]
+
+
+def find_temp_sorts(plan):
+    """
+    Find sorts an index could have saved in a query plan.
+
+    Sorts of aggregated rows and of full-text matches (whose bm25 rank cannot
+    be indexed) are left out.
+
+    Args:
+        plan (list): Plan detail strings from explain_query_plan
+
+    Returns:
+        list: Plan lines that sort rows in a temporary B-tree for ORDER BY
+    """
+    if any(' VIRTUAL TABLE INDEX ' in line or 'GROUP BY' in line for line in plan):
+        return []
+    return [line for line in plan if line.startswith('USE TEMP B-TREE FOR ') and 'ORDER BY' in line]
+
+
+def find_table_scans(plan, allowed_tables=()):
+    """
+    Find full table scans in a query plan.
+
+    Args:
+        plan (list): Plan detail strings from explain_query_plan
+        allowed_tables (tuple): Tables that are meant to be read in full
+
+    Returns:
+        list: Plan lines that read a table without an index
+    """
+    # Named subqueries are run once (CO-ROUTINE or MATERIALIZE) and then read
+    # whole; only their own plan lines can scan a table
+    subqueries = {line.split()[1] for line in plan if line.startswith(('CO-ROUTINE ', 'MATERIALIZE '))}
+    return [
+        line for line in plan
+        if line.startswith('SCAN ') and ' USING ' not in line and line != 'SCAN CONSTANT ROW'
+        and ' VIRTUAL TABLE INDEX ' not in line  # FTS5 serves these from its own index
+        and not line.startswith('SCAN (')  # Reads a subquery's rows, not a table
+        and line.split()[1] not in subqueries
+        and line.split()[1].split('.')[-1] not in allowed_tables
+    ]
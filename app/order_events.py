@@ -0,0 +1,156 @@
+"""
+Order change notifications for the Server-Sent Events stream.
+
+Every insert, status change and delete on the orders table is recorded in the
+order_events table by triggers (see migration 2 in migrations.py). Each worker
+process runs one OrderEventBroadcaster thread that watches that table and
+fans new events out to the streams connected to that worker, so the cost of
+watching the database does not grow with the number of open screens.
+"""
+import sqlite3
+import threading
+from collections import deque
+
+from database import connect
+
+
+ORDER_EVENT_FIELDS = [
+    'id', 'customer_name', 'drink', 'milk', 'syrup', 'foam', 'temperature',
+    'extra_shot', 'notes', 'status', 'price', 'created_at'
+]
+
+
+class OrderEventBroadcaster:
+    """Fan out rows from the order_events table to in-process subscribers."""
+
+    def __init__(self, database, poll_interval=0.5, buffer_size=1000):
+        """
+        Args:
+            database (str): Path to the SQLite database
+            poll_interval (float): Seconds between checks for writes made by other workers
+            buffer_size (int): Number of recent events kept for reconnecting clients
+        """
+        self.database = database
+        self.poll_interval = poll_interval
+        self._events = deque(maxlen=buffer_size)
+        self._condition = threading.Condition()
+        self._wakeup = threading.Event()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._latest_seq = None
+        self._floor_seq = None
+
+    def start(self):
+        """Start the watcher thread if it is not already running."""
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, name='order-event-broadcaster', daemon=True
+            )
+            self._thread.start()
+
+    def notify(self):
+        """Wake the watcher thread after a local write so events go out immediately."""
+        self._wakeup.set()
+
+    def latest_seq(self, timeout=5):
+        """
+        Get the sequence number of the newest known event.
+
+        Returns:
+            int: Latest event sequence number (0 if the watcher is not ready)
+        """
+        self.start()
+        with self._condition:
+            self._condition.wait_for(lambda: self._latest_seq is not None, timeout)
+            return self._latest_seq or 0
+
+    def wait_for_events(self, after_seq, timeout):
+        """
+        Block until events newer than after_seq exist or the timeout expires.
+
+        Args:
+            after_seq (int): Last sequence number the subscriber has seen
+            timeout (float): Maximum seconds to wait
+
+        Returns:
+            tuple: (events, resync) where resync is True when the buffer no
+            longer covers after_seq and the subscriber must reload its data
+        """
+        self.start()
+        with self._condition:
+            self._condition.wait_for(lambda: self._latest_seq is not None, timeout)
+            if self._latest_seq is None:
+                return [], False
+
+            if after_seq < self._floor_seq or after_seq > self._latest_seq:
+                return [], True
+
+            self._condition.wait_for(lambda: self._latest_seq > after_seq, timeout)
+            return [event for event in self._events if event['seq'] > after_seq], False
+
+    def _run(self):
+        db = connect(self.database, readonly=True)
+        last_data_version = None
+
+        while True:
+            try:
+                if self._latest_seq is None:
+                    seq = db.execute('SELECT COALESCE(MAX(seq), 0) FROM order_events').fetchone()[0]
+                    with self._condition:
+                        self._latest_seq = self._floor_seq = seq
+                        self._condition.notify_all()
+
+                # data_version only changes when another connection commits,
+                # so an idle database costs one pragma per interval.
+                data_version = db.execute('PRAGMA data_version').fetchone()[0]
+                if data_version != last_data_version:
+                    last_data_version = data_version
+                    self._load_new_events(db)
+            except sqlite3.Error as e:
+                print(f"Error reading order events: {e}")
+
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _load_new_events(self, db):
+        columns = ', '.join(f'o.{field}' for field in ORDER_EVENT_FIELDS)
+        while True:
+            rows = db.execute(f'''
+                SELECT e.seq, e.order_id, e.event_type, e.status AS event_status,
+                       e.created_at AS event_time, o.id IS NOT NULL AS order_exists, {columns}
+                FROM order_events e
+                LEFT JOIN orders o ON o.id = e.order_id
+                WHERE e.seq > ?
+                ORDER BY e.seq
+                LIMIT 500
+            ''', (self._latest_seq,)).fetchall()
+            if not rows:
+                return
+
+            events = [self._row_to_event(row) for row in rows]
+            with self._condition:
+                for event in events:
+                    if len(self._events) == self._events.maxlen:
+                        self._floor_seq = self._events[0]['seq']
+                    self._events.append(event)
+                self._latest_seq = events[-1]['seq']
+                self._condition.notify_all()
+
+    @staticmethod
+    def _row_to_event(row):
+        order = None
+        if row['order_exists'] and row['event_type'] != 'deleted':
+            order = {field: row[field] for field in ORDER_EVENT_FIELDS}
+            order['extra_shot'] = bool(order['extra_shot'])
+            order['price'] = float(order['price']) if order['price'] else 0.0
+
+        return {
+            'seq': row['seq'],
+            'type': f"order_{row['event_type']}",
+            'order_id': row['order_id'],
+            'status': row['event_status'],
+            'timestamp': row['event_time'],
+            'order': order
+        }
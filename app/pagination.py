@@ -0,0 +1,118 @@
+"""
+Keyset (cursor) pagination helpers.
+
+A page is fetched with a WHERE condition that starts strictly after the last
+row of the previous page in sort order, instead of an OFFSET that makes
+SQLite walk every skipped row. The position travels between requests as an
+opaque token holding that row's sort key values.
+"""
+import base64
+import json
+
+
+def encode_page_token(values):
+    """
+    Encode the sort key values of a page's last row.
+
+    Args:
+        values (list): JSON-serializable sort key values
+
+    Returns:
+        str: URL-safe token
+    """
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_page_token(token, key_count):
+    """
+    Decode a token made by encode_page_token.
+
+    Args:
+        token (str): Token from a request (None or empty for the first page)
+        key_count (int): Number of sort keys the query uses
+
+    Returns:
+        list: Sort key values, or None for the first page
+
+    Raises:
+        ValueError: If the token is malformed
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid page token") from e
+
+    if (not isinstance(values, list) or len(values) != key_count
+            or not all(isinstance(value, (str, int, float)) for value in values)):
+        raise ValueError("Invalid page token")
+    return values
+
+
+def keyset_condition(keys, values):
+    """
+    Build the condition for rows that sort after the given position.
+
+    Args:
+        keys (list): (SQL expression, 'asc' or 'desc') pairs, in ORDER BY
+            order; the last key must be unique (normally the row id)
+        values (list): Sort key values of the previous page's last row
+
+    Returns:
+        tuple: (sql, params) to AND into the WHERE clause
+    """
+    directions = {direction for _, direction in keys}
+    if len(directions) == 1:
+        # A row-value comparison lets SQLite seek straight into a matching index
+        operator = '>' if directions == {'asc'} else '<'
+        columns = ', '.join(expression for expression, _ in keys)
+        placeholders = ', '.join('?' for _ in keys)
+        return f'({columns}) {operator} ({placeholders})', list(values)
+
+    clauses = []
+    params = []
+    for i, (expression, direction) in enumerate(keys):
+        operator = '>' if direction == 'asc' else '<'
+        parts = [f'{keys[j][0]} = ?' for j in range(i)] + [f'{expression} {operator} ?']
+        clauses.append('(' + ' AND '.join(parts) + ')')
+        params.extend(values[:i + 1])
+    return '(' + ' OR '.join(clauses) + ')', params
+
+
+def parse_page_size(value, default, maximum):
+    """
+    Read a page size argument, clamped to 1..maximum.
+
+    Args:
+        value (str): Raw request argument (may be None)
+        default (int): Size when the argument is missing or not a number
+        maximum (int): Largest size allowed
+
+    Returns:
+        int: Page size
+    """
+    try:
+        return min(max(int(value), 1), maximum)
+    except (ValueError, TypeError):
+        return default
+
+
+def split_page(rows, page_size, sort_key):
+    """
+    Trim a query fetched with LIMIT page_size + 1 to one page.
+
+    Args:
+        rows (list): Fetched rows, at most page_size + 1
+        page_size (int): Rows per page
+        sort_key (callable): Row -> list of its sort key values
+
+    Returns:
+        tuple: (rows on this page, token for the next page or None)
+    """
+    if len(rows) <= page_size:
+        return rows, None
+    page = rows[:page_size]
+    return page, encode_page_token(sort_key(page[-1]))
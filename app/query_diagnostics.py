@@ -0,0 +1,130 @@
+"""
+Opt-in query diagnostics: a slow-query log and per-request statement budgets.
+
+SlowQueryLog is handed to every connection get_db() wraps (see metrics.py).
+A statement that takes longer than the threshold, counting the time spent
+fetching its rows, is logged with its parameters, the route that ran it and
+its EXPLAIN QUERY PLAN, with any full table scans called out.
+
+Every wrapped connection also counts the statements run through it. A
+request's budget comes from the X-Query-Budget header or from the budget
+configured for its endpoint; going over it is logged, and the response
+carries the count in X-Query-Count so tests can assert on it (send
+X-Query-Budget: N to fail over N statements).
+"""
+import logging
+import sqlite3
+
+from flask import has_request_context, request
+
+from migrations import find_table_scans
+
+
+logger = logging.getLogger('hebrews.queries')
+
+QUERY_COUNT_HEADER = 'X-Query-Count'
+QUERY_BUDGET_HEADER = 'X-Query-Budget'
+QUERY_BUDGET_EXCEEDED_HEADER = 'X-Query-Budget-Exceeded'
+
+# Statements EXPLAIN QUERY PLAN has something to say about
+EXPLAINABLE_PREFIXES = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+class SlowQueryLog:
+    """Log statements slower than a threshold, with their query plans."""
+
+    def __init__(self, threshold_ms):
+        """
+        Args:
+            threshold_ms (float): Statements taking at least this long are logged
+        """
+        self.threshold_ms = threshold_ms
+
+    def record(self, db, sql, parameters, seconds, rows):
+        """
+        Log a finished statement if it was slow.
+
+        Args:
+            db (sqlite3.Connection): Connection the statement ran on
+            sql (str): Statement text
+            parameters: Parameters it was run with
+            seconds (float): Time to execute it and fetch its rows
+            rows (int): Rows fetched
+        """
+        elapsed_ms = seconds * 1000
+        if elapsed_ms < self.threshold_ms:
+            return
+
+        route = f'{request.method} {request.full_path}' if has_request_context() else '(no request)'
+        plan = explain(db, sql, parameters)
+        scans = find_table_scans(plan)
+        logger.warning(
+            "Slow query (%.1f ms, %d rows) in %s%s\n  SQL: %s\n  Parameters: %r\n  Plan: %s",
+            elapsed_ms, rows, route, ' [FULL SCAN]' if scans else '',
+            ' '.join(sql.split()), parameters, ' | '.join(plan) or '(unavailable)'
+        )
+
+
+def explain(db, sql, parameters=()):
+    """
+    Get the query plan for a statement with its parameters.
+
+    Args:
+        db (sqlite3.Connection): Connection to plan on
+        sql (str): Statement text
+        parameters: Parameters the statement runs with
+
+    Returns:
+        list: Plan detail strings (empty if the statement cannot be planned)
+    """
+    if not sql.lstrip().upper().startswith(EXPLAINABLE_PREFIXES):
+        return []
+    try:
+        return [row[3] for row in db.execute(f'EXPLAIN QUERY PLAN {sql}', parameters).fetchall()]
+    except sqlite3.Error:
+        return []
+
+
+def request_query_budget(budgets):
+    """
+    Get the statement budget for the current request.
+
+    Args:
+        budgets (dict): Endpoint name -> most statements it may run
+
+    Returns:
+        int: Budget, or None if the request has none
+    """
+    header = request.headers.get(QUERY_BUDGET_HEADER)
+    if header:
+        try:
+            return int(header)
+        except ValueError:
+            pass
+    return budgets.get(request.endpoint)
+
+
+def check_query_budget(response, statement_count, budgets):
+    """
+    Report the request's statement count and flag it if over budget.
+
+    Over-budget responses carry the budget in X-Query-Budget-Exceeded.
+
+    Args:
+        response: Flask response to add the X-Query-Count header to
+        statement_count (int): Statements the request ran
+        budgets (dict): Endpoint name -> most statements it may run
+
+    Returns:
+        bool: True if the request stayed within its budget (or has none)
+    """
+    response.headers[QUERY_COUNT_HEADER] = str(statement_count)
+    budget = request_query_budget(budgets)
+    if budget is None or statement_count <= budget:
+        return True
+    response.headers[QUERY_BUDGET_EXCEEDED_HEADER] = str(budget)
+    logger.warning(
+        "Query budget exceeded in %s %s: %d statements, budget %d",
+        request.method, request.full_path, statement_count, budget
+    )
+    return False
@@ -58,30 +58,92 @@ class InputValidator:
         
         return sanitized
     
+    # Words the first SQL_INJECTION_PATTERNS entry matches
+    SQL_KEYWORDS = frozenset([
+        'select', 'insert', 'update', 'delete', 'drop', 'create', 'alter', 'exec', 'union', 'script'
+    ])
+    
+    # Maps the punctuation and whitespace the fast path allows to spaces, so
+    # what is left splits into the runs of letters and digits \b sees as words
+    _WORD_SEPARATORS = str.maketrans({char: ' ' for char in '\t\n\r -.,!?()'})
+    
+    # Field -> (pattern, fast path pattern, max length, message if empty (None
+    # if optional), invalid characters message, SQL injection message).
+    #
+    # The fast path patterns allow only characters html.escape() leaves alone
+    # and the control-character filter keeps, so for input matching one,
+    # sanitize_string() would only strip it, and of the injection patterns
+    # only '--' or a bare SQL keyword can match. Anything else goes through
+    # sanitize_string() and the full checks, which decide it as before.
+    TEXT_FIELDS = {
+        'customer_name': (
+            CUSTOMER_NAME_PATTERN, re.compile(r'[a-zA-Z0-9 \t\n\r\-\.\,]{1,100}'), 100,
+            "Customer name is required", "Customer name contains invalid characters",
+            "Invalid customer name format"
+        ),
+        'search': (
+            SEARCH_PATTERN, re.compile(r'[a-zA-Z0-9 \t\n\r\-\.\,]{0,100}'), 100,
+            None, "Search query contains invalid characters", "Invalid search query format"
+        ),
+        'menu_item': (
+            MENU_ITEM_PATTERN, re.compile(r'[a-zA-Z0-9 \t\n\r\-\.\,]{1,50}'), 50,
+            "Item name is required", "Item name contains invalid characters", "Invalid item name format"
+        ),
+        'notes': (
+            NOTES_PATTERN, re.compile(r'[a-zA-Z0-9 \t\n\r\-\.\,\!\?\(\)]{0,500}'), 500,
+            None, "Notes contain invalid characters", "Invalid notes format"
+        ),
+    }
+    
     @staticmethod
-    def validate_customer_name(name):
+    def validate_text(field, value):
         """
-        Validate customer name input.
+        Validate and sanitize a free-text field.
         
         Args:
-            name (str): Customer name to validate
+            field (str): Key of TEXT_FIELDS
+            value (str): Input to validate
             
         Returns:
-            tuple: (is_valid, sanitized_name, error_message)
+            tuple: (is_valid, sanitized_value, error_message)
         """
-        if not name:
-            return False, "", "Customer name is required"
+        pattern, fast_pattern, max_length, required_error, invalid_error, injection_error = \
+            InputValidator.TEXT_FIELDS[field]
+        
+        if not value:
+            if required_error:
+                return False, "", required_error
+            return True, "", None
         
-        sanitized = InputValidator.sanitize_string(name, 100)
+        stripped = str(value).strip()
+        if (fast_pattern.fullmatch(stripped) and '--' not in stripped
+                and InputValidator.SQL_KEYWORDS.isdisjoint(
+                    stripped.lower().translate(InputValidator._WORD_SEPARATORS).split())):
+            return True, stripped, None
         
-        if not InputValidator.CUSTOMER_NAME_PATTERN.match(sanitized):
-            return False, "", "Customer name contains invalid characters"
+        sanitized = InputValidator.sanitize_string(value, max_length)
+        
+        if not pattern.match(sanitized):
+            return False, "", invalid_error
         
         if InputValidator.contains_sql_injection(sanitized):
-            return False, "", "Invalid customer name format"
+            return False, "", injection_error
         
         return True, sanitized, None
     
+    @staticmethod
+    def validate_customer_name(name):
+        """
+        Validate customer name input.
+        
+        Args:
+            name (str): Customer name to validate
+            
+        Returns:
+            tuple: (is_valid, sanitized_name, error_message)
+        """
+        return InputValidator.validate_text('customer_name', name)
+    
     @staticmethod
     def validate_search_query(query):
         """
@@ -93,18 +155,7 @@ class InputValidator:
         Returns:
             tuple: (is_valid, sanitized_query, error_message)
         """
-        if not query:
-            return True, "", None
-        
-        sanitized = InputValidator.sanitize_string(query, 100)
-        
-        if not InputValidator.SEARCH_PATTERN.match(sanitized):
-            return False, "", "Search query contains invalid characters"
-        
-        if InputValidator.contains_sql_injection(sanitized):
-            return False, "", "Invalid search query format"
-        
-        return True, sanitized, None
+        return InputValidator.validate_text('search', query)
     
     @staticmethod
     def validate_menu_item(item_name):
@@ -117,18 +168,7 @@ class InputValidator:
         Returns:
             tuple: (is_valid, sanitized_name, error_message)
         """
-        if not item_name:
-            return False, "", "Item name is required"
-        
-        sanitized = InputValidator.sanitize_string(item_name, 50)
-        
-        if not InputValidator.MENU_ITEM_PATTERN.match(sanitized):
-            return False, "", "Item name contains invalid characters"
-        
-        if InputValidator.contains_sql_injection(sanitized):
-            return False, "", "Invalid item name format"
-        
-        return True, sanitized, None
+        return InputValidator.validate_text('menu_item', item_name)
     
     @staticmethod
     def validate_notes(notes):
@@ -141,18 +181,7 @@ class InputValidator:
         Returns:
             tuple: (is_valid, sanitized_notes, error_message)
         """
-        if not notes:
-            return True, "", None
-        
-        sanitized = InputValidator.sanitize_string(notes, 500)
-        
-        if not InputValidator.NOTES_PATTERN.match(sanitized):
-            return False, "", "Notes contain invalid characters"
-        
-        if InputValidator.contains_sql_injection(sanitized):
-            return False, "", "Invalid notes format"
-        
-        return True, sanitized, None
+        return InputValidator.validate_text('notes', notes)
     
     @staticmethod
     def validate_price(price_str):
@@ -350,3 +379,58 @@ class SecureDatabase:
             params.extend(additional_params)
         
         return db.execute(full_query, params).fetchall()
+    
+    # Runs of letters and digits; the FTS5 unicode61 tokenizer splits on everything else
+    FTS_TOKEN_PATTERN = re.compile(r'[^\W_]+')
+    
+    @staticmethod
+    def build_fts_match(search_fields, search_term):
+        """
+        Build an FTS5 MATCH expression that prefix-matches every token of a term.
+        
+        Each token is double-quoted, so nothing in the term is read as FTS5
+        query syntax (AND, OR, NEAR, column filters or quotes).
+        
+        Args:
+            search_fields (list): FTS column names to search
+            search_term (str): Search term (any string; only its word tokens are used)
+            
+        Returns:
+            str: MATCH expression, or empty string if the term has no tokens
+        """
+        tokens = SecureDatabase.FTS_TOKEN_PATTERN.findall(search_term)
+        if not tokens:
+            return ""
+        
+        terms = ' AND '.join(f'"{token}"*' for token in tokens)
+        return f"{{{' '.join(search_fields)}}} : ({terms})"
+    
+    @staticmethod
+    def safe_fts_query(db, base_query, search_fields, search_term, additional_params=None, fts_table='orders_fts'):
+        """
+        Execute a full-text search against an FTS5 index with proper escaping.
+        
+        Args:
+            db: Database connection
+            base_query (str): Query with a {{FTS_MATCH}} placeholder for the
+                MATCH condition, whose parameter comes before additional_params
+            search_fields (list): FTS column names to search
+            search_term (str): Term to search for, already checked with
+                InputValidator by the route; only its quoted word tokens
+                reach the MATCH expression
+            additional_params (list): Additional parameters for the query
+            fts_table (str): FTS5 table the MATCH condition applies to
+            
+        Returns:
+            Query results
+        """
+        match_expression = SecureDatabase.build_fts_match(search_fields, search_term)
+        if not match_expression:
+            return []
+        
+        full_query = base_query.replace('{{FTS_MATCH}}', f'{fts_table} MATCH ?')
+        params = [match_expression]
+        if additional_params:
+            params.extend(additional_params)
+        
+        return db.execute(full_query, params).fetchall()
@@ -3,11 +3,48 @@ class AutoPrint {
     
     static printLabel(orderId) {
         console.log('Auto-printing label for order:', orderId);
-        
-        // Open PDF in new window with auto-print behavior
-        const printWindow = window.open(`/create_label/${orderId}`, '_blank', 'width=800,height=600,scrollbars=yes,resizable=yes');
+        AutoPrint.printPdf(`/create_label/${orderId}`);
+    }
+    
+    // Print several orders' labels as one multi-page PDF
+    static printLabels(orderIds) {
+        if (!orderIds || orderIds.length === 0) {
+            return;
+        }
+        console.log('Auto-printing labels for orders:', orderIds);
+        AutoPrint.printPdf('/create_labels', { ids: orderIds.join(',') });
+    }
+    
+    // Print every pending order whose label has not been printed yet
+    static printNewLabels() {
+        console.log('Auto-printing new labels');
+        AutoPrint.printPdf('/create_labels', { new: '1' });
+    }
+    
+    static printPdf(url, fields = {}) {
+        // Open PDF in new window with auto-print behavior. Printing records
+        // printed_at, so the label is POSTed (with the CSRF token) into it.
+        const windowName = `label-${Date.now()}`;
+        const printWindow = window.open('', windowName, 'width=800,height=600,scrollbars=yes,resizable=yes');
         
         if (printWindow) {
+            const form = document.createElement('form');
+            form.method = 'POST';
+            form.action = url;
+            form.target = windowName;
+            form.style.display = 'none';
+            Object.entries({ ...fields, csrf_token: getCookie('csrf_token') || '' }).forEach(([name, value]) => {
+                const input = document.createElement('input');
+                input.type = 'hidden';
+                input.name = name;
+                input.value = value;
+                form.appendChild(input);
+            });
+            document.body.appendChild(form);
+            form.submit();
+            form.remove();
+            
+
             let loadCheckInterval = null;
             let hasTriggeredPrint = false;
             
@@ -45,7 +82,9 @@ class AutoPrint {
                         return;
                     }
                     
-                    if (printWindow.document && printWindow.document.readyState === 'complete') {
+                    // The window starts out blank until the label arrives
+                    if (printWindow.location.href !== 'about:blank' && printWindow.document &&
+                        printWindow.document.readyState === 'complete') {
                         clearInterval(loadCheckInterval);
                         loadCheckInterval = null;
                         
@@ -90,3 +129,11 @@ window.AutoPrint = AutoPrint;
 window.printLabel = function(orderId) {
     AutoPrint.printLabel(orderId);
 };
+
+window.printLabels = function(orderIds) {
+    AutoPrint.printLabels(orderIds);
+};
+
+window.printNewLabels = function() {
+    AutoPrint.printNewLabels();
+};
@@ -41,4 +41,63 @@ document.addEventListener('DOMContentLoaded', () => {
       }
     }
   });
+
+  // Sales over time, from the pre-aggregated /api/analytics/timeseries
+  const salesCanvas = document.getElementById('salesChart');
+  const bucketSelect = document.getElementById('salesBucket');
+  if (!salesCanvas) return;
+  
+  const salesChart = new Chart(salesCanvas.getContext('2d'), {
+    type: 'bar',
+    data: { labels: [], datasets: [] },
+    options: {
+      responsive: true,
+      animation: false,
+      interaction: { mode: 'index', intersect: false },
+      plugins: {
+        title: { display: true, text: 'Orders and Revenue', font: { size: 16 } }
+      },
+      scales: {
+        x: { stacked: true, ticks: { maxTicksLimit: 12 } },
+        y: { stacked: true, beginAtZero: true, ticks: { precision: 0 }, title: { display: true, text: 'Orders' } },
+        revenue: { position: 'right', beginAtZero: true, grid: { drawOnChartArea: false }, title: { display: true, text: 'Revenue ($)' } }
+      }
+    }
+  });
+  
+  async function loadSalesSeries() {
+    const params = new URLSearchParams({ bucket: bucketSelect ? bucketSelect.value : 'hour' });
+    if (window.chartData.startDay) params.set('start', window.chartData.startDay);
+    if (window.chartData.endDay) params.set('end', window.chartData.endDay);
+    
+    try {
+      const response = await fetch(`/api/analytics/timeseries?${params}`);
+      if (!response.ok) return;
+      const series = await response.json();
+      
+      salesChart.data.labels = series.points.map(point => point.t);
+      salesChart.data.datasets = series.drinks.map((drink, i) => ({
+        label: drink,
+        data: series.points.map(point => point.drinks[drink] || 0),
+        backgroundColor: colors[i % colors.length],
+        stack: 'orders'
+      }));
+      salesChart.data.datasets.push({
+        type: 'line',
+        label: 'Revenue',
+        data: series.points.map(point => point.revenue),
+        borderColor: '#2c3e50',
+        pointRadius: 0,
+        yAxisID: 'revenue'
+      });
+      const step = series.step > 1 ? `${series.step} ${series.grain}s` : series.grain;
+      salesChart.options.plugins.title.text = `Orders and Revenue (per ${step})`;
+      salesChart.update();
+    } catch (error) {
+      console.error('Error loading sales time series:', error);
+    }
+  }
+  
+  if (bucketSelect) bucketSelect.addEventListener('change', loadSalesSeries);
+  loadSalesSeries();
 });
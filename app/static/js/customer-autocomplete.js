@@ -3,27 +3,40 @@ class CustomerAutocomplete {
     constructor() {
         this.customerInput = document.getElementById('customer_name');
         this.suggestionsDiv = document.getElementById('customer-suggestions');
-        this.customers = new Set();
+        this.suggestionCache = new Map(); // query -> matches, for backspacing and retyping
+        this.pendingRequest = null;
+        this.debounceTimer = null;
         this.init();
     }
 
     init() {
         if (!this.customerInput || !this.suggestionsDiv) return;
         
-        this.loadCustomers();
         this.setupEventListeners();
     }
 
-    async loadCustomers() {
-        try {
-            const response = await fetch('/api/customers');
-            if (response.ok) {
-                const data = await response.json();
-                this.customers = new Set(data.customers);
-            }
-        } catch (error) {
-            console.error('Error loading customers:', error);
+    // Ask the server for the best prefix matches instead of downloading every customer
+    async fetchSuggestions(query) {
+        const key = query.toLowerCase();
+        if (this.suggestionCache.has(key)) {
+            return this.suggestionCache.get(key);
         }
+
+        // Only the latest keystroke's request matters
+        if (this.pendingRequest) {
+            this.pendingRequest.abort();
+        }
+        this.pendingRequest = new AbortController();
+
+        const response = await fetch(`/api/customers/suggest?q=${encodeURIComponent(query)}&limit=5`, {
+            signal: this.pendingRequest.signal
+        });
+        if (!response.ok) {
+            return [];
+        }
+        const data = await response.json();
+        this.suggestionCache.set(key, data.customers);
+        return data.customers;
     }
 
     setupEventListeners() {
@@ -47,20 +60,30 @@ class CustomerAutocomplete {
     }
 
     handleInput(value) {
-        if (value.length < 2) {
+        clearTimeout(this.debounceTimer);
+        if (value.trim().length < 2) {
             this.hideSuggestions();
             return;
         }
 
-        const matches = Array.from(this.customers)
-            .filter(customer => customer.toLowerCase().includes(value.toLowerCase()))
-            .slice(0, 5);
+        this.debounceTimer = setTimeout(async () => {
+            let matches = [];
+            try {
+                matches = await this.fetchSuggestions(value.trim());
+            } catch (error) {
+                if (error.name === 'AbortError') return;
+                console.error('Error loading customer suggestions:', error);
+            }
 
-        if (matches.length > 0) {
-            this.showSuggestions(matches, value);
-        } else {
-            this.hideSuggestions();
-        }
+            // Ignore answers for text the user has already changed
+            if (this.customerInput.value !== value) return;
+
+            if (matches.length > 0) {
+                this.showSuggestions(matches, value);
+            } else {
+                this.hideSuggestions();
+            }
+        }, 150);
     }
 
     showSuggestions(matches, inputValue) {
@@ -7,10 +7,19 @@ class RealTimeManager {
         this.isActive = true;
         this.defaultInterval = 5000; // 5 seconds
         this.maxInterval = 30000; // 30 seconds
+        this.streamEndpoint = '/api/orders/stream';
+        this.eventSource = null;
+        this.streamConnected = false;
+        this.streamFallbackDelay = 5000; // Start polling if the stream stays down this long
+        this.streamFallbackTimer = null;
+        this.streamRefreshTimer = null;
         this.init();
     }
 
     init() {
+        // Prefer pushed order events; pollers only run while the stream is down
+        this.connectStream();
+
         // Handle page visibility changes to pause polling when tab is inactive
         document.addEventListener('visibilitychange', () => {
             this.isActive = !document.hidden;
@@ -79,6 +88,9 @@ class RealTimeManager {
         
         this.pollers.set(dataType, poller);
         poller.start();
+        if (this.streamConnected) {
+            poller.setPushMode(true);
+        }
     }
 
     /**
@@ -144,6 +156,7 @@ class RealTimeManager {
      * Cleanup all resources
      */
     cleanup() {
+        this.disconnectStream();
         this.pollers.forEach((poller) => {
             poller.stop();
         });
@@ -168,6 +181,81 @@ class RealTimeManager {
             poller.forceRefresh();
         }
     }
+
+    /**
+     * Open the order event stream (Server-Sent Events)
+     */
+    connectStream() {
+        if (!window.EventSource || this.eventSource) return;
+
+        const source = new EventSource(this.streamEndpoint);
+        this.eventSource = source;
+
+        source.addEventListener('open', () => {
+            clearTimeout(this.streamFallbackTimer);
+            this.streamFallbackTimer = null;
+            this.setStreamConnected(true);
+            // Catch up on anything that changed while we were disconnected
+            this.refreshAllFromStream();
+        });
+
+        ['order_created', 'order_status_changed', 'order_deleted', 'resync'].forEach(eventType => {
+            source.addEventListener(eventType, () => this.refreshAllFromStream());
+        });
+
+        source.addEventListener('error', () => {
+            if (source.readyState === EventSource.CLOSED) {
+                // The browser gave up (e.g. session expired); retry later ourselves
+                this.eventSource = null;
+                this.setStreamConnected(false);
+                setTimeout(() => this.connectStream(), this.maxInterval);
+            } else if (!this.streamFallbackTimer) {
+                // EventSource reconnects on its own; only fall back to polling
+                // if the stream stays down
+                this.streamFallbackTimer = setTimeout(() => {
+                    this.streamFallbackTimer = null;
+                    this.setStreamConnected(false);
+                }, this.streamFallbackDelay);
+            }
+        });
+    }
+
+    /**
+     * Close the order event stream
+     */
+    disconnectStream() {
+        clearTimeout(this.streamFallbackTimer);
+        clearTimeout(this.streamRefreshTimer);
+        if (this.eventSource) {
+            this.eventSource.close();
+            this.eventSource = null;
+        }
+        this.streamConnected = false;
+    }
+
+    /**
+     * Switch pollers between push mode (stream up) and interval polling (stream down)
+     */
+    setStreamConnected(connected) {
+        if (this.streamConnected === connected) return;
+        this.streamConnected = connected;
+        this.pollers.forEach((poller) => {
+            poller.setPushMode(connected);
+        });
+    }
+
+    /**
+     * Refresh every subscription once, coalescing bursts of events
+     */
+    refreshAllFromStream() {
+        if (this.streamRefreshTimer) return;
+        this.streamRefreshTimer = setTimeout(() => {
+            this.streamRefreshTimer = null;
+            this.pollers.forEach((poller) => {
+                poller.forceRefresh();
+            });
+        }, 100);
+    }
 }
 
 /**
@@ -184,11 +272,14 @@ class SmartPoller {
         this.maxInterval = 60000; // Max 60 seconds  
         this.minInterval = 10000; // Min 10 seconds
         this.lastUpdate = Date.now();
+        this.cursor = null; // Change cursor from endpoints that support delta sync
         this.lastHash = null;
         this.consecutiveNoChanges = 0;
         this.timeoutId = null;
         this.errorCount = 0;
         this.maxErrors = 5;
+        this.pushMode = false; // When true, only poll on forceRefresh()
+        this.isPolling = false;
     }
 
     start() {
@@ -233,8 +324,24 @@ class SmartPoller {
         }
     }
 
+    setPushMode(enabled) {
+        this.pushMode = enabled;
+        if (enabled) {
+            // Updates arrive through forceRefresh(); stop the interval timer
+            if (this.timeoutId) {
+                clearTimeout(this.timeoutId);
+                this.timeoutId = null;
+            }
+        } else if (this.isRunning && !this.isPaused && !this.timeoutId && !this.isPolling) {
+            this.errorCount = 0;
+            this.currentInterval = this.minInterval;
+            this.poll();
+        }
+    }
+
     async poll() {
         if (!this.isRunning || this.isPaused) return;
+        this.isPolling = true;
 
         try {
             const url = new URL(this.endpoint, window.location.origin);
@@ -244,8 +351,10 @@ class SmartPoller {
                 url.searchParams.set(key, this.params[key]);
             });
 
-            // Add timestamp for change detection
-            url.searchParams.set('since', this.lastUpdate);
+            // Ask for changes since the last cursor the endpoint gave us
+            if (this.cursor !== null) {
+                url.searchParams.set('since', this.cursor);
+            }
 
             const headers = {
                 'Accept': 'application/json',
@@ -280,6 +389,9 @@ class SmartPoller {
                     this.lastHash = data.hash;
                     this.lastUpdate = data.timestamp || Date.now();
                 }
+                if (data.cursor !== undefined) {
+                    this.cursor = data.cursor;
+                }
                 
                 this.errorCount = 0; // Reset error count on success
             } else {
@@ -288,6 +400,7 @@ class SmartPoller {
         } catch (error) {
             this.handleError(error);
         }
+        this.isPolling = false;
 
         // Schedule next poll
         this.scheduleNext();
@@ -329,7 +442,8 @@ class SmartPoller {
     }
 
     scheduleNext() {
-        if (this.isRunning && !this.isPaused) {
+        this.timeoutId = null;
+        if (this.isRunning && !this.isPaused && !this.pushMode) {
             this.timeoutId = setTimeout(() => this.poll(), this.currentInterval);
         }
     }
@@ -346,6 +460,17 @@ class OrderDisplayManager {
         this.animationEnabled = true;
         this.waitTimeThresholds = { yellow: 5, red: 10 }; // Default values
         this.loadWaitTimeThresholds();
+
+        // Unchanged orders are not resent (and never are in push mode), so age
+        // wait times locally
+        this.waitTimeTimer = setInterval(() => this.refreshWaitTimes(), 30000);
+    }
+
+    /**
+     * Stop aging wait times
+     */
+    destroy() {
+        clearInterval(this.waitTimeTimer);
     }
 
     /**
@@ -357,6 +482,7 @@ class OrderDisplayManager {
             if (response.ok) {
                 const data = await response.json();
                 this.waitTimeThresholds = data;
+                this.refreshWaitTimes();
             }
         } catch (error) {
             console.warn('Failed to load wait time thresholds, using defaults:', error);
@@ -432,14 +558,46 @@ class OrderDisplayManager {
      */
     updateWaitTimes(orders) {
         orders.forEach(order => {
-            const element = this.orderElements.get(order.id);
-            if (element && element.element) {
-                const waitTimeElement = element.element.querySelector('.wait-time');
-                if (waitTimeElement && order.wait_time_minutes > 0) {
-                    waitTimeElement.textContent = `Wait: ${order.wait_time_minutes.toFixed(0)}m`;
-                }
+            const existing = this.orderElements.get(order.id);
+            if (existing) {
+                existing.data = order;
             }
         });
+        this.refreshWaitTimes();
+    }
+
+    /**
+     * Minutes an order has waited, from its created_at (stored in UTC as
+     * 'YYYY-MM-DD HH:MM:SS'), so the figure keeps moving between updates
+     */
+    waitMinutes(order) {
+        if (order.status === 'completed') return 0;
+        if (!order.created_at) return order.wait_time_minutes || 0;
+        const createdAt = new Date(order.created_at.replace(' ', 'T') + 'Z');
+        return Math.max(0, (Date.now() - createdAt) / 60000);
+    }
+
+    /**
+     * Set an order element's wait text and threshold styling
+     */
+    applyWaitTime(element, order) {
+        const minutes = this.waitMinutes(order);
+        element.classList.toggle('wait-time-urgent', minutes >= this.waitTimeThresholds.red);
+        element.classList.toggle('wait-time-warning',
+            minutes >= this.waitTimeThresholds.yellow && minutes < this.waitTimeThresholds.red);
+
+        const waitTimeElement = element.querySelector('.wait-time');
+        if (waitTimeElement) {
+            waitTimeElement.textContent = `Wait: ${minutes.toFixed(0)}m`;
+            waitTimeElement.hidden = minutes < 1;
+        }
+    }
+
+    /**
+     * Re-age every displayed order's wait time
+     */
+    refreshWaitTimes() {
+        this.orderElements.forEach(({ element, data }) => this.applyWaitTime(element, data));
     }
 
     /**
@@ -557,13 +715,6 @@ class OrderDisplayManager {
             li.classList.add('border-info');
         }
         
-        // Add wait time styling based on configurable thresholds
-        if (order.wait_time_minutes >= this.waitTimeThresholds.red) {
-            li.classList.add('wait-time-urgent');
-        } else if (order.wait_time_minutes >= this.waitTimeThresholds.yellow) {
-            li.classList.add('wait-time-warning');
-        }
-
         li.innerHTML = `
             <div>
                 <strong>${this.escapeHtml(order.customer_name)}'s ${this.escapeHtml(order.drink)}</strong>
@@ -571,7 +722,7 @@ class OrderDisplayManager {
                 ${order.extra_shot ? '<br><small class="text-muted">+ Extra Shot</small>' : ''}
                 ${order.notes ? `<br><small class="text-muted">Note: ${this.escapeHtml(order.notes)}</small>` : ''}
                 <br><small class="fw-bold">Price: $${order.price.toFixed(2)}</small>
-                ${order.wait_time_minutes > 0 ? `<br><small class="text-info wait-time">Wait: ${order.wait_time_minutes.toFixed(0)}m</small>` : ''}
+                <div class="small text-info wait-time"></div>
             </div>
             <div class="d-flex gap-2">
                 <button onclick="printLabel(${order.id})" class="btn btn-warning btn-sm">Print Label</button>
@@ -583,6 +734,8 @@ class OrderDisplayManager {
             </div>
         `;
 
+        // Wait text and threshold styling (see applyWaitTime)
+        this.applyWaitTime(li, order);
         return li;
     }
 
@@ -690,6 +843,25 @@ window.updateOrderStatus = async function(orderId, newStatus) {
     }
 };
 
+// Apply a status ('pending', 'in_progress', 'completed') or 'delete' to many
+// orders in one request; resolves with the changed count and order counts
+window.bulkUpdateOrders = async function(orderIds, action) {
+    const response = await fetch('/api/orders/bulk', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': getCookie('csrf_token')
+        },
+        body: JSON.stringify({ order_ids: orderIds, action: action })
+    });
+    const result = await response.json();
+    if (!response.ok) {
+        throw new Error(result.error || `HTTP ${response.status}`);
+    }
+    realTimeManager.forceRefresh('orders');
+    return result;
+};
+
 window.deleteOrderConfirm = function(orderId) {
     if (!confirm('Are you sure you want to delete this order?')) {
         return;
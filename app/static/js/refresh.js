@@ -64,6 +64,9 @@ class MainPageOrderManager {
         if (this.unsubscribe) {
             this.unsubscribe();
         }
+        if (this.orderDisplayManager) {
+            this.orderDisplayManager.destroy();
+        }
     }
 }
 
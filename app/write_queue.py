@@ -0,0 +1,181 @@
+"""
+Single-writer queue that group-commits order, status and menu writes.
+
+Every request used to write on its own connection and commit straight away,
+so concurrent writers in a worker took turns at the database lock, one
+commit each, and a writer whose deferred transaction had to upgrade to a
+write lock could fail with "database is locked" instead of waiting.
+
+WriteQueue gives each worker one writer thread with its own connection.
+Requests hand it a job, a function that takes the connection and returns a
+result, and block until it has run. The writer takes every job that queued
+while the last transaction ran (and, if configured, any that arrive within
+a few milliseconds of the first), opens one BEGIN IMMEDIATE transaction and
+runs each job in its own savepoint. A job that raises is rolled back on its own and its exception goes back to its
+caller; the others commit together, and each caller gets its own result.
+
+A caller that gives up waiting cancels its job, so a job still queued
+when its caller has already reported a timeout is never run. If the writer
+cannot open its connection, the queued jobs fail with that error and the
+next submit starts a new writer.
+
+Jobs must not commit or roll back themselves, and should only do database
+work; validation belongs in the request before the job is submitted.
+"""
+import os
+import queue
+import threading
+import time
+
+
+# How long the writer waits for more jobs after the first. Under load the jobs
+# that queue while one transaction commits already form the next group, and
+# waiting only delays a lone writer, so by default it does not wait.
+GROUP_COMMIT_WINDOW_SECONDS = 0.0
+MAX_GROUP_SIZE = 64                    # Most jobs committed in one transaction
+SUBMIT_TIMEOUT_SECONDS = 30            # Callers give up if the writer is stuck this long
+
+
+class WriteJob:
+    """One queued write and, once it has run, its result or exception."""
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+        self.cancelled = False
+        self._started = False
+        self._state_lock = threading.Lock()
+
+    def cancel(self):
+        """
+        Stop the writer from running the job, unless it already has.
+
+        Returns:
+            bool: True if the job will not run
+        """
+        with self._state_lock:
+            if not self._started:
+                self.cancelled = True
+            return self.cancelled
+
+    def start(self):
+        """
+        Claim the job for the writer.
+
+        Returns:
+            bool: False if its caller cancelled it
+        """
+        with self._state_lock:
+            self._started = not self.cancelled
+            return self._started
+
+
+class WriteQueue:
+    """One writer thread per process that runs queued writes in shared transactions."""
+
+    def __init__(self, connect, window_seconds=GROUP_COMMIT_WINDOW_SECONDS, max_group_size=MAX_GROUP_SIZE):
+        """
+        Args:
+            connect: Function returning the writer's read-write connection
+            window_seconds (float): Wait this long after a job for others to join it
+            max_group_size (int): Most jobs per transaction
+        """
+        self._connect = connect
+        self.window_seconds = window_seconds
+        self.max_group_size = max_group_size
+        self._lock = threading.Lock()
+        self._jobs = None
+        self._pid = None
+
+    def submit(self, fn, timeout=SUBMIT_TIMEOUT_SECONDS):
+        """
+        Run a write on the writer thread and wait for it to commit.
+
+        Args:
+            fn: Function taking the writer's connection; must not commit
+            timeout (float): Seconds to wait before raising TimeoutError
+
+        Returns:
+            Whatever fn returned, once its transaction has committed
+
+        Raises:
+            TimeoutError: If the write has not committed in time; it is
+                cancelled unless the writer had already started it
+            Exception: Whatever fn raised (its changes are rolled back), or
+                the commit's error
+        """
+        job = WriteJob(fn)
+        self._queue().put(job)
+        if not job.done.wait(timeout):
+            if job.cancel():
+                raise TimeoutError(f"Write not run within {timeout} seconds; it was cancelled")
+            raise TimeoutError(f"Write not committed within {timeout} seconds; it was running and may still commit")
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def _queue(self):
+        # Threads do not survive gunicorn's fork, so each worker starts its own
+        # writer on first use
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._jobs = queue.Queue()
+                    threading.Thread(target=self._run, args=(self._jobs,), name='write-queue', daemon=True).start()
+                    self._pid = os.getpid()
+        return self._jobs
+
+    def _run(self, jobs):
+        try:
+            db = self._connect()
+        except Exception as e:
+            # Let the next submit start a fresh writer, and fail what is queued here
+            with self._lock:
+                if self._jobs is jobs:
+                    self._pid = None
+            while True:
+                try:
+                    job = jobs.get_nowait()
+                except queue.Empty:
+                    return
+                job.error = e
+                job.done.set()
+        while True:
+            group = [jobs.get()]
+            deadline = time.monotonic() + self.window_seconds
+            while len(group) < self.max_group_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    group.append(jobs.get(timeout=remaining) if remaining > 0 else jobs.get_nowait())
+                except queue.Empty:
+                    break
+            self._commit(db, group)
+
+    @staticmethod
+    def _commit(db, group):
+        group = [job for job in group if job.start()]
+        if not group:
+            return
+        try:
+            db.execute('BEGIN IMMEDIATE')
+            for job in group:
+                db.execute('SAVEPOINT write_job')
+                try:
+                    job.result = job.fn(db)
+                    db.execute('RELEASE write_job')
+                except Exception as e:
+                    db.execute('ROLLBACK TO write_job')
+                    db.execute('RELEASE write_job')
+                    job.error = e
+            db.commit()
+        except Exception as e:
+            if db.in_transaction:
+                db.rollback()
+            for job in group:
+                if job.error is None:
+                    job.result, job.error = None, e
+        finally:
+            for job in group:
+                job.done.set()
@@ -0,0 +1,34 @@
+"""
+Labels per second from /create_label.
+
+Renders labels for distinct orders (cache misses) and then reprints the same
+order (cache hits once label caching is in place).
+
+Usage: python benchmarks/bench_labels.py [--orders 200] [--iterations 200]
+"""
+import argparse
+import itertools
+
+from common import load_app, logged_in_client, measure, print_result, seed_orders
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orders', type=int, default=200)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    app_module, database = load_app()
+    seed_orders(database, args.orders)
+    client = logged_in_client(app_module)
+
+    order_ids = itertools.cycle(range(1, args.orders + 1))
+    print(f"{args.orders} orders, {args.iterations} labels per case")
+    print_result('distinct orders', measure(
+        lambda: client.post(f'/create_label/{next(order_ids)}'), min(args.iterations, args.orders), warmup=0
+    ))
+    print_result('reprint same order', measure(lambda: client.post('/create_label/1'), args.iterations))
+
+
+if __name__ == '__main__':
+    main()
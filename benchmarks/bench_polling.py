@@ -0,0 +1,38 @@
+"""
+Latency of the endpoints every open screen polls.
+
+Conditional requests replay the ETag from a first response, as an open
+screen does between changes, and should come back 304.
+
+Usage: python benchmarks/bench_polling.py [--orders 10000] [--iterations 500]
+"""
+import argparse
+
+from common import load_app, logged_in_client, measure, print_result, seed_orders
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orders', type=int, default=10000)
+    parser.add_argument('--iterations', type=int, default=500)
+    args = parser.parse_args()
+
+    app_module, database = load_app()
+    seed_orders(database, args.orders)
+    client = logged_in_client(app_module)
+
+    print(f"{args.orders} orders, {args.iterations} requests per endpoint")
+    for route in ['/api/order-count', '/api/orders/pending', '/api/orders/live',
+                  '/api/orders/live?status=completed', '/api/wait-time-thresholds']:
+        result = measure(lambda: client.get(route), args.iterations)
+        print_result(route, result)
+
+    for route in ['/api/orders/pending', '/api/orders/live', '/api/orders/live?status=all']:
+        headers = {'If-None-Match': client.get(route).headers['ETag']}
+        assert client.get(route, headers=headers).status_code == 304
+        result = measure(lambda: client.get(route, headers=headers), args.iterations)
+        print_result(f'{route} (304)', result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Order search: the old LIKE '%term%' scan against the FTS5 index.
+
+Both run the query /orders issues for status=all, straight against SQLite,
+so the numbers isolate the search itself.
+
+Usage: python benchmarks/bench_search.py [--orders 100000 1000000] [--iterations 50]
+"""
+import argparse
+
+from common import load_app, measure, print_result, seed_orders
+
+
+SEARCH_TERMS = ['alice', 'hannah 12', 'latte', 'extra hot', 'mug']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orders', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--iterations', type=int, default=50)
+    args = parser.parse_args()
+
+    app_module = None
+    for count in args.orders:
+        if app_module is None:
+            app_module, database = load_app()
+        else:
+            database = app_module.DATABASE
+            db = app_module.connect(database)
+            db.execute('DELETE FROM orders')
+            db.commit()
+            db.close()
+        seed_orders(database, count)
+
+        from security_utils import InputValidator, SecureDatabase
+        db = app_module.connect(database, readonly=True)
+        fields = ['customer_name', 'drink', 'notes']
+
+        print(f"{count} orders, {args.iterations} searches per term")
+        for term in SEARCH_TERMS:
+            like_pattern = f'%{InputValidator.escape_like_pattern(term)}%'
+            like_sql = ('SELECT * FROM orders WHERE customer_name LIKE ? OR drink LIKE ? OR notes LIKE ? '
+                        'ORDER BY created_at DESC')
+            like = measure(lambda: db.execute(like_sql, [like_pattern] * 3).fetchall(), args.iterations, warmup=1)
+            print_result(f'LIKE  {term!r}', like)
+
+            fts_sql = ('SELECT orders.* FROM orders_fts JOIN orders ON orders.id = orders_fts.rowid '
+                       'WHERE {{FTS_MATCH}} ORDER BY orders_fts.rank, created_at DESC')
+            fts = measure(lambda: SecureDatabase.safe_fts_query(db, fts_sql, fields, term), args.iterations, warmup=1)
+            print_result(f'FTS5  {term!r}', fts)
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
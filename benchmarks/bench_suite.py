@@ -0,0 +1,199 @@
+"""
+Every rush-hour endpoint at several database sizes, with results saved as JSON.
+
+Each size runs in a fresh process against its own seeded database (orders
+spread over 90 days, the default menu plus seasonal items, and the customers
+table the order triggers build), so caches and connections never carry over
+between sizes. Reads are measured first, then the writes that change the
+data: new orders, group orders through the batch endpoint, then status
+updates on the single new orders.
+
+The JSON file records the commit, Python and SQLite versions and, for each
+size and endpoint, the percentiles and throughput from common.measure(). Pass
+an earlier file as --compare to print the change in p50 and throughput.
+
+Usage: python benchmarks/bench_suite.py [--orders 1000 100000 1000000]
+           [--iterations 200] [--output FILE] [--compare FILE]
+"""
+import argparse
+import datetime
+import itertools
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import CUSTOMER_NAMES, load_app, logged_in_client, measure, print_result, seed_menu, seed_orders
+
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Endpoints that stream every matching row run fewer iterations
+HEAVY_ITERATION_DIVISOR = 20
+
+BATCH_ORDER_SIZE = 50
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARK_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def checked(response):
+    """Fail the run instead of timing error pages."""
+    assert response.status_code in (200, 302), (response.status_code, response.data[:200])
+    return response
+
+
+def run_size(orders, iterations):
+    """
+    Benchmark one database size in this process.
+
+    Returns:
+        dict: Endpoint name -> measure() result
+    """
+    app_module, database = load_app()
+    seed_menu(database)
+    started = time.perf_counter()
+    seed_orders(database, orders)
+    print(f"{orders} orders seeded in {time.perf_counter() - started:.1f}s, "
+          f"{iterations} requests per endpoint", file=sys.stderr)
+
+    client = logged_in_client(app_module)
+    heavy_iterations = max(3, iterations // HEAVY_ITERATION_DIVISOR)
+    label_ids = itertools.cycle(range(max(1, orders - 500), orders + 1))
+    results = {}
+
+    def run(name, fn, count=iterations, warmup=5):
+        results[name] = measure(fn, count, warmup)
+        print_result(name, results[name])
+
+    run('GET /api/order-count', lambda: checked(client.get('/api/order-count')))
+    run('GET /api/orders/pending', lambda: checked(client.get('/api/orders/pending')))
+    run('GET /api/orders/live', lambda: checked(client.get('/api/orders/live?status=all')))
+    # An open screen polls with the cursor from its last response
+    cursor = checked(client.get('/api/orders/live?status=all')).get_json()['cursor']
+    run('GET /api/orders/live (delta)', lambda: checked(client.get(f'/api/orders/live?status=all&since={cursor}')))
+    run('GET /completed', lambda: checked(client.get('/completed')))
+    # A season of hourly buckets, which downsamples to one point per day
+    season = datetime.date.today() - datetime.timedelta(days=89), datetime.date.today()
+    season_url = f'/api/analytics/timeseries?start={season[0]}&end={season[1]}&bucket=hour'
+
+    def season_uncached():
+        app_module.timeseries_cache.clear()
+        checked(client.get(season_url))
+
+    run('GET /api/analytics/timeseries (90 days)', season_uncached)
+    run('GET /api/analytics/timeseries (cached)', lambda: checked(client.get(season_url)))
+    run('GET /orders?search=', lambda: checked(client.get('/orders?status=all&search=hannah 12')))
+    run('GET /export_completed_csv', lambda: checked(client.get('/export_completed_csv')).data,
+        heavy_iterations, warmup=1)
+    run('POST /create_label', lambda: checked(client.post(f'/create_label/{next(label_ids)}')))
+
+    new_order_ids = []
+    names = itertools.cycle(CUSTOMER_NAMES)
+
+    def place_order():
+        response = checked(client.post('/order', data={
+            'customer_name': f'{next(names)} Rush', 'drink': 'Latte', 'milk': 'Oat', 'syrup': 'Vanilla',
+            'foam': 'Regular', 'temperature': 'Hot', 'notes': 'Extra hot', 'ajax': 'true',
+        }))
+        new_order_ids.append(response.get_json()['order_id'])
+
+    run('POST /order', place_order, warmup=0)
+
+    # A group order: 50 drinks in one request and one transaction
+    def place_batch():
+        response = checked(client.post('/api/orders/batch', json={'orders': [{
+            'customer_name': f'{next(names)} Group', 'drink': 'Latte', 'milk': 'Oat', 'syrup': 'Vanilla',
+            'foam': 'Regular', 'temperature': 'Hot', 'notes': 'Extra hot',
+        } for _ in range(BATCH_ORDER_SIZE)]}))
+        assert len(response.get_json()['order_ids']) == BATCH_ORDER_SIZE
+
+    run(f'POST /api/orders/batch ({BATCH_ORDER_SIZE})', place_batch, count=max(3, iterations // 10), warmup=0)
+
+    # Each new order moves to in_progress, then (on the second pass) to completed
+    status_updates = itertools.product(['in_progress', 'completed'], new_order_ids)
+
+    def update_status():
+        status, order_id = next(status_updates)
+        checked(client.post(f'/update_status/{order_id}', data={'status': status}))
+
+    run('POST /update_status', update_status, count=2 * len(new_order_ids), warmup=0)
+    return results
+
+
+def compare(baseline, current):
+    print(f"\nChange against {baseline.get('commit', '?')} (p50 latency, throughput):")
+    for size, endpoints in current['results'].items():
+        for name, result in endpoints.items():
+            before = baseline.get('results', {}).get(size, {}).get(name)
+            if not before:
+                continue
+            p50_change = (result['p50_ms'] / before['p50_ms'] - 1) * 100 if before['p50_ms'] else 0.0
+            rate_change = (result['per_second'] / before['per_second'] - 1) * 100 if before['per_second'] else 0.0
+            print(f"{size:>8} {name:<32} p50 {p50_change:+7.1f}%  throughput {rate_change:+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--output', help='JSON results file (default benchmarks/results/suite-<commit>.json)')
+    parser.add_argument('--compare', help='Earlier results file to compare against')
+    parser.add_argument('--run-size', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--partial', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_size is not None:
+        # Child process for one size; the parent collects the partial file
+        with open(args.partial, 'w') as f:
+            json.dump(run_size(args.run_size, args.iterations), f)
+        return
+
+    commit = git_commit()
+    report = {
+        'commit': commit,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'iterations': args.iterations,
+        'results': {},
+    }
+    for orders in args.orders:
+        print(f"\n== {orders} orders ==")
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as partial:
+            partial_path = partial.name
+        try:
+            subprocess.run([
+                sys.executable, os.path.abspath(__file__), '--run-size', str(orders),
+                '--iterations', str(args.iterations), '--partial', partial_path
+            ], check=True)
+            with open(partial_path) as f:
+                report['results'][str(orders)] = json.load(f)
+        finally:
+            os.remove(partial_path)
+
+    output = args.output or os.path.join(BENCHMARK_DIR, 'results', f'suite-{commit}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+InputValidator: the original validation path against the compiled fast path.
+
+Times both on the text fields of typical orders and searches. The
+differential corpus defined here (hand-picked edge cases plus seeded random
+strings built from characters and SQL fragments the rules care about) is run
+through both by tests/test_validation.py, which fails if any result differs.
+
+Usage: python benchmarks/bench_validation.py [--iterations 2000]
+"""
+import argparse
+import random
+import sys
+
+from common import APP_DIR, CUSTOMER_NAMES, NOTES, measure
+
+sys.path.insert(0, APP_DIR)
+from security_utils import InputValidator  # noqa: E402
+
+
+# The validators as they were before the fast path: field -> (pattern, max length,
+# message if empty (None if optional), invalid characters message, injection message)
+LEGACY_FIELDS = {
+    'customer_name': (InputValidator.CUSTOMER_NAME_PATTERN, 100, "Customer name is required",
+                      "Customer name contains invalid characters", "Invalid customer name format"),
+    'search': (InputValidator.SEARCH_PATTERN, 100, None,
+               "Search query contains invalid characters", "Invalid search query format"),
+    'menu_item': (InputValidator.MENU_ITEM_PATTERN, 50, "Item name is required",
+                  "Item name contains invalid characters", "Invalid item name format"),
+    'notes': (InputValidator.NOTES_PATTERN, 500, None,
+              "Notes contain invalid characters", "Invalid notes format"),
+}
+
+# The words the first SQL_INJECTION_PATTERNS entry matches, spelled out here
+# rather than read from InputValidator.SQL_KEYWORDS so the corpus catches
+# that set drifting
+SQL_WORDS = ['select', 'insert', 'update', 'delete', 'drop', 'create', 'alter', 'exec', 'union', 'script']
+
+# Characters and fragments that exercise escaping, the control-character
+# filter, Unicode case folding and whitespace, and each injection pattern
+PIECES = (
+    list('abcXYZ019 -.,!?()&\'"<>#/*;_=%\\') +
+    ['\t', '\n', '\r', '\x00', '\x0b', '\x0c', '\x1c', '\x1f', '\x7f', '\x85', '\xa0', ' ',
+     'ſ', 'K', '\xe9', 'select', 'SELECT', 'Union', 'union all select', 'drop', 'Exec',
+     'selection', 'or', 'AND', "'1'='1'", "' OR 1=1", "' and 1 = 1", "' or '' = '", '--', '/*', '*/',
+     'Hannah', 'Latte', 'extra hot'] +
+    SQL_WORDS
+)
+
+# Pieces the fast path accepts on their own, so random cases reach its
+# keyword and '--' checks and its length limits
+SAFE_PIECES = (
+    list('abcXYZ019 -.,!?()') +
+    ['\t', '\n', 'select', 'Union', 'selection', 'or', 'Hannah', 'extra hot'] +
+    SQL_WORDS
+)
+
+EDGE_CASES = [
+    None, '', ' ', '   ', '\t\n', '\x00', ' \x00 ', 'a\x00', 'a \x00', '\x00a', 'Alice', ' Alice ',
+    "O'Brien", 'Smith & Sons', 'A&B', '<b>', 'a"b', 'Mary-Jane', 'J. R. R.', 'selection', 'Select',
+    'union', 'a--b', 'a - - b', 'a-b', '(hi)', 'hi!', 'why?', 'Kelvin', 'ſelect', 'caf\xe9',
+    'a\xa0b', 'a\x85b', 'a b', 'line\nbreak', 'tab\there', 'x' * 49, 'x' * 50, 'x' * 51,
+    'x' * 99, 'x' * 100, 'x' * 101, 'x' * 499, 'x' * 500, 'x' * 501, 'x' * 49 + '&', 'x' * 49 + "'",
+    'x' * 99 + "'", 'x' * 499 + '&', 'x' * 498 + '&', 'x' * 99 + ' select', 'x' * 100 + ' select',
+    'x' * 99 + '\x00', 'x' * 100 + '\n', ' ' * 150 + 'x',
+] + [
+    form for keyword in SQL_WORDS
+    for form in (keyword, keyword.upper(), f'a {keyword.title()}.', f'{keyword}s', f'x{keyword}')
+]
+
+
+def legacy_validate(field, value):
+    pattern, max_length, required_error, invalid_error, injection_error = LEGACY_FIELDS[field]
+    if not value:
+        if required_error:
+            return False, "", required_error
+        return True, "", None
+
+    sanitized = InputValidator.sanitize_string(value, max_length)
+    if not pattern.match(sanitized):
+        return False, "", invalid_error
+    if any(p.search(sanitized) for p in InputValidator.SQL_INJECTION_PATTERNS):
+        return False, "", injection_error
+    return True, sanitized, None
+
+
+def random_case(rng):
+    pieces = PIECES if rng.random() < 0.5 else SAFE_PIECES
+    parts = [rng.choice(pieces) for _ in range(rng.choice([1, 2, 3, 5, 8, 20, 60, 200]))]
+    return ''.join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    # The text fields an order and a search validate: name, four menu items, notes, search
+    workload = [
+        ('customer_name', f'{name} {i}') for i, name in enumerate(CUSTOMER_NAMES)
+    ] + [
+        ('menu_item', item) for item in ['Latte', 'Oat', 'Vanilla', 'Extra Foam']
+    ] + [
+        ('notes', note) for note in NOTES
+    ] + [
+        ('search', term) for term in ['alice', 'hannah 12', 'latte', 'extra hot']
+    ]
+
+    for name, validate in [('before', legacy_validate), ('after', InputValidator.validate_text)]:
+        result = measure(lambda: [validate(field, value) for field, value in workload], args.iterations)
+        per_second = result['per_second'] * len(workload)
+        print(f"{name:<8} {per_second:>12,.0f} validations/s  (p50 {result['p50_ms']:.3f} ms "
+              f"per {len(workload)} fields)")
+
+
+if __name__ == '__main__':
+    main()
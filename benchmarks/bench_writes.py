@@ -0,0 +1,127 @@
+"""
+Order writes under concurrent submitters, with and without the write queue.
+
+Starts --processes worker processes (like gunicorn workers) against one
+database, each running --threads submitters that place orders through
+POST /order for --seconds. Runs once with the write queue (group commit)
+and once with WRITE_QUEUE=0 (each request commits on its own connection),
+and prints write throughput, latency percentiles and failed requests, such
+as "database is locked" errors, for both.
+
+Usage: python benchmarks/bench_writes.py [--processes 2] [--threads 8] [--seconds 5]
+           [--window-ms 0]
+"""
+import argparse
+import itertools
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from common import CUSTOMER_NAMES, load_app, logged_in_client
+
+
+def submit_orders(database, threads, start_at, seconds):
+    """
+    Place orders from several threads until the time is up (one worker process).
+
+    Returns:
+        dict: 'latencies' (seconds of each successful request) and 'failures'
+    """
+    app_module, _ = load_app(database=database)
+    latencies = []
+    failures = []
+    lock = threading.Lock()
+
+    def submitter(index):
+        client = logged_in_client(app_module)
+        names = itertools.cycle(CUSTOMER_NAMES)
+        own_latencies, own_failures = [], []
+        while time.time() < start_at:
+            time.sleep(0.001)
+        stop_at = start_at + seconds
+        while time.time() < stop_at:
+            started = time.perf_counter()
+            response = client.post('/order', data={
+                'customer_name': f'{next(names)} {index}', 'drink': 'Latte', 'milk': 'Oat',
+                'syrup': 'Vanilla', 'foam': 'Regular', 'temperature': 'Hot', 'ajax': 'true',
+            })
+            if response.status_code == 200:
+                own_latencies.append(time.perf_counter() - started)
+            else:
+                own_failures.append(response.status_code)
+        with lock:
+            latencies.extend(own_latencies)
+            failures.extend(own_failures)
+
+    workers = [threading.Thread(target=submitter, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return {'latencies': latencies, 'failures': failures}
+
+
+def run_mode(label, write_queue, args):
+    database = os.path.join(tempfile.mkdtemp(prefix='hebrews-bench-'), 'db.sqlite3')
+    env = dict(os.environ, WRITE_QUEUE='1' if write_queue else '0', WRITE_GROUP_COMMIT_MS=str(args.window_ms))
+    # Create the schema once so the workers do not race to migrate it
+    subprocess.run([sys.executable, '-c', f'import sys; sys.path.insert(0, {os.path.dirname(__file__)!r}); '
+                    f'from common import load_app; load_app(database={database!r})'],
+                   env=env, check=True, capture_output=True)
+
+    start_at = time.time() + 2.0    # Time for every worker to import the app
+    partials = []
+    processes = []
+    for _ in range(args.processes):
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as partial:
+            partials.append(partial.name)
+        processes.append(subprocess.Popen([
+            sys.executable, os.path.abspath(__file__), '--worker', database, '--partial', partials[-1],
+            '--threads', str(args.threads), '--seconds', str(args.seconds), '--start-at', str(start_at)
+        ], env=env, stdout=subprocess.DEVNULL))
+    for process in processes:
+        process.wait()
+
+    latencies, failures = [], []
+    for path in partials:
+        with open(path) as f:
+            result = json.load(f)
+        os.remove(path)
+        latencies += result['latencies']
+        failures += result['failures']
+
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    print(f"{label:<22} {len(latencies) / args.seconds:>8.1f} orders/s  "
+          f"p50 {quantiles[49] * 1000:7.2f} ms  p99 {quantiles[98] * 1000:7.2f} ms  "
+          f"max {latencies[-1] * 1000:8.2f} ms  failed {len(failures)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--window-ms', type=float, default=0.0)
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    parser.add_argument('--partial', help=argparse.SUPPRESS)
+    parser.add_argument('--start-at', type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        with open(args.partial, 'w') as f:
+            json.dump(submit_orders(args.worker, args.threads, args.start_at, args.seconds), f)
+        return
+
+    print(f"{args.processes} processes x {args.threads} submitters, {args.seconds:g}s each")
+    run_mode('per-request commit', False, args)
+    run_mode('write queue', True, args)
+
+
+if __name__ == '__main__':
+    main()
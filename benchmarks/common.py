@@ -0,0 +1,138 @@
+"""
+Shared helpers for the benchmark scripts.
+
+The app reads DATABASE_PATH when main.py is imported, so load_app() points it
+at a throwaway database before the import. Run the scripts from the
+repository root, e.g. ``python benchmarks/bench_polling.py``.
+"""
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app')
+
+CUSTOMER_NAMES = [
+    'Alice', 'Bob', 'Carmen', 'Dmitri', 'Esther', 'Farah', 'Gideon', 'Hannah',
+    'Isaac', 'Judith', 'Kofi', 'Leah', 'Miriam', 'Nathan', 'Obadiah', 'Priya',
+]
+DRINKS = [('Latte', 4.0), ('Coffee', 3.0)]
+MILKS = ['Whole', 'Oat', 'Almond', 'None']
+SYRUPS = ['Vanilla', 'Caramel', 'Hazelnut', 'None']
+FOAMS = ['Regular', 'Extra Foam', 'No Foam']
+NOTES = ['', '', '', 'Extra hot', 'Light ice', 'Half sweet', 'In a mug please']
+
+
+def load_app(app_dir=APP_DIR, database=None):
+    """
+    Import the Flask app against a fresh (or given) database.
+
+    Returns:
+        tuple: (main module, database path)
+    """
+    if database is None:
+        database = os.path.join(tempfile.mkdtemp(prefix='hebrews-bench-'), 'db.sqlite3')
+    os.environ['DATABASE_PATH'] = database
+    os.environ.setdefault('FLASK_SECRET_KEY', 'benchmark')
+    sys.path.insert(0, app_dir)
+    os.chdir(app_dir)
+
+    import main
+    main.app.config['WTF_CSRF_ENABLED'] = False
+    return main, database
+
+
+def logged_in_client(main):
+    """Test client with a logged-in session."""
+    client = main.app.test_client()
+    with client.session_transaction() as session:
+        session['user'] = main.username
+    return client
+
+
+def seed_orders(database, count, active=20, days=90, seed=42):
+    """
+    Insert synthetic orders spread over the last ``days`` days.
+
+    All but the newest ``active`` orders are completed, like a real history.
+    """
+    rng = random.Random(seed)
+    now = time.time()
+    rows = []
+    for i in range(count):
+        drink, price = rng.choice(DRINKS)
+        extra_shot = rng.random() < 0.2
+        status = 'completed' if i < count - active else rng.choice(['pending', 'in_progress'])
+        created = now - (count - i) * (days * 86400 / max(count, 1))
+        rows.append((
+            rng.choice(CUSTOMER_NAMES) + f' {i % 500}', drink, rng.choice(MILKS),
+            rng.choice(SYRUPS), rng.choice(FOAMS), rng.choice(['Hot', 'Iced']),
+            int(extra_shot), rng.choice(NOTES), status, price + (1.0 if extra_shot else 0.0),
+            time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(created)),
+        ))
+
+    db = sqlite3.connect(database)
+    db.executemany('''
+        INSERT INTO orders
+        (customer_name, drink, milk, syrup, foam, temperature, extra_shot, notes, status, price, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    db.commit()
+    db.close()
+
+
+# Seasonal items on top of the default menu the app creates
+EXTRA_MENU_ITEMS = [
+    ('drink', 'Mocha', 4.5), ('drink', 'Cortado', 3.5), ('drink', 'Chai Latte', 4.25),
+    ('drink', 'Cold Brew', 3.75), ('drink', 'Flat White', 4.0), ('milk', 'Soy', None),
+    ('milk', 'Coconut', None), ('syrup', 'Pumpkin Spice', None), ('syrup', 'Peppermint', None),
+    ('syrup', 'Lavender', None), ('foam', 'Cold Foam', None),
+]
+
+
+def seed_menu(database):
+    """Add EXTRA_MENU_ITEMS to the menu."""
+    db = sqlite3.connect(database)
+    db.executemany(
+        "INSERT INTO menu_config (item_type, item_name, price, created_at) VALUES (?, ?, ?, datetime('now'))",
+        EXTRA_MENU_ITEMS
+    )
+    db.commit()
+    db.close()
+
+
+def measure(fn, iterations, warmup=5):
+    """
+    Time repeated calls to fn.
+
+    Returns:
+        dict: Latency percentiles in milliseconds and throughput per second
+    """
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - started
+
+    samples.sort()
+    return {
+        'iterations': iterations,
+        'p50_ms': round(samples[len(samples) // 2], 3),
+        'p90_ms': round(samples[int(len(samples) * 0.9)], 3),
+        'p99_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 3),
+        'mean_ms': round(statistics.fmean(samples), 3),
+        'per_second': round(iterations / elapsed, 1),
+    }
+
+
+def print_result(name, result):
+    print(f"{name:<40} p50 {result['p50_ms']:>8.3f} ms  p90 {result['p90_ms']:>8.3f} ms  "
+          f"p99 {result['p99_ms']:>8.3f} ms  {result['per_second']:>9.1f}/s")
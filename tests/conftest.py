@@ -0,0 +1,56 @@
+"""
+Test setup: the app imported once against a fresh database in a temporary
+directory, with a few orders in every status.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app')
+
+# main.py opens its database at import, so the environment comes first
+os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='hebrews-test-'), 'db.sqlite3')
+os.environ.setdefault('FLASK_SECRET_KEY', 'test')
+sys.path.insert(0, APP_DIR)
+
+import main  # noqa: E402
+
+main.app.config['WTF_CSRF_ENABLED'] = False
+
+# (customer, drink, status) of the seeded orders
+SEED_ORDERS = [
+    ('Alice', 'Latte', 'completed'),
+    ('Alice', 'Coffee', 'completed'),
+    ('Bob', 'Latte', 'in_progress'),
+    ('Carol', 'Latte', 'pending'),
+    ('Dan', 'Coffee', 'pending'),
+]
+
+
+@pytest.fixture(scope='session')
+def app_module():
+    """The main module, with SEED_ORDERS placed and moved to their statuses."""
+    client = main.app.test_client()
+    with client.session_transaction() as session:
+        session['user'] = main.username
+    for customer, drink, status in SEED_ORDERS:
+        response = client.post('/order', data={
+            'customer_name': customer, 'drink': drink, 'milk': 'Oat', 'temperature': 'Hot', 'ajax': 'true',
+        })
+        order_id = response.get_json()['order_id']
+        for step in ('in_progress', 'completed'):
+            if status == 'pending' or (status == 'in_progress' and step == 'completed'):
+                break
+            client.post(f'/update_status/{order_id}', data={'status': step})
+    return main
+
+
+@pytest.fixture
+def client(app_module):
+    """Test client with a logged-in session."""
+    client = app_module.app.test_client()
+    with client.session_transaction() as session:
+        session['user'] = app_module.username
+    return client
@@ -0,0 +1,51 @@
+"""The label routes record printed_at through the write queue."""
+import main
+
+
+def place_order(client, customer):
+    response = client.post('/order', data={
+        'customer_name': customer, 'drink': 'Latte', 'milk': 'Oat', 'temperature': 'Hot', 'ajax': 'true',
+    })
+    return response.get_json()['order_id']
+
+
+def printed_at(order_id):
+    db = main.connect(main.DATABASE)
+    try:
+        return db.execute('SELECT printed_at FROM orders WHERE id = ?', (order_id,)).fetchone()[0]
+    finally:
+        db.close()
+
+
+def test_create_label_marks_printed(client):
+    order_id = place_order(client, 'Erin')
+
+    response = client.post(f'/create_label/{order_id}')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/pdf'
+    assert printed_at(order_id) is not None
+
+
+def test_create_label_unknown_order(client):
+    assert client.post('/create_label/999999').status_code == 404
+
+
+def test_new_labels_are_claimed_once(client):
+    order_ids = [place_order(client, 'Frank'), place_order(client, 'Grace')]
+
+    first = client.post('/create_labels', data={'new': '1'})
+    second = client.post('/create_labels', data={'new': '1'})
+
+    assert first.status_code == 200
+    assert all(printed_at(order_id) is not None for order_id in order_ids)
+    assert second.status_code == 404
+
+
+def test_create_labels_by_id(client):
+    order_id = place_order(client, 'Heidi')
+
+    assert client.post('/create_labels', data={'ids': f'{order_id},abc'}).status_code == 400
+    assert printed_at(order_id) is None
+    assert client.post('/create_labels', data={'ids': f'{order_id},{order_id}'}).status_code == 200
+    assert printed_at(order_id) is not None
@@ -0,0 +1,26 @@
+"""Every route in QUERY_BUDGET_ROUTES stays within its QUERY_BUDGETS entry."""
+import pytest
+
+from main import QUERY_BUDGET_ROUTES
+from query_diagnostics import QUERY_BUDGET_EXCEEDED_HEADER, QUERY_COUNT_HEADER
+
+ROUTES = [entry if isinstance(entry, tuple) else ('GET', entry) for entry in QUERY_BUDGET_ROUTES]
+
+
+@pytest.fixture
+def diagnostics(app_module):
+    enabled = app_module.app.config['QUERY_DIAGNOSTICS']
+    app_module.app.config['QUERY_DIAGNOSTICS'] = True
+    yield
+    app_module.app.config['QUERY_DIAGNOSTICS'] = enabled
+
+
+@pytest.mark.parametrize('method, route', ROUTES)
+def test_route_within_query_budget(client, diagnostics, method, route):
+    response = client.open(route, method=method)
+
+    assert response.status_code == 200, response.data[:200]
+    assert QUERY_COUNT_HEADER in response.headers
+    assert QUERY_BUDGET_EXCEEDED_HEADER not in response.headers, (
+        f"{response.headers[QUERY_COUNT_HEADER]} statements, budget {response.headers[QUERY_BUDGET_EXCEEDED_HEADER]}"
+    )
@@ -0,0 +1,61 @@
+"""EXPLAIN QUERY PLAN checks for the hot routes, as flask check-query-plans runs them."""
+import sqlite3
+from urllib.parse import urlsplit
+
+import pytest
+
+from main import DATABASE, QUERY_PLAN_FULL_READ_TABLES, QUERY_PLAN_LIST_ROUTES, QUERY_PLAN_ROUTES
+from migrations import explain_query_plan, find_table_scans, find_temp_sorts
+
+
+@pytest.fixture
+def traced_statements(app_module):
+    statements = []
+    app_module.app.config['QUERY_TRACE_CALLBACK'] = statements.append
+    yield statements
+    app_module.app.config['QUERY_TRACE_CALLBACK'] = None
+
+
+@pytest.mark.parametrize('route', QUERY_PLAN_ROUTES)
+def test_route_queries_use_indexes(client, traced_statements, route):
+    assert client.get(route).status_code == 200
+    selects = [sql for sql in traced_statements if sql.lstrip().upper().startswith('SELECT')]
+    assert selects
+
+    db = sqlite3.connect(DATABASE)
+    try:
+        for sql in selects:
+            plan = explain_query_plan(db, sql)
+            assert not find_table_scans(plan, QUERY_PLAN_FULL_READ_TABLES), plan
+            if urlsplit(route).path in QUERY_PLAN_LIST_ROUTES:
+                assert not find_temp_sorts(plan), plan
+    finally:
+        db.close()
+
+
+def test_find_table_scans():
+    plan = [
+        'SCAN orders',
+        'SCAN orders USING INDEX idx_orders_active_queue',
+        'SCAN menu_config',
+        'SCAN CONSTANT ROW',
+        'SCAN orders_fts VIRTUAL TABLE INDEX 0:M3',
+        'CO-ROUTINE log',
+        'SCAN log',
+        'SCAN (subquery-1)',
+    ]
+    assert find_table_scans(plan, ('menu_config',)) == ['SCAN orders']
+
+
+def test_find_temp_sorts():
+    assert find_temp_sorts([
+        'SEARCH orders USING INDEX idx_orders_status_created_at (status=?)', 'USE TEMP B-TREE FOR ORDER BY',
+    ]) == ['USE TEMP B-TREE FOR ORDER BY']
+    assert find_temp_sorts([
+        'SEARCH orders USING INDEX idx_orders_status_created_at (status=?)',
+        'USE TEMP B-TREE FOR RIGHT PART OF ORDER BY',
+    ]) == ['USE TEMP B-TREE FOR RIGHT PART OF ORDER BY']
+    # Aggregates and full-text ranking cannot come out of an index in order
+    assert not find_temp_sorts(['SCAN completed_rollups', 'USE TEMP B-TREE FOR GROUP BY', 'USE TEMP B-TREE FOR ORDER BY'])
+    assert not find_temp_sorts(['SCAN orders_fts VIRTUAL TABLE INDEX 0:M3', 'USE TEMP B-TREE FOR ORDER BY'])
+    assert not find_temp_sorts(['SEARCH orders USING INDEX idx_orders_active_queue (created_at<?)'])
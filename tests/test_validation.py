@@ -0,0 +1,43 @@
+"""
+InputValidator.validate_text against the original validation rules.
+
+The fast path in validate_text skips the injection patterns for text it can
+prove clean (SQL_KEYWORDS and '--' stand in for them), so it is checked
+against the original path on the differential corpus that
+benchmarks/bench_validation.py times: hand-picked edge cases plus seeded
+random strings built from the characters and SQL fragments the rules care
+about.
+"""
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+from bench_validation import EDGE_CASES, LEGACY_FIELDS, legacy_validate, random_case  # noqa: E402
+from security_utils import InputValidator  # noqa: E402
+
+RANDOM_CASES = 20000
+
+
+@pytest.fixture(scope='module')
+def corpus():
+    rng = random.Random(1)
+    return EDGE_CASES + [random_case(rng) for _ in range(RANDOM_CASES)]
+
+
+@pytest.mark.parametrize('field', sorted(LEGACY_FIELDS))
+def test_validate_text_matches_original_rules(corpus, field):
+    mismatches = []
+    outcomes = set()
+    for value in corpus:
+        expected = legacy_validate(field, value)
+        actual = InputValidator.validate_text(field, value)
+        if actual != expected:
+            mismatches.append((value, actual, expected))
+        outcomes.add(expected[0])
+    assert not mismatches[:5], f"{len(mismatches)} {field} results differ"
+    # The corpus reaches both outcomes, so it covers the fast path and the fallback
+    assert outcomes == {True, False}